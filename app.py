@@ -1,35 +1,47 @@
-from flask import Flask, request, jsonify, send_file, redirect, url_for, render_template, session, flash
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN, MSO_ANCHOR, MSO_AUTO_SIZE
-from pptx.dml.color import RGBColor
-import requests
+from flask import Flask, Blueprint, Response, current_app, request, jsonify, send_file, send_from_directory, redirect, url_for, render_template, session, flash, stream_with_context
 import os
 import json
-import io
-import tempfile
 import uuid
+import hashlib
 import logging
-from template_manager import TemplateManager
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime
+from template_manager import get_template_manager
 import sqlite3
-from io import BytesIO
+import threading
+import time
 from flask_cors import CORS
-from PIL import Image
 from functools import wraps
+from compression import init_compression
+from rate_limit import Overloaded, rate_limit, llm_slot, overloaded_response
+from scheduler import priority, scheduler_stats
+from logging_config import configure_logging, init_request_logging, timed_stage
+from ollama_health import OLLAMA_ENDPOINT, OLLAMA_MODEL, OLLAMA_TIMEOUT, OLLAMA_KEEP_ALIVE, get_ollama_monitor, start_ollama_monitor
+from prompts import build_prompt
+from deck_content import pack_content, unpack_content
+from zip_stream import stream_zip
+from search_index import init_search_index, index_presentation, search_presentations
+from preview_format import LEGACY_PREVIEW_FORMAT_VERSION, expand_preview_data
+from template_catalog import PREVIEW_CACHE_DIR, PREVIEW_MAX_AGE, get_catalog
+from prefetch import adopt_prefetch, prefetch_stats, start_prefetch
+from storage import PPTX_MIMETYPE, get_storage, iter_chunks
+from auth import auth_stats, get_password_hasher, get_user_cache
+from profiling import PROFILE_DIR, PROFILE_FILE_SUFFIXES, init_profiling, is_profiling_admin, list_profiles, profiling_enabled
+
+# Heavy dependencies (python-pptx, PIL, requests, dateutil) are imported inside the
+# routes that need them so worker boot and lightweight routes like /login stay fast.
+# Run `python profile_imports.py` to check what the app pulls in at import time.
 
-app = Flask(__name__)
-CORS(app)
-template_manager = TemplateManager()
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app.secret_key = 'your_secret_key'  # Change this to a secure random string in production
+bp = Blueprint('main', __name__)
+
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'users.db')
+# Part of the dashboard's ETag, so pages cached before a deploy that changed it are not reused
+DASHBOARD_TEMPLATE_VERSION = os.stat(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  'templates', 'dashboard.html')).st_mtime_ns
 
 def get_db():
-    conn = sqlite3.connect('users.db')
+    conn = sqlite3.connect(DATABASE_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -58,27 +70,133 @@ def init_db():
         template TEXT NOT NULL,
         slide_count INTEGER NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        content BLOB,
         FOREIGN KEY (user_id) REFERENCES users (id)
     )
     ''')
-    
+    # Databases created before deck content was stored lack the column
+    columns = [row['name'] for row in cursor.execute('PRAGMA table_info(presentations)')]
+    if 'content' not in columns:
+        cursor.execute('ALTER TABLE presentations ADD COLUMN content BLOB')
+
+    init_search_index(conn)
+
     conn.commit()
     conn.close()
     logger.info("Database initialized with required tables.")
 
+# In-flight generation tracking, used by the WSGI server hooks to drain on shutdown
+_inflight_lock = threading.Lock()
+_inflight_generations = 0
+
+def inflight_generations():
+    return _inflight_generations
+
+def track_inflight(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        global _inflight_generations
+        with _inflight_lock:
+            _inflight_generations += 1
+        try:
+            return f(*args, **kwargs)
+        finally:
+            with _inflight_lock:
+                _inflight_generations -= 1
+    return decorated_function
+
+def store_deck(ppt_file, name):
+    """Move a built deck into deck storage and return its public filename."""
+    safe_name = name.replace(' ', '_').replace('/', '_').replace('\\', '_')
+    filename = f"{safe_name}_{uuid.uuid4().hex[:8]}.pptx"
+    with timed_stage('store'):
+        try:
+            get_storage().save(ppt_file, filename)
+        finally:
+            # The build's temp file is never needed again, whether or not storing it worked
+            os.unlink(ppt_file)
+    return filename
+
+def send_deck(filename):
+    """Response that delivers a stored deck: a redirect to the storage's own URL
+    when it has one, else the file from local disk, else streamed through the app."""
+    storage = get_storage()
+    url = storage.download_url(filename, filename)
+    if url:
+        return redirect(url)
+    path = storage.local_path(filename)
+    if path:
+        return send_file(path, as_attachment=True)
+    response = Response(stream_with_context(iter_chunks(storage, filename)), mimetype=PPTX_MIMETYPE)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def save_to_history(title, filename, template, content_data, image_prompts):
+    """Record a deck in the user's history with its content; returns the row id, or None on error."""
+    try:
+        with timed_stage('db'):
+            conn = get_db()
+            try:
+                c = conn.cursor()
+                c.execute('''
+                    INSERT INTO presentations (user_id, title, filename, template, slide_count, content)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (session['user_id'], title, filename, template, 1 + len(content_data.get('slides', [])),
+                      pack_content(content_data, image_prompts)))
+                presentation_id = c.lastrowid
+                index_presentation(c, presentation_id, session['user_id'], content_data)
+                conn.commit()
+            finally:
+                conn.close()
+        logger.info("Saved presentation %s to user %s's history", presentation_id, session['username'])
+        return presentation_id
+    except sqlite3.Error as e:
+        logger.error("Failed to save presentation to history: %s", e)
+        return None
+
+def find_user(column, value):
+    """The users row with column ('id' or 'email') equal to value, as a dict, or None.
+
+    Served from the short-lived user cache when possible.
+    """
+    def load():
+        conn = get_db()
+        try:
+            row = conn.execute(f'SELECT id, username, email, password, created_at FROM users WHERE {column} = ?',
+                               (value,)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    if column not in ('id', 'email'):
+        raise ValueError(f"Cannot look up users by {column}")
+    return get_user_cache().get((column, value), load)
+
+def save_password(user, new_hash):
+    """Replace a user's password hash, unless it changed since user was read."""
+    conn = get_db()
+    try:
+        conn.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?',
+                     (new_hash, user['id'], user['password']))
+        conn.commit()
+    finally:
+        conn.close()
+    get_user_cache().invalidate(('id', user['id']), ('email', user['email']))
+    logger.info("Rehashed the password of user %s", user['id'])
+
 # Login decorator
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
         
     if request.method == 'POST':
         username = request.form['username']
@@ -96,200 +214,154 @@ def register():
         if len(password) < 6:
             return render_template('register.html', error='Password must be at least 6 characters')
         
-        hashed_password = generate_password_hash(password)
-        
+        # Hash before opening the connection, so a slow or refused hash never holds
+        # it; the hash is computed off this thread (see auth.py)
+        try:
+            hashed_password = get_password_hasher().hash(password)
+        except Overloaded as e:
+            return render_template('register.html', error=str(e)), 503, {'Retry-After': str(e.retry_after)}
+
         try:
             conn = get_db()
-            c = conn.cursor()
-            
-            # Check if username or email already exists
-            c.execute('SELECT * FROM users WHERE username = ? OR email = ?', (username, email))
-            existing_user = c.fetchone()
-            
-            if existing_user:
+            try:
+                c = conn.cursor()
+
+                # Check if username or email already exists
+                c.execute('SELECT id FROM users WHERE username = ? OR email = ?', (username, email))
+                if c.fetchone():
+                    return render_template('register.html', error='Username or email already exists')
+
+                # Insert new user
+                c.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                        (username, email, hashed_password))
+                conn.commit()
+                user_id = c.lastrowid
+            finally:
                 conn.close()
-                return render_template('register.html', error='Username or email already exists')
-                
-            # Insert new user
-            c.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
-                    (username, email, hashed_password))
-            conn.commit()
-            
-            # Get the user id for session
-            c.execute('SELECT id FROM users WHERE email = ?', (email,))
-            user_id = c.fetchone()[0]
-            conn.close()
             
             # Set session data
             session['user_id'] = user_id
             session['username'] = username
             
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
             
         except sqlite3.Error as e:
-            logger.error(f"Database error during registration: {str(e)}")
+            logger.error("Database error during registration: %s", e)
             return render_template('register.html', error='An error occurred. Please try again.')
             
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
         
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
         
         try:
-            conn = get_db()
-            c = conn.cursor()
-            c.execute('SELECT * FROM users WHERE email = ?', (email,))
-            user = c.fetchone()
-            conn.close()
+            user = find_user('email', email)
+            hasher = get_password_hasher()
+            matches, needs_rehash = hasher.verify(user['password'], password) if user else (False, False)
             
-            if user and check_password_hash(user['password'], password):
+            if matches:
                 session['user_id'] = user['id']
                 session['username'] = user['username']
-                return redirect(url_for('dashboard'))
+                if needs_rehash:
+                    hasher.rehash(password, lambda new_hash: save_password(user, new_hash))
+                return redirect(url_for('main.dashboard'))
             else:
                 return render_template('login.html', error='Invalid email or password')
                 
+        except Overloaded as e:
+            return render_template('login.html', error=str(e)), 503, {'Retry-After': str(e.retry_after)}
         except sqlite3.Error as e:
-            logger.error(f"Database error during login: {str(e)}")
+            logger.error("Database error during login: %s", e)
             return render_template('login.html', error='An error occurred. Please try again.')
             
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.pop('user_id', None)
     session.pop('username', None)
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-from datetime import datetime
-
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Get user's presentation history
     conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT * FROM presentations WHERE user_id = ? ORDER BY created_at DESC', (session['user_id'],))
-    presentations = c.fetchall()
-    conn.close()
-
-    # Convert 'created_at' from string to datetime object
-    presentation_list = []
-    for pres in presentations:
-        # Convert sqlite3.Row to dictionary
-        pres_dict = dict(pres)  # Convert to a dictionary for mutability
-
-        # If 'created_at' is a string, convert it to a datetime object
-        if isinstance(pres_dict['created_at'], str):
-            pres_dict['created_at'] = datetime.strptime(pres_dict['created_at'], "%Y-%m-%d %H:%M:%S")
-        
-        # Add the modified presentation to the new list
-        presentation_list.append(pres_dict)
-
-    # Get all available templates
-    templates = template_manager.get_all_templates()
-    template_list = []
-    for key, template in templates.items():
-        template_list.append({
-            "id": key,
-            "name": template.get('name', key),
-            "description": template.get('description', ''),
-            "preview_image": template.get('preview_image', '')
-        })
-    
-    return render_template('dashboard.html', 
-                          username=session['username'], 
-                          presentations=presentation_list,
-                          templates=template_list)
+    try:
+        summary = conn.execute('SELECT COUNT(*), MAX(id) FROM presentations WHERE user_id = ?',
+                               (session['user_id'],)).fetchone()
+        # The page only changes when the user's history or the page template does;
+        # a returning user whose history is unchanged gets a 304
+        etag = hashlib.sha256(json.dumps(
+            [session['user_id'], session['username'], list(summary), DASHBOARD_TEMPLATE_VERSION]
+        ).encode('utf-8')).hexdigest()[:32]
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            # Get user's presentation history
+            presentations = conn.execute(
+                'SELECT id, title, filename, created_at FROM presentations WHERE user_id = ? ORDER BY created_at DESC',
+                (session['user_id'],)
+            ).fetchall()
+
+            # Convert 'created_at' from string to datetime object
+            presentation_list = []
+            for pres in presentations:
+                # Convert sqlite3.Row to dictionary
+                pres_dict = dict(pres)  # Convert to a dictionary for mutability
+
+                # If 'created_at' is a string, convert it to a datetime object
+                if isinstance(pres_dict['created_at'], str):
+                    pres_dict['created_at'] = datetime.strptime(pres_dict['created_at'], "%Y-%m-%d %H:%M:%S")
+
+                # Add the modified presentation to the new list
+                presentation_list.append(pres_dict)
+
+            response = current_app.make_response(render_template('dashboard.html',
+                                                                 username=session['username'],
+                                                                 presentations=presentation_list))
+    finally:
+        conn.close()
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-OLLAMA_ENDPOINT = "http://localhost:11434/api/generate"
+def generate_text_content(topic, num_slides, custom_content=None, fallback=True):
+    """The deck outline from the LLM; on any error, generic fallback content (or the
+    error is raised if fallback is False)."""
+    import requests
 
-def generate_text_content(topic, num_slides, custom_content=None):
+    monitor = get_ollama_monitor()
     try:
-        if custom_content:
-            # If custom content is provided, ask Ollama to format it
-            prompt = f"""Convert the following presentation content into a well-structured JSON format.
-            The content provided by the user is about: '{topic}'
-            
-            USER CONTENT:
-            {custom_content}
-            
-            Format EXACTLY as this JSON structure:
-            {{
-                "title": "Overall Presentation Title",
-                "slides": [
-                    {{
-                        "title": "Slide 1 Title",
-                        "points": [
-                            "Point 1: Detailed explanation or context",
-                            "Point 2: Detailed explanation or context",
-                            "Point 3: Detailed explanation or context",
-                            "Point 4: Additional context or related points",
-                            "Point 5: Further insights or examples"
-                        ]
-                    }},
-                    ...
-                ]
-            }}
-            
-            Requirements:
-            - Use clear, professional language
-            - Extract slide titles and bullet points from the user content
-            - Organize the content logically
-            - If the user hasn't provided enough structure, create appropriate slide titles and organize the content
-            - Add bullet points where not explicitly provided by user
-            - Avoid any markdown, code blocks, or extra formatting
-            """
-        else:
-            # Original prompt for generating from a topic
-            prompt = f"""Generate a detailed JSON for a presentation about '{topic}' with {num_slides} slides.
-            Each slide should have the following:
-            - A detailed title
-            - At least 5 concise and informative bullet points per slide (if applicable)
-            - Provide some additional explanations or insights for each bullet point
-            - Ensure the content is rich, professional, and informative
-            Format EXACTLY as this JSON structure:
-            {{
-                "title": "Overall Presentation Title",
-                "slides": [
-                    {{
-                        "title": "Slide 1 Title",
-                        "points": [
-                            "Point 1: Detailed explanation or context",
-                            "Point 2: Detailed explanation or context",
-                            "Point 3: Detailed explanation or context",
-                            "Point 4: Additional context or related points",
-                            "Point 5: Further insights or examples"
-                        ]
-                    }},
-                    ...
-                ]
-            }}
-            Requirements:
-            - Use clear, professional language
-            - Ensure each slide has a meaningful title
-            - Create at least 5 detailed, informative bullet points per slide
-            - Provide explanations, context, or examples where relevant
-            - Avoid any markdown, code blocks, or extra formatting
-            """
-        
+        if not monitor.available():
+            raise Exception("Ollama backend is marked down, using fallback content")
+
+        prompt, options = build_prompt(topic, num_slides, custom_content)
         payload = {
-            "model": "gemma3:1b-it-qat",
+            "model": OLLAMA_MODEL,
             "prompt": prompt,
             "stream": False,
-            "format": "json"
+            "format": "json",
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": options
         }
-        response = requests.post(OLLAMA_ENDPOINT, json=payload)
-        if response.status_code != 200:
-            logger.error(f"Ollama API error: {response.status_code} - {response.text}")
-            raise Exception(f"Ollama API error: {response.status_code}")
-        content = response.json()["response"]
+        started = time.monotonic()
+        try:
+            response = requests.post(OLLAMA_ENDPOINT, json=payload, timeout=OLLAMA_TIMEOUT)
+            if response.status_code != 200:
+                logger.error("Ollama API error: %s - %s", response.status_code, response.text)
+                raise Exception(f"Ollama API error: {response.status_code}")
+            result = response.json()
+        except Exception as e:
+            monitor.record_failure(e)
+            raise
+        monitor.record_generation(time.monotonic() - started, result.get('eval_count'), result.get('eval_duration'))
+        content = result["response"]
         if "```json" in content:
             content = content.split("```json")[1].split("```")[0].strip()
         elif "```" in content:
@@ -302,7 +374,9 @@ def generate_text_content(topic, num_slides, custom_content=None):
                 raise ValueError("Invalid slide structure")
         return presentation_data
     except Exception as e:
-        logger.error(f"Text generation error: {str(e)}")
+        logger.error("Text generation error: %s", e)
+        if not fallback:
+            raise
         # Create a fallback presentation structure
         title = topic or "Presentation"
         return {
@@ -335,448 +409,91 @@ def generate_text_content(topic, num_slides, custom_content=None):
             ]
         }
 
-def generate_image_prompt(prompt):
-    return f"Professional presentation image related to: {prompt}"
+def outline_request(data):
+    """Return (key, topic, num_slides, custom_content) for the outline a generate_ppt or
+    prefetch payload asks for; raises ValueError if the payload is invalid.
 
-def create_presentation(content_data, image_prompts=None, template="default"):
+    The key identifies the outline itself, so it leaves out the template.
+    """
+    content_type = data.get('content_type', 'auto_generate')  # 'auto_generate', 'custom'
+    if content_type == 'auto_generate':
+        # Original flow - generate from topic
+        topic = data.get('topic')
+        try:
+            num_slides = int(data.get('num_slides', 3))
+        except (TypeError, ValueError):
+            raise ValueError("Number of slides must be between 1 and 20")
+        if not topic:
+            raise ValueError("Topic is required for auto-generated content")
+        if num_slides < 1 or num_slides > 20:
+            raise ValueError("Number of slides must be between 1 and 20")
+        return (content_type, topic, num_slides), topic, num_slides, None
+    if content_type == 'custom':
+        # New flow - process custom content through Ollama
+        custom_content = data.get('custom_content')
+        custom_title = data.get('custom_title', 'Custom Presentation')
+        if not custom_content:
+            raise ValueError("Custom content is required when selecting custom content type")
+        digest = hashlib.sha256(custom_content.encode('utf-8')).hexdigest()
+        return (content_type, custom_title, digest), custom_title, 0, custom_content
+    raise ValueError("Invalid content type")
+
+@bp.route('/prefetch', methods=['POST'])
+@login_required
+@rate_limit('prefetch')
+def prefetch():
+    """Start generating the outline for a topic before the user submits generate_ppt."""
     try:
-        template_config = template_manager.get_template(template) or template_manager.get_template('default')
-        styles = template_config.get('styles', {})
-        title_slide_styles = styles.get('title_slide', {})
-        content_slide_styles = styles.get('content_slide', {})
-        image_slide_styles = styles.get('image_slide', {})
-        
-        # Log preview image
-        preview_image = template_config.get('preview_image', '')
-        preview_image_path = os.path.join('static', preview_image)
-        if preview_image and os.path.exists(preview_image_path):
-            logger.info(f"Preview image found for template {template}: {preview_image_path}")
-        else:
-            logger.warning(f"Preview image not found for template {template}: {preview_image_path}")
-        
-        preview_data = {
-            "title": content_data.get("title", "Presentation"),
-            "template": template,
-            "styles": {
-                "title_slide": {
-                    "background": title_slide_styles.get('background', {'type': 'solid', 'color': {'r': 240, 'g': 240, 'b': 240}}),
-                    "background_image": title_slide_styles.get('background_image', ''),
-                    "title_font": title_slide_styles.get('title_font', {'name': 'Calibri', 'size': 44, 'color': {'r': 0, 'g': 0, 'b': 0}, 'bold': True, 'alignment': 'center'}),
-                    "image_position": title_slide_styles.get('image_position', {'left': 2.5, 'top': 4.0, 'width': 5.0, 'height': 2.5})
-                },
-                "content_slide": {
-                    "background": content_slide_styles.get('background', {'type': 'solid', 'color': {'r': 255, 'g': 255, 'b': 255}}),
-                    "background_image": content_slide_styles.get('background_image', ''),
-                    "title_font": content_slide_styles.get('title_font', {'name': 'Calibri', 'size': 32, 'color': {'r': 0, 'g': 0, 'b': 0}, 'bold': True, 'alignment': 'left'}),
-                    "body_font": content_slide_styles.get('body_font', {'name': 'Calibri', 'size': 18, 'color': {'r': 50, 'g': 50, 'b': 50}, 'alignment': 'left'}),
-                    "image_position": content_slide_styles.get('image_position', {'left': 6.0, 'top': 1.5, 'width': 3.5, 'height': 4.5})
-                },
-                "image_slide": {
-                    "fill_color": image_slide_styles.get('fill_color', {'r': 245, 'g': 245, 'b': 245}),
-                    "border_color": image_slide_styles.get('border_color', {'r': 200, 'g': 200, 'b': 200}),
-                    "border_width": image_slide_styles.get('border_width', 1.5),
-                    "border_style": image_slide_styles.get('border_style', 'dashed')
-                }
-            },
-            "slides": []
-        }
-        
-        prs = Presentation()
-        SLIDE_WIDTH = Inches(10)  # Standard 4:3 slide width
-        SLIDE_HEIGHT = Inches(7.5)  # Standard 4:3 slide height
-        SUPPORTED_FORMATS = {'BMP', 'GIF', 'JPEG', 'PNG', 'TIFF', 'WMF'}
-        
-        def validate_image_format(image_path):
-            try:
-                with Image.open(image_path) as img:
-                    format = img.format.upper()
-                    if format not in SUPPORTED_FORMATS:
-                        logger.warning(f"Unsupported image format at {image_path}: got {format}, expected one of {SUPPORTED_FORMATS}")
-                        return False
-                    logger.debug(f"Validated image format at {image_path}: {format}")
-                    return True
-            except Exception as e:
-                logger.error(f"Failed to validate image format at {image_path}: {str(e)}")
-                return False
-        
-        def adjust_font_size(title_text, base_size):
-            # Reduce font size for long titles (e.g., > 40 characters)
-            if len(title_text) > 40:
-                new_size = max(base_size - 8, 20)  # Reduce by up to 8pt, minimum 20pt
-                logger.debug(f"Reducing font size for title '{title_text[:20]}...': {base_size}pt to {new_size}pt")
-                return new_size
-            return base_size
-        
-        # Title Slide
-        blank_slide_layout = prs.slide_layouts[6]
-        title_slide = prs.slides.add_slide(blank_slide_layout)
-        
-        background_settings = title_slide_styles.get('background', {})
-        bg_image = title_slide_styles.get('background_image', '')
-        background = title_slide.background
-        fill = background.fill
-        if bg_image:
-            bg_image_path = os.path.abspath(os.path.join('static', bg_image))
-            logger.debug(f"Checking background image for title slide: {bg_image_path}")
-            if os.path.exists(bg_image_path) and validate_image_format(bg_image_path):
-                try:
-                    logger.info(f"Applying background image for title slide: {bg_image_path}")
-                    picture = title_slide.shapes.add_picture(
-                        bg_image_path,
-                        left=0,
-                        top=0,
-                        width=SLIDE_WIDTH,
-                        height=SLIDE_HEIGHT
-                    )
-                    logger.debug(f"Picture added to title slide: width={picture.width.inches:.2f}in, height={picture.height.inches:.2f}in, left={picture.left.inches:.2f}in, top={picture.top.inches:.2f}in")
-                    title_slide.shapes._spTree.remove(picture._element)
-                    title_slide.shapes._spTree.insert(2, picture._element)
-                except Exception as e:
-                    logger.error(f"Failed to apply background image for title slide: {bg_image_path}, error: {str(e)}")
-                    fill.solid()
-                    bg_color = background_settings.get('color', {'r': 240, 'g': 240, 'b': 240}) if background_settings.get('type') == 'solid' else background_settings.get('gradient_start', {'r': 240, 'g': 240, 'b': 240})
-                    fill.fore_color.rgb = RGBColor(bg_color['r'], bg_color['g'], bg_color['b'])
-                    logger.info(f"Fallback to solid color for title slide: rgb({bg_color['r']}, {bg_color['g']}, {bg_color['b']})")
-            else:
-                logger.error(f"Background image not found or invalid format for title slide: {bg_image_path}")
-                fill.solid()
-                bg_color = background_settings.get('color', {'r': 240, 'g': 240, 'b': 240}) if background_settings.get('type') == 'solid' else background_settings.get('gradient_start', {'r': 240, 'g': 240, 'b': 240})
-                fill.fore_color.rgb = RGBColor(bg_color['r'], bg_color['g'], bg_color['b'])
-                logger.info(f"Fallback to solid color for title slide: rgb({bg_color['r']}, {bg_color['g']}, {bg_color['b']})")
-        else:
-            logger.debug(f"No background image specified for title slide, using {background_settings.get('type', 'solid')} background")
-            fill.solid()
-            bg_color = background_settings.get('color', {'r': 240, 'g': 240, 'b': 240}) if background_settings.get('type') == 'solid' else background_settings.get('gradient_start', {'r': 240, 'g': 240, 'b': 240})
-            fill.fore_color.rgb = RGBColor(bg_color['r'], bg_color['g'], bg_color['b'])
-            logger.info(f"Applied solid color for title slide: rgb({bg_color['r']}, {bg_color['g']}, {bg_color['b']})")
-        
-        # Title slide title textbox
-        left = Inches(0.5)
-        top = Inches(1.5)
-        width = Inches(9.0)
-        height = Inches(2.0)  # Increased height to accommodate wrapped text
-        title_box = title_slide.shapes.add_textbox(left, top, width, height)
-        title_frame = title_box.text_frame
-        title_frame.word_wrap = True  # Enable word wrapping
-        title_text = content_data.get("title", "Presentation")
-        title_frame.text = title_text
-        logger.debug(f"Title slide heading: '{title_text}', length: {len(title_text)}")
-        title_para = title_frame.paragraphs[0]
-        title_font_settings = title_slide_styles.get('title_font', {})
-        title_para.font.name = title_font_settings.get('name', 'Calibri')
-        base_font_size = title_font_settings.get('size', 44)
-        title_para.font.size = Pt(adjust_font_size(title_text, base_font_size))
-        title_color = title_font_settings.get('color', {'r': 0, 'g': 0, 'b': 0})
-        title_para.font.color.rgb = RGBColor(title_color['r'], title_color['g'], title_color['b'])
-        title_para.font.bold = title_font_settings.get('bold', True)
-        title_para.alignment = PP_ALIGN.CENTER
-        
-        title_image_style = {}
-        if image_prompts and "title" in image_prompts:
-            image_position = title_slide_styles.get('image_position', {'left': 2.5, 'top': 4.0, 'width': 5.0, 'height': 2.5})
-            img_left = Inches(image_position.get('left', 2.5))
-            img_top = Inches(image_position.get('top', 4.0))
-            img_width = Inches(image_position.get('width', 5.0))
-            img_height = Inches(image_position.get('height', 2.5))
-            img_placeholder = title_slide.shapes.add_shape(1, img_left, img_top, img_width, img_height)
-            img_placeholder.fill.solid()
-            fill_color = image_slide_styles.get('fill_color', {'r': 245, 'g': 245, 'b': 245})
-            img_placeholder.fill.fore_color.rgb = RGBColor(fill_color['r'], fill_color['g'], fill_color['b'])
-            border_color = image_slide_styles.get('border_color', {'r': 200, 'g': 200, 'b': 200})
-            img_placeholder.line.color.rgb = RGBColor(border_color['r'], border_color['g'], border_color['b'])
-            img_placeholder.line.width = Pt(image_slide_styles.get('border_width', 1.5))
-            img_placeholder.line.dash_style = 2 if image_slide_styles.get('border_style', 'dashed') == 'dashed' else 1
-            text_frame = img_placeholder.text_frame
-            text_frame.word_wrap = True
-            text_frame.vertical_anchor = MSO_ANCHOR.MIDDLE
-            icon_p = text_frame.add_paragraph()
-            icon_p.text = "🖼️"
-            icon_p.alignment = PP_ALIGN.CENTER
-            icon_p.font.size = Pt(48)
-            icon_p.space_after = Pt(10)
-            prompt_p = text_frame.add_paragraph()
-            prompt_p.text = image_prompts['title']
-            prompt_p.alignment = PP_ALIGN.CENTER
-            prompt_p.font.italic = True
-            prompt_p.font.size = Pt(14)
-            prompt_p.font.color.rgb = RGBColor(100, 100, 100)
-            title_image_style = {
-                "left": image_position.get('left', 2.5),
-                "top": image_position.get('top', 4.0),
-                "width": image_position.get('width', 5.0),
-                "height": image_position.get('height', 2.5),
-                "fill_color": fill_color,
-                "border_color": border_color,
-                "border_width": image_slide_styles.get('border_width', 1.5),
-                "border_style": image_slide_styles.get('border_style', 'dashed')
-            }
-        
-        preview_data["slides"].append({
-            "type": "title",
-            "title": content_data.get("title", "Presentation"),
-            "has_image": "title" in image_prompts if image_prompts else False,
-            "image_prompt": image_prompts.get("title") if image_prompts else None,
-            "image_style": title_image_style
-        })
-        
-        # Content Slides
-        for i, slide_data in enumerate(content_data.get("slides", [])):
-            slide_index = str(i)
-            content_slide = prs.slides.add_slide(blank_slide_layout)
-            background_settings = content_slide_styles.get('background', {})
-            bg_image = content_slide_styles.get('background_image', '')
-            background = content_slide.background
-            fill = background.fill
-            if bg_image:
-                bg_image_path = os.path.abspath(os.path.join('static', bg_image))
-                logger.debug(f"Checking background image for content slide {i+1}: {bg_image_path}")
-                if os.path.exists(bg_image_path) and validate_image_format(bg_image_path):
-                    try:
-                        logger.info(f"Applying background image for content slide {i+1}: {bg_image_path}")
-                        picture = content_slide.shapes.add_picture(
-                            bg_image_path,
-                            left=0,
-                            top=0,
-                            width=SLIDE_WIDTH,
-                            height=SLIDE_HEIGHT
-                        )
-                        logger.debug(f"Picture added to content slide {i+1}: width={picture.width.inches:.2f}in, height={picture.height.inches:.2f}in, left={picture.left.inches:.2f}in, top={picture.top.inches:.2f}in")
-                        content_slide.shapes._spTree.remove(picture._element)
-                        content_slide.shapes._spTree.insert(2, picture._element)
-                    except Exception as e:
-                        logger.error(f"Failed to apply background image for content slide {i+1}: {bg_image_path}, error: {str(e)}")
-                        fill.solid()
-                        bg_color = background_settings.get('color', {'r': 255, 'g': 255, 'b': 255}) if background_settings.get('type') == 'solid' else background_settings.get('gradient_start', {'r': 255, 'g': 255, 'b': 255})
-                        fill.fore_color.rgb = RGBColor(bg_color['r'], bg_color['g'], bg_color['b'])
-                        logger.info(f"Fallback to solid color for content slide {i+1}: rgb({bg_color['r']}, {bg_color['g']}, {bg_color['b']})")
-                else:
-                    logger.error(f"Background image not found or invalid format for content slide {i+1}: {bg_image_path}")
-                    fill.solid()
-                    bg_color = background_settings.get('color', {'r': 255, 'g': 255, 'b': 255}) if background_settings.get('type') == 'solid' else background_settings.get('gradient_start', {'r': 255, 'g': 255, 'b': 255})
-                    fill.fore_color.rgb = RGBColor(bg_color['r'], bg_color['g'], bg_color['b'])
-                    logger.info(f"Fallback to solid color for content slide {i+1}: rgb({bg_color['r']}, {bg_color['g']}, {bg_color['b']})")
-            else:
-                logger.debug(f"No background image specified for content slide {i+1}, using {background_settings.get('type', 'solid')} background")
-                fill.solid()
-                bg_color = background_settings.get('color', {'r': 255, 'g': 255, 'b': 255}) if background_settings.get('type') == 'solid' else background_settings.get('gradient_start', {'r': 255, 'g': 255, 'b': 255})
-                fill.fore_color.rgb = RGBColor(bg_color['r'], bg_color['g'], bg_color['b'])
-                logger.info(f"Applied solid color for content slide {i+1}: rgb({bg_color['r']}, {bg_color['g']}, {bg_color['b']})")
-            
-            # Content slide title textbox
-            title_left = Inches(0.5)
-            title_top = Inches(0.5)
-            title_width = Inches(9.0)
-            title_height = Inches(1.2)  # Increased height for wrapped text
-            title_box = content_slide.shapes.add_textbox(title_left, title_top, title_width, title_height)
-            title_frame = title_box.text_frame
-            title_frame.word_wrap = True  # Enable word wrapping
-            title_text = slide_data.get("title", f"Slide {i+1}")
-            title_frame.text = title_text
-            logger.debug(f"Content slide {i+1} heading: '{title_text}', length: {len(title_text)}")
-            title_para = title_frame.paragraphs[0]
-            title_font = content_slide_styles.get('title_font', {})
-            title_para.font.name = title_font.get('name', 'Calibri')
-            base_font_size = title_font.get('size', 32)
-            title_para.font.size = Pt(adjust_font_size(title_text, base_font_size))
-            title_color = title_font.get('color', {'r': 0, 'g': 0, 'b': 0})
-            title_para.font.color.rgb = RGBColor(title_color['r'], title_color['g'], title_color['b'])
-            title_para.font.bold = title_font.get('bold', True)
-            title_para.alignment = {
-                'center': PP_ALIGN.CENTER,
-                'left': PP_ALIGN.LEFT,
-                'right': PP_ALIGN.RIGHT
-            }.get(title_font.get('alignment', 'left'), PP_ALIGN.LEFT)
-            
-            points_styling = []
-            if slide_data.get("points", []):
-                content_left = Inches(0.5)
-                content_top = Inches(2.0)  # Adjusted to account for taller title
-                content_width = Inches(5.0)
-                # Increase height to accommodate more content
-                content_height = Inches(5.0)  # Increased from 4.0 to 5.0 for more space
-                content_box = content_slide.shapes.add_textbox(content_left, content_top, content_width, content_height)
-                text_frame = content_box.text_frame
-                text_frame.word_wrap = True
-                text_frame.auto_size = MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE  # Auto-fit text to shape
-                body_font = content_slide_styles.get('body_font', {})
-                for point in slide_data.get("points", []):
-                    if text_frame.paragraphs and text_frame.paragraphs[0].text == "":
-                        p = text_frame.paragraphs[0]
-                    else:
-                        p = text_frame.add_paragraph()
-                    p.text = "• " + point
-                    p.font.name = body_font.get('name', 'Calibri')
-                    p.font.size = Pt(body_font.get('size', 18))
-                    body_color = body_font.get('color', {'r': 50, 'g': 50, 'b': 50})
-                    p.font.color.rgb = RGBColor(body_color['r'], body_color['g'], body_color['b'])
-                    p.space_before = Pt(6)
-                    p.space_after = Pt(6)
-                    p.alignment = {
-                        'center': PP_ALIGN.CENTER,
-                        'left': PP_ALIGN.LEFT,
-                        'right': PP_ALIGN.RIGHT
-                    }.get(body_font.get('alignment', 'left'), PP_ALIGN.LEFT)
-                    points_styling.append({
-                        "text": point,
-                        "level": 0,
-                        "font_name": body_font.get('name', 'Calibri'),
-                        "font_size": body_font.get('size', 18),
-                        "color": body_color,
-                        "alignment": body_font.get('alignment', 'left'),
-                        "space_before": 6,
-                        "space_after": 6
-                    })
-            
-            content_image_style = {}
-            if image_prompts and slide_index in image_prompts:
-                image_position = content_slide_styles.get('image_position', {'left': 6.0, 'top': 2.0, 'width': 3.5, 'height': 4.0})
-                img_left = Inches(image_position.get('left', 6.0))
-                img_top = Inches(image_position.get('top', 2.0))
-                img_width = Inches(image_position.get('width', 3.5))
-                img_height = Inches(image_position.get('height', 4.0))
-                img_placeholder = content_slide.shapes.add_shape(1, img_left, img_top, img_width, img_height)
-                img_placeholder.fill.solid()
-                fill_color = image_slide_styles.get('fill_color', {'r': 245, 'g': 245, 'b': 245})
-                img_placeholder.fill.fore_color.rgb = RGBColor(fill_color['r'], fill_color['g'], fill_color['b'])
-                border_color = image_slide_styles.get('border_color', {'r': 200, 'g': 200, 'b': 200})
-                img_placeholder.line.color.rgb = RGBColor(border_color['r'], border_color['g'], border_color['b'])
-                img_placeholder.line.width = Pt(image_slide_styles.get('border_width', 1.5))
-                img_placeholder.line.dash_style = 2 if image_slide_styles.get('border_style', 'dashed') == 'dashed' else 1
-                text_frame = img_placeholder.text_frame
-                text_frame.word_wrap = True
-                text_frame.vertical_anchor = MSO_ANCHOR.MIDDLE
-                icon_p = text_frame.add_paragraph()
-                icon_p.text = "🖼️"
-                icon_p.alignment = PP_ALIGN.CENTER
-                icon_p.font.size = Pt(48)
-                icon_p.space_after = Pt(10)
-                prompt_p = text_frame.add_paragraph()
-                prompt_p.text = image_prompts[slide_index]
-                prompt_p.alignment = PP_ALIGN.CENTER
-                prompt_p.font.italic = True
-                prompt_p.font.size = Pt(14)
-                prompt_p.font.color.rgb = RGBColor(100, 100, 100)
-                content_image_style = {
-                    "left": image_position.get('left', 6.0),
-                    "top": image_position.get('top', 2.0),
-                    "width": image_position.get('width', 3.5),
-                    "height": image_position.get('height', 4.0),
-                    "fill_color": fill_color,
-                    "border_color": border_color,
-                    "border_width": image_slide_styles.get('border_width', 1.5),
-                    "border_style": image_slide_styles.get('border_style', 'dashed')
-                }
-            
-            preview_data["slides"].append({
-                "type": "content",
-                "title": slide_data.get("title", f"Slide {i+1}"),
-                "points": slide_data.get("points", []),
-                "points_styling": points_styling,
-                "has_image": slide_index in image_prompts if image_prompts else False,
-                "image_prompt": image_prompts.get(slide_index) if image_prompts else None,
-                "image_style": content_image_style
-            })
-        
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pptx")
-        prs.save(temp_file.name)
-        temp_file.close()
-        return temp_file.name, preview_data
-    
-    except Exception as e:
-        logger.error(f"PowerPoint creation error: {str(e)}")
-        raise Exception(f"Failed to create PowerPoint: {str(e)}")
-    
+        key, topic, num_slides, custom_content = outline_request(request.json or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    started = start_prefetch(session['user_id'], key,
+                             lambda: generate_text_content(topic, num_slides, custom_content, fallback=False))
+    if started:
+        logger.info("User %s prefetching outline for: %s", session['username'], topic)
+    return jsonify({"success": True, "started": started}), 202
 
-def generate_slide_previews(pptx_path):
-    prs = Presentation(pptx_path)
-    slide_previews = []
-    
-    for slide_idx, slide in enumerate(prs.slides):
-        # Create a blank image for the slide (e.g., 960x540 pixels)
-        img = Image.new('RGB', (960, 540), color=(255, 255, 255))
-        # Here, you'd typically use a library like pptx2img or a custom renderer
-        # For simplicity, we'll simulate with text rendering (upgrade with pptx2img later)
-        from pptx.util import Inches
-        from pptx.dml.color import RGBColor
-
-        # Get slide layout (simplified)
-        title = slide.shapes.title.text if slide.shapes.title else f"Slide {slide_idx + 1}"
-        content = "\n".join([shape.text for shape in slide.shapes if shape.text and shape != slide.shapes.title])
-
-        # Draw title
-        from PIL import ImageDraw, ImageFont
-        draw = ImageDraw.Draw(img)
-        try:
-            font = ImageFont.load_default()
-            draw.text((50, 50), title, fill=(0, 0, 0), font=font)
-            y_text = 100
-            for line in content.split('\n'):
-                draw.text((50, y_text), line, fill=(50, 50, 50), font=font)
-                y_text += 30
-        except Exception as e:
-            print(f"Error rendering text for slide {slide_idx}: {e}")
-
-        # Save image to a byte stream
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        slide_previews.append({
-            'image': img_byte_arr,
-            'title': title,
-            'content': content
-        })
+def generate_image_prompt(prompt):
+    return f"Professional presentation image related to: {prompt}"
 
-    return slide_previews
-    
-@app.route('/generate_ppt', methods=['POST'])
+@bp.route('/generate_ppt', methods=['POST'])
 @login_required
+@rate_limit('generate')
+@priority('generation')
+@track_inflight
 def generate_ppt():
+    from build_pool import DECK_ENGINE, ENGINES, build_presentation
+
     try:
         data = request.json
         template = data.get('template', 'default')
-        content_type = data.get('content_type', 'auto_generate')  # 'auto_generate', 'custom'
+        engine = data.get('engine') or DECK_ENGINE
         
         # Validate template
-        if not template_manager.get_template(template):
+        if not get_template_manager().get_template(template):
             return jsonify({"error": "Invalid template selected"}), 400
-        
-        content_data = None
-        topic = None
+        if engine not in ENGINES:
+            return jsonify({"error": f"Unknown build engine: {engine}"}), 400
+        try:
+            key, topic, num_slides, custom_content = outline_request(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         image_prompts = {}
         
-        # Handle different content types
-        if content_type == 'auto_generate':
-            # Original flow - generate from topic
-            topic = data.get('topic')
-            num_slides = int(data.get('num_slides', 3))
-            
-            if not topic:
-                return jsonify({"error": "Topic is required for auto-generated content"}), 400
-            if num_slides < 1 or num_slides > 20:
-                return jsonify({"error": "Number of slides must be between 1 and 20"}), 400
-                
-            logger.info(f"User {session['username']} generating content for topic: {topic} with {num_slides} slides using template: {template}")
-            content_data = generate_text_content(topic, num_slides)
-            
-        elif content_type == 'custom':
-            # New flow - process custom content through Ollama
-            custom_content = data.get('custom_content')
-            custom_title = data.get('custom_title', 'Custom Presentation')
-            
-            if not custom_content:
-                return jsonify({"error": "Custom content is required when selecting custom content type"}), 400
-                
-            logger.info(f"User {session['username']} using custom content with template: {template}")
-            # Pass custom content to Ollama for processing
-            content_data = generate_text_content(custom_title, 0, custom_content)
-            topic = content_data.get("title", custom_title)
-            
+        if custom_content is None:
+            logger.info("User %s generating content for topic: %s with %s slides using template: %s", session['username'], topic, num_slides, template)
         else:
-            return jsonify({"error": "Invalid content type"}), 400
-        
-        # Calculate slide count (title slide + content slides)
-        slide_count = 1 + len(content_data.get('slides', []))
-        
+            logger.info("User %s using custom content with template: %s", session['username'], template)
+        with timed_stage('prefetch_wait'):
+            content_data = adopt_prefetch(session['user_id'], key)
+        if content_data is not None:
+            logger.info("Using prefetched outline for user %s", session['username'])
+        else:
+            with llm_slot(), timed_stage('llm'):
+                content_data = generate_text_content(topic, num_slides, custom_content)
+        if custom_content is not None:
+            topic = content_data.get("title", topic)
+            
         # Generate image prompts for all slides
         try:
             logger.info("Generating title image prompt")
@@ -790,162 +507,213 @@ def generate_ppt():
                 if slide_image_prompt:
                     image_prompts[str(i)] = slide_image_prompt
         except Exception as e:
-            logger.warning(f"Image prompt generation failed: {str(e)}")
+            logger.warning("Image prompt generation failed: %s", e)
             
         # Create the presentation
-        logger.info(f"Creating PowerPoint presentation with template: {template}")
-        ppt_file, preview_data = create_presentation(content_data, image_prompts, template)
+        logger.info("Creating PowerPoint presentation with template: %s", template)
+        with timed_stage('build'):
+            ppt_file, preview_data = build_presentation(content_data, image_prompts, template, engine=engine)
         
-        # Save the file
-        unique_id = uuid.uuid4().hex[:8]
-        safe_topic = topic.replace(' ', '_') if topic else 'Presentation'
-        filename = f"{safe_topic}_{unique_id}.pptx"
-        user_filename = os.path.join("static", "downloads", filename)
-        os.makedirs(os.path.dirname(user_filename), exist_ok=True)
-        with open(ppt_file, 'rb') as src, open(user_filename, 'wb') as dst:
-            dst.write(src.read())
-        os.unlink(ppt_file)
+        # Save the file and record it in the user's history
+        filename = store_deck(ppt_file, topic or 'Presentation')
+        presentation_id = save_to_history(content_data.get("title", topic), filename, template,
+                                          content_data, image_prompts)
         
-        # Save presentation to user's history
-        try:
-            conn = get_db()
-            c = conn.cursor()
-            c.execute('''
-                INSERT INTO presentations (user_id, title, filename, template, slide_count)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (session['user_id'], content_data.get("title", topic), filename, template, slide_count))
-            conn.commit()
-            conn.close()
-            logger.info(f"Saved presentation to user {session['username']}'s history")
-        except sqlite3.Error as e:
-            logger.error(f"Failed to save presentation to history: {str(e)}")
+        if data.get('preview_version') == LEGACY_PREVIEW_FORMAT_VERSION:
+            preview_data = expand_preview_data(preview_data, content_data, image_prompts)
         
         return jsonify({
             "success": True,
+            "id": presentation_id,
             "filename": filename,
-            "download_url": f"/static/downloads/{filename}",
+            "download_url": f"/download/{filename}",
             "content": content_data,
             "image_prompts": image_prompts,
             "template": template,
             "preview_data": preview_data
         })
+    except Overloaded as e:
+        return overloaded_response(str(e), 503, e.retry_after)
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}")
+        logger.error("Error processing request: %s", e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/update_ppt', methods=['POST'])
+@bp.route('/update_ppt', methods=['POST'])
 @login_required
+@rate_limit('update')
+@priority('interactive')
+@track_inflight
 def update_ppt():
+    from build_pool import DECK_ENGINE, ENGINES, build_presentation
+
     try:
         data = request.json
         content_data = data.get('content')
         image_prompts = data.get('image_prompts', {})
         template = data.get('template', 'default')
+        engine = data.get('engine') or DECK_ENGINE
         if not content_data or 'title' not in content_data or 'slides' not in content_data:
             return jsonify({"error": "Invalid presentation content"}), 400
-        logger.info(f"User {session['username']} updating PowerPoint presentation")
-        
-        # Calculate slide count (title slide + content slides)
-        slide_count = 1 + len(content_data.get('slides', []))
-        
-        ppt_file, preview_data = create_presentation(content_data, image_prompts, template)
-        unique_id = uuid.uuid4().hex[:8]
-        topic = content_data.get("title", "Presentation").replace(' ', '_')
-        filename = f"{topic}_{unique_id}.pptx"
-        user_filename = os.path.join("static", "downloads", filename)
-        os.makedirs(os.path.dirname(user_filename), exist_ok=True)
-        with open(ppt_file, 'rb') as src, open(user_filename, 'wb') as dst:
-            dst.write(src.read())
-        os.unlink(ppt_file)
-        
-        # Save updated presentation to user's history
-        try:
-            conn = get_db()
-            c = conn.cursor()
-            c.execute('''
-                INSERT INTO presentations (user_id, title, filename, template, slide_count)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (session['user_id'], content_data.get("title", topic), filename, template, slide_count))
-            conn.commit()
-            conn.close()
-            logger.info(f"Saved updated presentation to user {session['username']}'s history")
-        except sqlite3.Error as e:
-            logger.error(f"Failed to save updated presentation to history: {str(e)}")
+        if engine not in ENGINES:
+            return jsonify({"error": f"Unknown build engine: {engine}"}), 400
+        logger.info("User %s updating PowerPoint presentation", session['username'])
+        
+        with timed_stage('build'):
+            ppt_file, preview_data = build_presentation(content_data, image_prompts, template, pool='interactive', engine=engine)
+        title = content_data.get("title", "Presentation")
+        filename = store_deck(ppt_file, title)
+        presentation_id = save_to_history(title, filename, template, content_data, image_prompts)
+            
+        if data.get('preview_version') == LEGACY_PREVIEW_FORMAT_VERSION:
+            preview_data = expand_preview_data(preview_data, content_data, image_prompts)
             
         return jsonify({
             "success": True,
+            "id": presentation_id,
             "filename": filename,
-            "download_url": f"/static/downloads/{filename}",
+            "download_url": f"/download/{filename}",
             "preview_data": preview_data
         })
     except Exception as e:
-        logger.error(f"Error updating presentation: {str(e)}")
+        logger.error("Error updating presentation: %s", e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/welcome')
+def load_presentation(presentation_id):
+    """Return the current user's presentations row with its unpacked content, or None."""
+    conn = get_db()
+    try:
+        row = conn.execute('SELECT * FROM presentations WHERE id = ? AND user_id = ?',
+                           (presentation_id, session['user_id'])).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None, None, None
+    content_data, image_prompts = unpack_content(row['content']) if row['content'] else (None, None)
+    return row, content_data, image_prompts
+
+@bp.route('/presentations/<int:presentation_id>')
+@login_required
+def get_presentation(presentation_id):
+    row, content_data, image_prompts = load_presentation(presentation_id)
+    if row is None:
+        return jsonify({"error": "Presentation not found"}), 404
+    return jsonify({
+        "success": True,
+        "id": row['id'],
+        "title": row['title'],
+        "template": row['template'],
+        "filename": row['filename'],
+        "created_at": row['created_at'],
+        "content": content_data,
+        "image_prompts": image_prompts
+    })
+
+@bp.route('/presentations/<int:presentation_id>/render', methods=['POST'])
+@login_required
+@rate_limit('update')
+@priority('interactive')
+@track_inflight
+def render_presentation(presentation_id):
+    """Rebuild a stored deck, optionally with another template, without calling the LLM.
+
+    POST only: every call stores a new deck and history row. template, engine and
+    preview_version are read from the JSON body, or from the query string.
+    """
+    from build_pool import DECK_ENGINE, ENGINES, build_presentation
+
+    try:
+        options = request.args.to_dict()
+        options.update(request.get_json(silent=True) or {})
+        row, content_data, image_prompts = load_presentation(presentation_id)
+        if row is None:
+            return jsonify({"error": "Presentation not found"}), 404
+        if content_data is None:
+            return jsonify({"error": "This presentation was saved without its content and cannot be re-rendered"}), 409
+        template = options.get('template') or row['template']
+        if get_template_manager().get_template(template) is None:
+            return jsonify({"error": f"Unknown template: {template}"}), 400
+        engine = options.get('engine') or DECK_ENGINE
+        if engine not in ENGINES:
+            return jsonify({"error": f"Unknown build engine: {engine}"}), 400
+        logger.info("User %s re-rendering presentation %s with template %s", session['username'], presentation_id, template)
+
+        with timed_stage('build'):
+            ppt_file, preview_data = build_presentation(content_data, image_prompts, template, pool='interactive', engine=engine)
+        filename = store_deck(ppt_file, row['title'])
+        new_id = save_to_history(row['title'], filename, template, content_data, image_prompts)
+
+        # Compared as text: from the query string it is not a number
+        if str(options.get('preview_version')) == str(LEGACY_PREVIEW_FORMAT_VERSION):
+            preview_data = expand_preview_data(preview_data, content_data, image_prompts)
+
+        return jsonify({
+            "success": True,
+            "id": new_id,
+            "filename": filename,
+            "download_url": f"/download/{filename}",
+            "content": content_data,
+            "image_prompts": image_prompts,
+            "template": template,
+            "preview_data": preview_data
+        })
+    except Exception as e:
+        logger.error("Error re-rendering presentation %s: %s", presentation_id, e)
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/welcome')
 def welcome():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('welcome.html')
 
-@app.route('/')
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('welcome'))
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.welcome'))
 
-from flask import flash, redirect, url_for, render_template, session
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import sqlite3
-
-@app.route('/profile')
+@bp.route('/profile')
 @login_required
 def profile():
-    print(f"Session contents: {session}")
+    from dateutil.relativedelta import relativedelta
+
+    conn = None
     try:
         user_id = int(session['user_id'])
-        print(f"User ID: {user_id}")
-        conn = get_db()
-        c = conn.cursor()
-        
-        # Fetch user data
-        c.execute('SELECT username, email, created_at FROM users WHERE id = ?', (user_id,))
-        user = c.fetchone()
-        print(f"User: {user}")
+        user = find_user('id', user_id)
         if not user:
             flash('User not found.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         if not user['username']:
             flash('Invalid username.', 'error')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         user = {'username': user['username'], 'email': user['email'], 'created_at': user['created_at']}
+        conn = get_db()
+        c = conn.cursor()
         
         # Fetch total presentation count
         c.execute('SELECT COUNT(*) as count FROM presentations WHERE user_id = ?', (user_id,))
         presentation_count = c.fetchone()['count']
-        print(f"Presentation count: {presentation_count}")
         
         # Fetch monthly count
         month_start = datetime.now() - relativedelta(months=1)
         c.execute('SELECT COUNT(*) as count FROM presentations WHERE user_id = ? AND created_at >= ?', 
                   (user_id, month_start))
         presentations_this_month = c.fetchone()['count']
-        print(f"Monthly count: {presentations_this_month}")
         
         # Fetch weekly count
         week_start = datetime.now() - relativedelta(days=7)
         c.execute('SELECT COUNT(*) as count FROM presentations WHERE user_id = ? AND created_at >= ?', 
                   (user_id, week_start))
         presentations_this_week = c.fetchone()['count']
-        print(f"Weekly count: {presentations_this_week}")
         
         # Fetch graph data
         c.execute('SELECT DATE(created_at) as date, COUNT(*) as count FROM presentations WHERE user_id = ? AND created_at >= ? GROUP BY DATE(created_at)', 
                   (user_id, month_start))
         graph_data_raw = c.fetchall()
         graph_data = [{'date': row['date'], 'count': row['count']} for row in graph_data_raw]
-        print(f"Graph data: {graph_data}")
+        logger.debug("Profile stats for user %s: total=%s month=%s week=%s days=%s", user_id,
+                     presentation_count, presentations_this_month, presentations_this_week, len(graph_data))
         
         # Fetch recent presentations
         c.execute('SELECT title, created_at, slide_count FROM presentations WHERE user_id = ? ORDER BY created_at DESC LIMIT 5', 
@@ -960,62 +728,135 @@ def profile():
                               graph_data=graph_data,
                               recent_presentations=recent_presentations)
     except Exception as e:
-        print(f"Profile route error: {str(e)}")
+        logger.error("Profile route error: %s", e)
         flash(f'Error: {str(e)}', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     finally:
-        conn.close()
+        if conn is not None:
+            conn.close()
 
-@app.route('/static/<path:path>')
+@bp.route('/static/<path:path>')
 def serve_static(path):
-    logger.debug(f"Serving static file: {path}")
-    return app.send_static_file(path)
+    logger.debug("Serving static file: %s", path)
+    return current_app.send_static_file(path)
 
-@app.route('/get_templates', methods=['GET'])
+@bp.route('/get_templates', methods=['GET'])
 def get_templates():
+    """The template catalog; styles are included with ?styles=1."""
     try:
-        templates = template_manager.get_all_templates()
-        template_response = {}
-        for key, template in templates.items():
-            template_response[key] = {
-                "name": template.get('name', key),
-                "description": template.get('description', ''),
-                "preview_image": template.get('preview_image', ''),
-                "styles": template.get('styles', {})
-            }
-        logger.info(f"Returning {len(template_response)} templates")
-        return jsonify({
-            "success": True,
-            "templates": template_response
-        })
+        include_styles = request.args.get('styles', '0').lower() in ('1', 'true', 'yes')
+        body, etag = get_catalog(include_styles)
+        response = Response(body, mimetype='application/json')
+        # Weak: the compression hook may send the same catalog gzip- or brotli-encoded
+        response.set_etag(etag, weak=True)
+        # Clients keep the catalog and revalidate it, getting a 304 while it is unchanged
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
-        logger.error(f"Error retrieving templates: {str(e)}")
+        logger.error("Error retrieving templates: %s", e)
         return jsonify({"error": "Failed to retrieve templates"}), 500
 
-@app.route('/download/<filename>')
+@bp.route('/template-previews/<path:filename>')
+def template_preview(filename):
+    # Variant names change with their source image, so they can be cached for good
+    response = send_from_directory(os.path.abspath(PREVIEW_CACHE_DIR), filename, max_age=PREVIEW_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={PREVIEW_MAX_AGE}, immutable'
+    return response
+
+@bp.route('/download/<filename>')
 @login_required
 def download_file(filename):
-    file_path = os.path.join("static", "downloads", filename)
-    if not os.path.exists(file_path):
-        logger.error(f"Download file not found: {file_path}")
-        return jsonify({"error": "File not found"}), 404
-    
     # Verify this presentation belongs to the current user
     conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT * FROM presentations WHERE user_id = ? AND filename = ?', 
-             (session['user_id'], filename))
-    presentation = c.fetchone()
-    conn.close()
+    try:
+        c = conn.cursor()
+        c.execute('SELECT id FROM presentations WHERE user_id = ? AND filename = ?',
+                  (session['user_id'], filename))
+        presentation = c.fetchone()
+    finally:
+        conn.close()
     
     if not presentation:
-        logger.warning(f"User {session['username']} attempted to access unauthorized file: {filename}")
+        logger.warning("User %s attempted to access unauthorized file: %s", session['username'], filename)
         return jsonify({"error": "Unauthorized access"}), 403
-        
-    logger.info(f"User {session['username']} downloading file: {file_path}")
-    return send_file(file_path, as_attachment=True)
+    if not get_storage().exists(filename):
+        logger.error("Download file not found: %s", filename)
+        return jsonify({"error": "File not found"}), 404
+
+    logger.info("User %s downloading file: %s", session['username'], filename)
+    return send_deck(filename)
+
+@bp.route('/user/export')
+@login_required
+def export_presentations():
+    """Stream a zip of the user's decks: all of them, or those listed in ?ids=1,2,3."""
+    ids = request.args.get('ids', '').strip()
+    try:
+        id_list = [int(part) for part in ids.split(',') if part.strip()] if ids else []
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of presentation ids"}), 400
+
+    # One ownership check for the whole batch
+    query = 'SELECT id, filename FROM presentations WHERE user_id = ?'
+    params = [session['user_id']]
+    if id_list:
+        query += f" AND id IN ({', '.join('?' * len(id_list))})"
+        params += id_list
+    conn = get_db()
+    try:
+        rows = conn.execute(query + ' ORDER BY created_at', params).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return jsonify({"error": "No presentations to export"}), 404
+
+    entries = [(row['filename'], row['filename']) for row in rows]
+    logger.info("User %s exporting %s presentation(s)", session['username'], len(entries))
+    response = Response(stream_with_context(stream_zip(entries, open_entry=get_storage().open)),
+                        mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="presentations_{datetime.now():%Y%m%d}.zip"'
+    return response
+
+@bp.route('/health')
+def health():
+    return jsonify({
+        "status": "ok",
+        "ollama": get_ollama_monitor().snapshot()
+    })
+
+@bp.route('/scheduler/stats')
+@login_required
+def scheduler_status():
+    return jsonify({
+        "success": True,
+        "scheduler": scheduler_stats(),
+        "prefetch": prefetch_stats(),
+        "auth": auth_stats(),
+        "ollama": get_ollama_monitor().snapshot(detail=True)
+    })
 
-@app.route('/user/history')
+@bp.route('/debug/profiles')
+@login_required
+def debug_profiles():
+    """Request profiles kept by profiling.py; admins only."""
+    if not profiling_enabled() or not is_profiling_admin():
+        return jsonify({"error": "Not found"}), 404
+    profiles = list_profiles()
+    for profile in profiles:
+        profile["downloads"] = {suffix[1:]: url_for('main.debug_profile_file', filename=profile["id"] + suffix)
+                                for suffix in PROFILE_FILE_SUFFIXES}
+    return jsonify({"success": True, "profiles": profiles})
+
+@bp.route('/debug/profiles/<filename>')
+@login_required
+def debug_profile_file(filename):
+    if not profiling_enabled() or not is_profiling_admin() or not filename.endswith(PROFILE_FILE_SUFFIXES):
+        return jsonify({"error": "Not found"}), 404
+    # The .txt summary shows in the browser; the .prof pstats file is downloaded
+    return send_from_directory(os.path.abspath(PROFILE_DIR), filename, as_attachment=filename.endswith('.prof'),
+                               mimetype='text/plain' if filename.endswith('.txt') else 'application/octet-stream')
+
+@bp.route('/user/history')
 @login_required
 def user_history():
     conn = get_db()
@@ -1037,11 +878,70 @@ def user_history():
         } for p in presentations]
     })
 
-if __name__ == '__main__':
+@bp.route('/user/search')
+@login_required
+def user_search():
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(100, max(1, request.args.get('per_page', 20, type=int)))
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    conn = get_db()
+    try:
+        with timed_stage('search'):
+            presentations, has_more = search_presentations(conn, session['user_id'], query,
+                                                           limit=per_page, offset=(page - 1) * per_page)
+    except sqlite3.Error as e:
+        logger.error("Search failed for user %s: %s", session['user_id'], e)
+        return jsonify({"error": "Search failed"}), 500
+    finally:
+        conn.close()
+
+    return jsonify({
+        "success": True,
+        "query": query,
+        "page": page,
+        "per_page": per_page,
+        "has_more": has_more,
+        "results": [{
+            "id": p['id'],
+            "title": p['title'],
+            "filename": p['filename'],
+            "template": p['template'],
+            "slide_count": p['slide_count'],
+            "created_at": p['created_at'],
+            "snippet": p['snippet'],
+            "download_url": f"/download/{p['filename']}"
+        } for p in presentations]
+    })
+
+def create_app():
+    """Application factory used by `flask run`, WSGI servers and tests."""
+    configure_logging()
+    app = Flask(__name__)
+    # Every worker process must share the same key for sessions to survive load balancing
+    app.secret_key = os.environ.get('SECRET_KEY', 'your_secret_key')  # Change this to a secure random string in production
+    CORS(app)
+    init_request_logging(app)
+    init_compression(app)
+    init_profiling(app)
+    # Probe and warm Ollama from each serving process (see ollama_health.py)
+    app.before_request(start_ollama_monitor)
+    # Preview payloads are large; skip key sorting and pretty-printing
+    app.json.sort_keys = False
+    app.json.compact = True
+    app.register_blueprint(bp)
+
     # Initialize database
     init_db()
-    
-    # Create directories if needed
-    os.makedirs(os.path.join("static", "downloads"), exist_ok=True)
-    
-    app.run(debug=True)
\ No newline at end of file
+
+    # Fail at startup, not on the first deck, if the storage is misconfigured
+    get_storage()
+    return app
+
+if __name__ == '__main__':
+    # The development server logs at DEBUG unless LOG_LEVEL says otherwise
+    os.environ.setdefault('APP_ENV', 'development')
+    app = create_app()
+    app.run(debug=True)
@@ -0,0 +1,217 @@
+"""Password hashing off the request threads, and a short-lived user cache.
+
+Hashing a password is deliberately expensive CPU work (werkzeug's scrypt by
+default, ~100ms). Done inline, a burst of sign-ins at the start of a class ties
+up request threads and cores that deck generation needs. Instead, register and
+login hand hashing to a small per-process thread pool:
+
+- At most PASSWORD_HASH_WORKERS hashes run at once per process; hashlib
+  releases the GIL while hashing, so other request threads keep running.
+- The pool threads run at a lower CPU priority (PASSWORD_HASH_NICE, Linux), so
+  when cores are contended the deck builders win.
+- At most PASSWORD_HASH_MAX_PENDING hashes may be running or queued. Past that,
+  or after waiting PASSWORD_HASH_TIMEOUT seconds, the request gets
+  rate_limit.Overloaded (503 with Retry-After) instead of piling up.
+
+PASSWORD_HASH_METHOD sets the algorithm and cost, in werkzeug's method syntax
+(e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'). A successful login with a
+hash made under other parameters is rehashed in the background and saved, so
+changing the setting upgrades users as they sign in.
+
+User rows fetched by id or email are kept for USER_CACHE_TTL seconds, so
+repeated lookups (a login storm, the profile page) do not each hit SQLite.
+Only existing users are cached; anything that changes a user must call
+invalidate().
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from logging_config import record_stage
+from rate_limit import Overloaded
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+PASSWORD_HASH_NICE = int(os.environ.get('PASSWORD_HASH_NICE', 10))
+PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 5))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # werkzeug fills in defaults (e.g. 'pbkdf2' becomes 'pbkdf2:sha256:<iterations>'),
+    # so the stored prefix is only known from a real hash
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def _lower_thread_priority():
+    try:
+        thread_id = threading.get_native_id()
+        current = os.getpriority(os.PRIO_PROCESS, thread_id)
+        os.setpriority(os.PRIO_PROCESS, thread_id, min(19, current + PASSWORD_HASH_NICE))
+    except (AttributeError, OSError) as e:
+        logger.debug("Could not lower password hashing thread priority: %s", e)
+
+
+def _verify(stored_hash, password, method):
+    if not check_password_hash(stored_hash, password):
+        return False, False
+    return True, stored_hash.split('$', 1)[0] != _method_prefix(method)
+
+
+class PasswordHasher:
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 timeout=PASSWORD_HASH_TIMEOUT, method=PASSWORD_HASH_METHOD):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def _get_executor(self):
+        # An executor inherited over fork has lost its threads; start a fresh one
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash',
+                                                initializer=_lower_thread_priority)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                logger.warning("Password hashing saturated (%s pending), shedding request", self.pending)
+                raise Overloaded("Too many sign-ins right now, please try again shortly", PASSWORD_HASH_RETRY_AFTER)
+            self.pending += 1
+            future = self._get_executor().submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    def _run(self, fn, *args):
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Password hashing did not finish within %ss, shedding request", self.timeout)
+            raise Overloaded("Too many sign-ins right now, please try again shortly", PASSWORD_HASH_RETRY_AFTER)
+        finally:
+            record_stage('password_hash', time.perf_counter() - started)
+
+    def hash(self, password):
+        """Hash password with the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """Return (matches, needs_rehash) for password against stored_hash."""
+        return self._run(_verify, stored_hash, password, self.method)
+
+    def rehash(self, password, save):
+        """Hash password with the current method in the background and call save(new_hash).
+
+        Skipped when the pool is busy; the next login tries again.
+        """
+        def task():
+            new_hash = generate_password_hash(password, method=self.method)
+            try:
+                save(new_hash)
+                with self._lock:
+                    self.rehashed += 1
+            except Exception as e:
+                logger.error("Failed to save rehashed password: %s", e)
+
+        try:
+            self._submit(task)
+        except Overloaded:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "method": self.method,
+                "workers": self.workers,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+            }
+
+
+class UserCache:
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires, user dict)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load):
+        """Return the cached user for key, or load() it (a dict or None) and cache it."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        user = load()
+        if user is not None and self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (now + self.ttl, user)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_hasher = PasswordHasher()
+_user_cache = UserCache()
+
+
+def get_password_hasher():
+    return _hasher
+
+
+def get_user_cache():
+    return _user_cache
+
+
+def auth_stats():
+    return {"password_hashing": _hasher.stats(), "user_cache": _user_cache.stats()}
@@ -0,0 +1,234 @@
+"""Compare the deck build engines for speed, memory and equivalent output.
+
+Times create_presentation of every engine in build_pool.ENGINES over decks of
+several sizes and templates, each engine in a fresh process so its peak RSS
+includes what it imports. Then validates the direct engine against python-pptx:
+both decks of each case are reopened with python-pptx and must have the same
+slides, shapes, text and fonts, the same slide XML, the same images and the same
+preview_data. Finally checks that slide fragments the 'default' build pool
+rendered are reused when the 'interactive' pool rebuilds the deck after an edit,
+as update_ppt does after generate_ppt.
+
+    python bench_engines.py --slides 5 10 20 --runs 5
+    python bench_engines.py --validate-only
+
+Exits non-zero if validation finds a difference or the rebuild misses the cache.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+import zipfile
+
+from lxml import etree
+
+EDGE_CASES = [
+    {"title": "Ampersands & <angle brackets> \"quoted\"", "slides": [
+        {"title": "Line\nbreaks and\vtabs\tin a title", "points": ["A point\nwith a line break", "Control \x07 character"]},
+        {"title": "No points", "points": []},
+        {"title": "", "points": [""]},
+        {"title": "A very long slide title that will not fit on a single line at the template's size, "
+                  "so it has to be shrunk to fit", "points": ["word " * 60]},
+    ]},
+]
+
+
+def sample_deck(num_slides, points=4):
+    return {
+        "title": f"Benchmark deck with {num_slides} slides",
+        "slides": [
+            {"title": f"Slide {n + 1}: a representative heading",
+             "points": [f"Point {p + 1} on slide {n + 1}, about as long as a generated bullet usually is" for p in range(points)]}
+            for n in range(num_slides)
+        ],
+    }
+
+
+def image_prompts_for(deck):
+    prompts = {"title": f"Professional presentation image related to: {deck['title']}"}
+    prompts.update({str(n): f"Image for {slide['title']}" for n, slide in enumerate(deck['slides'])})
+    return prompts
+
+
+def run_child(engine, slide_counts, templates, runs):
+    # Build in this process and print timings and peak RSS as JSON
+    from build_pool import _build
+    started = time.perf_counter()
+    _build(sample_deck(1), None, templates[0], engine)  # Imports and first-use setup
+    first = time.perf_counter() - started
+    results = {"engine": engine, "first_build": first, "cases": []}
+    for template in templates:
+        for num_slides in slide_counts:
+            deck = sample_deck(num_slides)
+            prompts = image_prompts_for(deck)
+            times, sizes = [], []
+            for _ in range(runs):
+                started = time.perf_counter()
+                path, _ = _build(deck, prompts, template, engine)
+                times.append(time.perf_counter() - started)
+                sizes.append(os.path.getsize(path))
+                os.unlink(path)
+            results["cases"].append({"template": template, "slides": num_slides,
+                                     "median": statistics.median(times), "bytes": sizes[-1]})
+    results["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps(results))
+
+
+def benchmark(engines, slide_counts, templates, runs):
+    reports = {}
+    for engine in engines:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', engine, '--runs', str(runs),
+             '--slides', *map(str, slide_counts), '--templates', *templates],
+            capture_output=True, text=True, check=True
+        ).stdout
+        reports[engine] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'engine':<8} {'first build':>12} {'peak RSS':>10}")
+    for engine, report in reports.items():
+        print(f"{engine:<8} {report['first_build'] * 1000:10.0f}ms {report['max_rss_kb'] / 1024:8.1f}MB")
+    print()
+    print(f"{'template':<10} {'slides':>6} " + ' '.join(f"{engine:>14}" for engine in reports))
+    for index, case in enumerate(next(iter(reports.values()))["cases"]):
+        cells = ' '.join(f"{r['cases'][index]['median'] * 1000:7.1f}ms {r['cases'][index]['bytes'] // 1024:4d}K"
+                         for r in reports.values())
+        print(f"{case['template']:<10} {case['slides']:>6} {cells}")
+
+
+def _canonical(xml):
+    return etree.tostring(etree.fromstring(xml), method='c14n')
+
+
+def _describe(path):
+    """What python-pptx sees in a deck: per slide, its background and shapes."""
+    from pptx import Presentation
+    slides = []
+    for slide in Presentation(path).slides:
+        shapes = []
+        for shape in slide.shapes:
+            described = [shape.shape_type, shape.name, shape.left, shape.top, shape.width, shape.height]
+            if shape.has_text_frame:
+                for paragraph in shape.text_frame.paragraphs:
+                    font = paragraph.font
+                    color = font.color.rgb if font.color and font.color.type is not None else None
+                    described.append((paragraph.text, paragraph.alignment, font.name, font.size, font.bold,
+                                      font.italic, str(color), paragraph.space_before, paragraph.space_after))
+            if shape.shape_type == 13:  # Picture
+                described.append(shape.image.sha1)
+            shapes.append(described)
+        slides.append((slide.background.fill.type, slide.slide_layout.name, shapes))
+    return slides
+
+
+def _parts(path):
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def validate(templates, slide_counts):
+    from build_pool import _build
+    cases = [(sample_deck(n), True) for n in slide_counts] + [(sample_deck(3), False)] + [(deck, True) for deck in EDGE_CASES]
+    failures = 0
+    for template in templates:
+        for deck, with_prompts in cases:
+            prompts = image_prompts_for(deck) if with_prompts else None
+            label = f"{template}/{len(deck['slides'])} slides{'' if with_prompts else ' without images'}"
+            reference_path, reference_preview = _build(deck, prompts, template, 'pptx')
+            direct_path, direct_preview = _build(deck, prompts, template, 'direct')
+            try:
+                problems = []
+                if direct_preview != reference_preview:
+                    problems.append("preview_data differs")
+                if _describe(direct_path) != _describe(reference_path):
+                    problems.append("python-pptx reads different slides")
+                reference_parts, direct_parts = _parts(reference_path), _parts(direct_path)
+                if set(direct_parts) != set(reference_parts):
+                    problems.append(f"parts differ: {sorted(set(direct_parts) ^ set(reference_parts))}")
+                for name in sorted(set(direct_parts) & set(reference_parts)):
+                    if name.startswith('ppt/slides/'):
+                        if _canonical(direct_parts[name]) != _canonical(reference_parts[name]):
+                            problems.append(f"{name} differs")
+                    elif name.startswith('ppt/media/') and direct_parts[name] != reference_parts[name]:
+                        problems.append(f"{name} differs")
+            finally:
+                os.unlink(reference_path)
+                os.unlink(direct_path)
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {label}" + ''.join(f"\n     {p}" for p in problems))
+    return failures
+
+
+def check_shared_cache(template, num_slides=5):
+    """Generate a deck in the 'default' build pool, edit one slide and rebuild it in
+    the 'interactive' pool; every unchanged slide must come from the shared cache.
+    Returns the number of failures.
+    """
+    from build_pool import BUILD_POOL_INTERACTIVE_WORKERS, BUILD_POOL_WORKERS, build_presentation, get_build_pool
+    from slide_cache import SLIDE_CACHE_DIR, slide_cache_stats
+
+    if BUILD_POOL_WORKERS <= 0 or BUILD_POOL_INTERACTIVE_WORKERS != 1 or not SLIDE_CACHE_DIR:
+        print("skip shared slide cache (needs BUILD_POOL_WORKERS > 0, BUILD_POOL_INTERACTIVE_WORKERS=1 "
+              "and SLIDE_CACHE_DIR)")
+        return 0
+    # Titles no earlier run has cached
+    run = uuid.uuid4().hex[:8]
+    deck = sample_deck(num_slides)
+    deck["title"] += f" ({run})"
+    for slide in deck["slides"]:
+        slide["title"] += f" ({run})"
+    prompts = image_prompts_for(deck)
+    interactive = get_build_pool('interactive')
+    before = interactive.submit(slide_cache_stats).result()
+
+    path, _ = build_presentation(deck, prompts, template, pool='default', engine='pptx')
+    os.unlink(path)
+    deck["slides"][1]["points"] = deck["slides"][1]["points"][:-1] + ["An edited point"]
+    path, _ = build_presentation(deck, prompts, template, pool='interactive', engine='pptx')
+    os.unlink(path)
+
+    after = interactive.submit(slide_cache_stats).result()
+    reused = after["disk_hits"] - before["disk_hits"]
+    expected = num_slides  # The title slide and every content slide but the edited one
+    ok = reused == expected and after["misses"] - before["misses"] == 1
+    print(f"{'ok  ' if ok else 'FAIL'} {template}/update after generate reused {reused} of {expected} unchanged slides "
+          f"from the shared cache")
+    return 0 if ok else 1
+
+
+def main():
+    from build_pool import ENGINES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES))
+    parser.add_argument('--slides', nargs='+', type=int, default=[5, 10, 20])
+    parser.add_argument('--templates', nargs='+', default=None, help='Template ids (default: all)')
+    parser.add_argument('--runs', type=int, default=5, help='Builds per case; the median is reported')
+    parser.add_argument('--validate-only', action='store_true')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    templates = args.templates
+    if templates is None:
+        from template_manager import get_template_manager
+        templates = sorted(get_template_manager().get_all_templates())
+
+    if args.child:
+        run_child(args.child, args.slides, templates, args.runs)
+        return
+    if not args.validate_only:
+        benchmark(args.engines, args.slides, templates, args.runs)
+        print()
+    failures = validate(templates, args.slides)
+    print(f"\n{failures} case(s) differ" if failures else "\nThe direct engine matches python-pptx")
+    print()
+    failures += check_shared_cache(templates[0])
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Compare prompt template versions for latency and output quality.
+
+Runs every topic through each prompt version against a live Ollama and reports
+per version: wall time, prompt and output token counts, tokens/s, and simple
+quality measures (valid JSON, requested slide count met, points per slide and
+words per point).
+
+    python bench_prompts.py --versions v1 v2 --slides 5 10 --runs 2
+    python bench_prompts.py --custom-file notes.txt
+
+Numbers from the stub Ollama (--stub) only check that the script works.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import requests
+
+from ollama_health import OLLAMA_ENDPOINT, OLLAMA_MODEL, OLLAMA_TIMEOUT
+from prompts import PROMPT_TEMPLATES, build_prompt
+
+DEFAULT_TOPICS = ['Photosynthesis', 'The history of the printing press', 'Introduction to machine learning']
+
+
+def run_once(endpoint, topic, num_slides, custom_content, version):
+    prompt, options = build_prompt(topic, num_slides, custom_content, version=version)
+    started = time.perf_counter()
+    response = requests.post(endpoint, json={
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": False,
+        "format": "json",
+        "options": options
+    }, timeout=OLLAMA_TIMEOUT)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    result = response.json()
+
+    sample = {
+        "seconds": elapsed,
+        "prompt_tokens": result.get('prompt_eval_count'),
+        "output_tokens": result.get('eval_count'),
+        "tokens_per_sec": (result['eval_count'] / (result['eval_duration'] / 1e9)
+                           if result.get('eval_count') and result.get('eval_duration') else None),
+        "num_predict": options['num_predict'],
+        "valid": False,
+    }
+    try:
+        deck = json.loads(result['response'])
+        slides = deck['slides']
+        points = [point for slide in slides for point in slide['points']]
+        sample.update({
+            "valid": True,
+            "slides_ok": not num_slides or len(slides) >= num_slides,
+            "points_per_slide": len(points) / max(1, len(slides)),
+            "words_per_point": statistics.mean(len(str(p).split()) for p in points) if points else 0,
+        })
+    except (ValueError, KeyError, TypeError):
+        pass
+    return sample
+
+
+def summarize(version, samples):
+    def mean(key):
+        values = [s[key] for s in samples if s.get(key) is not None]
+        return statistics.mean(values) if values else float('nan')
+
+    valid = [s for s in samples if s['valid']]
+    print(f"{version:>4}  runs={len(samples):<3} "
+          f"time={mean('seconds'):6.2f}s  in={mean('prompt_tokens'):6.0f}  out={mean('output_tokens'):6.0f}  "
+          f"tok/s={mean('tokens_per_sec'):6.1f}  valid={len(valid)}/{len(samples)}  "
+          f"slides_ok={sum(1 for s in valid if s['slides_ok'])}/{len(samples)}  "
+          f"points/slide={mean('points_per_slide'):4.1f}  words/point={mean('words_per_point'):4.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--versions', nargs='+', default=sorted(PROMPT_TEMPLATES))
+    parser.add_argument('--topics', nargs='+', default=DEFAULT_TOPICS)
+    parser.add_argument('--slides', nargs='+', type=int, default=[5])
+    parser.add_argument('--runs', type=int, default=1, help='Repetitions per topic and slide count')
+    parser.add_argument('--custom-file', help='Benchmark the custom-content prompt with this text instead')
+    parser.add_argument('--endpoint', default=OLLAMA_ENDPOINT)
+    parser.add_argument('--stub', action='store_true', help='Run against a local stub Ollama')
+    args = parser.parse_args()
+
+    endpoint = args.endpoint
+    if args.stub:
+        from stub_ollama import start_stub_ollama
+        _, base_url = start_stub_ollama(delay=0.05)
+        endpoint = f"{base_url}/api/generate"
+
+    custom_content = None
+    if args.custom_file:
+        with open(args.custom_file, encoding='utf-8') as file:
+            custom_content = file.read()
+
+    for version in args.versions:
+        samples = []
+        for _ in range(args.runs):
+            for topic in args.topics:
+                for num_slides in ([0] if custom_content else args.slides):
+                    try:
+                        samples.append(run_once(endpoint, topic, num_slides, custom_content, version))
+                    except requests.RequestException as e:
+                        print(f"{version}: request failed for {topic!r}: {e}")
+        if samples:
+            summarize(version, samples)
+
+
+if __name__ == '__main__':
+    main()
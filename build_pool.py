@@ -0,0 +1,161 @@
+"""Run create_presentation in a dedicated process pool.
+
+Building a deck is CPU-bound and holds the GIL (python-pptx object model, lxml,
+PIL and zip compression in prs.save), so with threaded workers one large build
+stalls every other request in the process. build_presentation sends the plain,
+picklable inputs (content dict, image prompts, template id) to a pool of warm
+builder processes and gets back the temp .pptx path and preview_data.
+
+Interactive rebuilds (update_ppt) get their own small pool so they never
+queue behind a backlog of fresh generations.
+
+Each build names an engine: 'pptx' (presentation_builder, the python-pptx
+object model) or 'direct' (ooxml_builder, which writes the slide XML itself and
+uses far less memory and CPU). DECK_ENGINE sets the default.
+
+BUILD_POOL_WORKERS=0 builds in-process instead.
+"""
+import atexit
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+BUILD_POOL_WORKERS = int(os.environ.get('BUILD_POOL_WORKERS', 2))
+BUILD_POOL_INTERACTIVE_WORKERS = int(os.environ.get('BUILD_POOL_INTERACTIVE_WORKERS', 1))
+BUILD_TIMEOUT = float(os.environ.get('BUILD_TIMEOUT', 60))
+
+ENGINES = {
+    'pptx': 'presentation_builder',
+    'direct': 'ooxml_builder',
+}
+DECK_ENGINE = os.environ.get('DECK_ENGINE', 'pptx')
+
+POOL_SIZES = {
+    'default': BUILD_POOL_WORKERS,
+    'interactive': BUILD_POOL_INTERACTIVE_WORKERS,
+}
+
+_pools = {}  # name -> (executor, owning pid)
+_pool_lock = threading.Lock()
+
+
+class BuildTimeoutError(Exception):
+    pass
+
+
+def _init_build_worker():
+    # Import the default engine and load templates once per pool process; the
+    # other engine is only imported if a request asks for it
+    from logging_config import configure_logging
+    from template_manager import get_template_manager
+    configure_logging()
+    importlib.import_module(ENGINES.get(DECK_ENGINE, ENGINES['pptx']))
+    get_template_manager()
+
+
+def _build(content_data, image_prompts, template, engine='pptx'):
+    builder = importlib.import_module(ENGINES[engine])
+    return builder.create_presentation(content_data, image_prompts, template)
+
+
+def _build_profiled(content_data, image_prompts, template, engine='pptx'):
+    # For a request being profiled (see profiling.py): the raw stats travel back with the deck
+    import cProfile
+
+    profiler = cProfile.Profile()
+    path, preview_data = profiler.runcall(_build, content_data, image_prompts, template, engine)
+    profiler.create_stats()
+    return path, preview_data, profiler.stats
+
+
+def get_build_pool(name='default'):
+    """Return this process's build pool called name, creating it on first use.
+
+    Pools are per process: a pool inherited over fork (e.g. from a preloading
+    WSGI master) is never reused. Workers are started with 'spawn' because
+    forking a multi-threaded server process can deadlock on held locks.
+    """
+    if POOL_SIZES.get(name, 0) <= 0:
+        name = 'default'
+    with _pool_lock:
+        pool, pid = _pools.get(name, (None, None))
+        if pool is None or pid != os.getpid():
+            pool = ProcessPoolExecutor(
+                max_workers=POOL_SIZES[name],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_build_worker
+            )
+            _pools[name] = (pool, os.getpid())
+            logger.info("Started %s deck build pool with %s workers in process %s", name, POOL_SIZES[name], os.getpid())
+        return pool
+
+
+def shutdown_build_pool(wait=True, name=None):
+    """Shut down the named pool, or every pool this process owns."""
+    with _pool_lock:
+        for pool_name in ([name] if name else list(_pools)):
+            pool, pid = _pools.pop(pool_name, (None, None))
+            if pool is not None and pid == os.getpid():
+                pool.shutdown(wait=wait, cancel_futures=True)
+
+
+atexit.register(shutdown_build_pool, wait=False)
+
+
+def _discard_result(future):
+    # The caller gave up on this build; remove the temp file it produced
+    if future.cancelled() or future.exception() is not None:
+        return
+    path = future.result()[0]
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def build_presentation(content_data, image_prompts=None, template="default", timeout=BUILD_TIMEOUT, pool='default',
+                       engine=None):
+    """Build a deck and return (pptx_path, preview_data), like create_presentation.
+
+    engine is a key of ENGINES, DECK_ENGINE if None. Raises ValueError for an
+    unknown engine and BuildTimeoutError if the build does not finish within timeout seconds;
+    a queued build is cancelled and a running one has its output discarded.
+    """
+    engine = engine or DECK_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown build engine: {engine}")
+    if BUILD_POOL_WORKERS <= 0:
+        # An in-process build is covered by the request's own profile, if any
+        return _build(content_data, image_prompts, template, engine)
+
+    from profiling import current_profile
+    profile = current_profile()
+    task = _build if profile is None else _build_profiled
+    try:
+        future = get_build_pool(pool).submit(task, content_data, image_prompts, template, engine)
+    except BrokenProcessPool:
+        shutdown_build_pool(wait=False, name=pool)
+        future = get_build_pool(pool).submit(task, content_data, image_prompts, template, engine)
+
+    try:
+        result = future.result(timeout=timeout)
+        if profile is not None:
+            path, preview_data, stats = result
+            profile.add_stats(stats)
+            return path, preview_data
+        return result
+    except FutureTimeoutError:
+        if not future.cancel():
+            future.add_done_callback(_discard_result)
+        logger.error("Deck build timed out after %ss for template %s", timeout, template)
+        raise BuildTimeoutError(f"Presentation build timed out after {timeout:g}s")
+    except BrokenProcessPool:
+        # A builder process died (e.g. OOM-killed); start a fresh pool for the next request
+        shutdown_build_pool(wait=False, name=pool)
+        raise Exception("Presentation builder crashed, please try again")
@@ -0,0 +1,41 @@
+"""Compact storage of a deck's structured content alongside its history row.
+
+The normalized slide JSON (title, slide titles and points) and the image
+prompts are stored zlib-compressed in presentations.content, so a deck can be
+reopened for editing or re-rendered with another template without the LLM.
+A few KB of JSON typically compresses 3-4x.
+"""
+import json
+import zlib
+
+CONTENT_FORMAT_VERSION = 1
+COMPRESSION_LEVEL = 6
+
+
+def normalize_content(content_data):
+    """Keep only the fields the builder uses, with the types it expects."""
+    return {
+        "title": str(content_data.get("title", "")),
+        "slides": [
+            {
+                "title": str(slide.get("title", "")),
+                "points": [str(point) for point in slide.get("points", [])]
+            }
+            for slide in content_data.get("slides", [])
+        ]
+    }
+
+
+def pack_content(content_data, image_prompts=None):
+    payload = {
+        "version": CONTENT_FORMAT_VERSION,
+        "content": normalize_content(content_data),
+        "image_prompts": image_prompts or {}
+    }
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def unpack_content(blob):
+    """Return (content_data, image_prompts) from a packed blob."""
+    payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+    return payload["content"], payload.get("image_prompts", {})
@@ -0,0 +1,56 @@
+"""Gunicorn settings for serving the app in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Requests spend most of their time waiting on Ollama, so the defaults use a few
+processes with many threads each. Every setting can be overridden from the
+environment (WEB_WORKERS, WEB_THREADS, ...).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_WORKERS', min(multiprocessing.cpu_count(), 4)))
+# Threads mostly sit in the LLM call; the GIL is only held while building decks
+threads = int(os.environ.get('WEB_THREADS', 16))
+# Safe to preload: the template cache is read-only after load and nothing holds
+# a SQLite connection across requests (get_db opens one per request), so no
+# file descriptors are shared between forked workers.
+preload_app = True
+
+# On SIGTERM threaded workers stop accepting and wait up to graceful_timeout for
+# in-flight requests. A generation can take as long as OLLAMA_TIMEOUT, so allow
+# that plus time to build and save the deck.
+_ollama_timeout = float(os.environ.get('OLLAMA_TIMEOUT', 300))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', _ollama_timeout + 30))
+timeout = int(os.environ.get('WEB_TIMEOUT', _ollama_timeout + 60))
+keepalive = 5
+
+# Recycle workers periodically to bound slow leaks; jitter avoids restarting all at once
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 200))
+
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+
+
+def post_fork(server, worker):
+    # Warm the model as each worker starts rather than on its first request
+    from ollama_health import start_ollama_monitor
+    start_ollama_monitor()
+
+
+def worker_int(worker):
+    _log_inflight(worker, 'interrupted')
+
+
+def worker_exit(server, worker):
+    _log_inflight(worker, 'exiting')
+
+
+def _log_inflight(worker, state):
+    from app import inflight_generations
+    remaining = inflight_generations()
+    if remaining:
+        worker.log.warning("Worker %s %s with %s generation(s) in flight", worker.pid, state, remaining)
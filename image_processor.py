@@ -0,0 +1,94 @@
+import os
+import hashlib
+import logging
+import shutil
+import tempfile
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = os.path.join('cache', 'images')
+TARGET_DPI = 150  # Enough for projected slides without bloating the deck
+MAX_EDGE_PX = 2560  # Hard cap on the longest edge regardless of DPI
+JPEG_QUALITY = 85
+
+# path -> (mtime, size, sha256 hex digest), so unchanged sources are hashed once;
+# a changed source replaces its entry rather than adding one
+_source_hashes = {}
+
+
+def _source_hash(image_path):
+    stat = os.stat(image_path)
+    cached = _source_hashes.get(image_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    sha = hashlib.sha256()
+    with open(image_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    _source_hashes[image_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def target_pixel_size(width_in, height_in, dpi=TARGET_DPI):
+    width_px = max(1, int(round(width_in * dpi)))
+    height_px = max(1, int(round(height_in * dpi)))
+    longest = max(width_px, height_px)
+    if longest > MAX_EDGE_PX:
+        scale = MAX_EDGE_PX / longest
+        width_px = max(1, int(width_px * scale))
+        height_px = max(1, int(height_px * scale))
+    return width_px, height_px
+
+
+def prepare_image(image_path, width_in, height_in, dpi=TARGET_DPI, cache_dir=IMAGE_CACHE_DIR):
+    """Return a path to a copy of image_path sized for a width_in x height_in box.
+
+    The image is downscaled to the target size at the given DPI (never upscaled) and
+    recompressed as optimized PNG when it has transparency, JPEG otherwise. Prepared
+    variants are cached on disk keyed by the source hash and target size. Falls back
+    to the original path if preparation fails.
+    """
+    try:
+        target_w, target_h = target_pixel_size(width_in, height_in, dpi)
+        digest = _source_hash(image_path)
+
+        with Image.open(image_path) as img:
+            has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+            ext = '.png' if has_alpha else '.jpg'
+            cached_path = os.path.join(cache_dir, f"{digest[:16]}_{target_w}x{target_h}{ext}")
+            if os.path.exists(cached_path):
+                return cached_path
+
+            os.makedirs(cache_dir, exist_ok=True)
+            new_size = (min(img.width, target_w), min(img.height, target_h))
+            if new_size != img.size:
+                prepared = img.resize(new_size, Image.LANCZOS)
+            else:
+                prepared = img.copy()
+
+            fd, tmp_path = tempfile.mkstemp(suffix=ext, dir=cache_dir)
+            os.close(fd)
+            try:
+                if has_alpha:
+                    prepared.convert('RGBA').save(tmp_path, format='PNG', optimize=True)
+                else:
+                    prepared.convert('RGB').save(tmp_path, format='JPEG', quality=JPEG_QUALITY,
+                                                 optimize=True, progressive=True)
+                # Keep the original when recompression didn't help and no resize happened
+                if new_size == img.size and os.path.getsize(tmp_path) >= os.path.getsize(image_path) \
+                        and img.format == ('PNG' if has_alpha else 'JPEG'):
+                    shutil.copyfile(image_path, tmp_path)
+                os.replace(tmp_path, cached_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+        logger.info("Prepared image %s -> %s (%s -> %s bytes)", image_path, cached_path,
+                    os.path.getsize(image_path), os.path.getsize(cached_path))
+        return cached_path
+    except Exception as e:
+        logger.error("Failed to prepare image %s: %s", image_path, e)
+        return image_path
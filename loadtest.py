@@ -0,0 +1,185 @@
+"""Load test the generation endpoints and report throughput and latency percentiles.
+
+Against a server that is already running (pointed at a real or stub Ollama):
+
+    python loadtest.py --base-url http://127.0.0.1:8000 --requests 200 --concurrency 20
+
+Or let the script start a stub Ollama and a gunicorn server with a scratch database:
+
+    python loadtest.py --spawn --requests 200 --concurrency 20 --ollama-delay 0.5
+
+--login-concurrency N adds N clients signing in over and over while the
+generation load runs, to check that a login storm does not slow generation.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from stub_ollama import start_stub_ollama
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base_url}/login", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout}s")
+
+
+def spawn_server(port, ollama_url, db_path, workers, threads):
+    env = dict(os.environ,
+               OLLAMA_ENDPOINT=f"{ollama_url}/api/generate",
+               DATABASE_PATH=db_path,
+               WEB_BIND=f"127.0.0.1:{port}",
+               WEB_WORKERS=str(workers),
+               WEB_THREADS=str(threads),
+               WEB_ACCESS_LOG='',
+               LOG_LEVEL='warning')
+    # Measure raw capacity: per-user rate limits would turn most requests into 429s
+    env.setdefault('GENERATE_BURST', '1000000')
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], env=env)
+
+
+PASSWORD = 'loadtest-password'
+
+
+def new_session(base_url):
+    session = requests.Session()
+    name = f"load_{uuid.uuid4().hex[:10]}"
+    response = session.post(f"{base_url}/register", data={
+        'username': name,
+        'email': f"{name}@example.com",
+        'password': PASSWORD,
+        'confirm_password': PASSWORD,
+    }, allow_redirects=False)
+    if response.status_code != 302:
+        raise RuntimeError(f"Registration failed with status {response.status_code}")
+    session.email = f"{name}@example.com"
+    return session
+
+
+def run_logins(base_url, email, concurrency, stop):
+    """Sign in from concurrency clients until stop is set; return [(status, latency)]."""
+    results = []
+
+    def login_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                status = requests.post(f"{base_url}/login", data={'email': email, 'password': PASSWORD},
+                                       allow_redirects=False, timeout=60).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            results.append((status, time.perf_counter() - started))
+
+    threads = [threading.Thread(target=login_loop, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load(base_url, total_requests, concurrency, num_slides, template):
+    sessions = [new_session(base_url) for _ in range(concurrency)]
+    local = threading.local()
+    session_ids = iter(range(concurrency))
+    session_lock = threading.Lock()
+
+    def one_request(_):
+        if not hasattr(local, 'session'):
+            with session_lock:
+                local.session = sessions[next(session_ids)]
+        started = time.perf_counter()
+        try:
+            response = local.session.post(f"{base_url}/generate_ppt", json={
+                'topic': 'Photosynthesis',
+                'num_slides': num_slides,
+                'template': template,
+            }, timeout=600)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        return status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total_requests)))
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def report(results, elapsed, ok_status=200):
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for status, latency in results if status == ok_status)
+    print(f"Requests:     {len(results)} in {elapsed:.2f}s")
+    print(f"Throughput:   {len(results) / elapsed:.2f} req/s ({len(latencies) / elapsed:.2f} successful/s)")
+    print(f"Status codes: {dict(statuses)}")
+    if latencies:
+        print(f"Latency (s):  mean={statistics.mean(latencies):.3f} "
+              f"p50={percentile(latencies, 50):.3f} p90={percentile(latencies, 90):.3f} "
+              f"p95={percentile(latencies, 95):.3f} p99={percentile(latencies, 99):.3f} max={latencies[-1]:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--num-slides', type=int, default=10)
+    parser.add_argument('--template', default='default')
+    parser.add_argument('--spawn', action='store_true', help='Start a stub Ollama and a gunicorn server')
+    parser.add_argument('--port', type=int, default=8765, help='Port for the spawned server')
+    parser.add_argument('--ollama-delay', type=float, default=0.5, help='Stub Ollama response delay in seconds')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--login-concurrency', type=int, default=0, help='Clients signing in throughout the run')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if args.spawn:
+        _, ollama_url = start_stub_ollama(delay=args.ollama_delay)
+        db_path = os.path.join(tempfile.mkdtemp(prefix='loadtest_'), 'users.db')
+        server = spawn_server(args.port, ollama_url, db_path, args.workers, args.threads)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_up(base_url)
+        stop_logins = threading.Event()
+        if args.login_concurrency:
+            login_threads, login_results = run_logins(base_url, new_session(base_url).email,
+                                                      args.login_concurrency, stop_logins)
+        results, elapsed = run_load(base_url, args.requests, args.concurrency, args.num_slides, args.template)
+        stop_logins.set()
+        report(results, elapsed)
+        if args.login_concurrency:
+            for thread in login_threads:
+                thread.join()
+            print("\nLogins (successful = 302):")
+            report(login_results, elapsed, ok_status=302)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Logging setup: per-environment level, queue-based handler and JSON request logs.
+
+Log calls only enqueue records; a background QueueListener does the formatting
+and I/O, so a slow stderr or log shipper never blocks a request thread. Use
+%-style arguments (logger.debug("x %s", y)) rather than f-strings so disabled
+levels cost nothing.
+
+Environment:
+    LOG_LEVEL   DEBUG/INFO/WARNING/... (default DEBUG when APP_ENV=development, else INFO)
+    LOG_FORMAT  json (default) or text
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# A client-supplied X-Request-ID is only trusted if it looks like an id; it ends up in logs and file names
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+# Attributes every LogRecord has; anything else was passed via extra= and is emitted as a field
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_config = None  # (level, format) once configure_logging has run
+_listener = None
+_listener_pid = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id; runs on the calling thread before the record is queued."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+        return True
+
+
+def default_level():
+    level = os.environ.get('LOG_LEVEL')
+    if level:
+        return level.upper()
+    return 'DEBUG' if os.environ.get('APP_ENV') == 'development' else 'INFO'
+
+
+def configure_logging(level=None, fmt=None):
+    """Install the queue handler on the root logger (idempotent per process)."""
+    global _config
+    if _config is not None:
+        return
+    _config = (level or default_level(), fmt or os.environ.get('LOG_FORMAT', 'json'))
+    _install()
+    atexit.register(_stop_listener)
+    # A forked child (gunicorn preloads the app in the master) inherits the
+    # handler but not the listener thread, so it needs its own
+    os.register_at_fork(after_in_child=_install)
+
+
+def _install():
+    global _listener, _listener_pid
+    if _config is None:
+        return
+    level, fmt = _config
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def _stop_listener():
+    # Only the process that started the listener can join its thread
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+
+def record_stage(name, seconds):
+    """Add seconds to the current request's g.stage_timings[name] (kept in milliseconds)."""
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[name] = round(timings.get(name, 0) + seconds * 1000, 2)
+
+
+@contextmanager
+def timed_stage(name):
+    """Record how long a block took as stage name of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def request_id_from(header):
+    """The client's request id if it is safe to reuse, else a new one."""
+    if header and REQUEST_ID_PATTERN.fullmatch(header):
+        return header
+    return uuid.uuid4().hex[:16]
+
+
+def init_request_logging(app):
+    """Give each request an id and emit one structured log line when it finishes."""
+    access_logger = logging.getLogger('app.request')
+
+    @app.before_request
+    def _start_request():
+        g.request_id = request_id_from(request.headers.get('X-Request-ID'))
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _log_request(response):
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+        if request.endpoint == 'static':
+            return response
+        duration_ms = round((time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000, 2)
+        access_logger.info("%s %s %s", request.method, request.path, response.status_code, extra={
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": duration_ms,
+            "stages": g.get('stage_timings', {}),
+        })
+        return response
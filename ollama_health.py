@@ -0,0 +1,222 @@
+"""Keep the Ollama model warm and track backend health.
+
+A background thread per process probes Ollama on startup and then every
+OLLAMA_HEALTH_INTERVAL seconds:
+
+- GET /api/tags tells whether the server is up and the configured model is
+  installed.
+- An empty-prompt /api/generate call loads the model into memory (or refreshes
+  its keep_alive) whenever no real request has used it for OLLAMA_WARM_INTERVAL
+  seconds, so the first deck after a restart or idle period does not pay the
+  model load time.
+
+generate_text_content reports each real call through record_generation /
+record_failure, which keep a moving average of latency and tokens per second.
+After OLLAMA_DOWN_AFTER consecutive failures the backend is marked down and
+requests go straight to the fallback deck instead of waiting for a timeout,
+until a probe or a real request succeeds. While it is down, one real request
+per OLLAMA_HEALTH_INTERVAL is let through as a trial, so the backend recovers
+even when no probe runs (OLLAMA_MONITOR=0, or the probe thread died).
+Status, trial state and latency figures are public at /health; the endpoint,
+model and last error are only in the logged-in /scheduler/stats.
+"""
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_ENDPOINT = os.environ.get('OLLAMA_ENDPOINT', "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', "gemma3:1b-it-qat")
+OLLAMA_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', 300))
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+OLLAMA_HEALTH_INTERVAL = float(os.environ.get('OLLAMA_HEALTH_INTERVAL', 30))
+OLLAMA_WARM_INTERVAL = float(os.environ.get('OLLAMA_WARM_INTERVAL', 600))
+OLLAMA_DOWN_AFTER = int(os.environ.get('OLLAMA_DOWN_AFTER', 3))
+OLLAMA_PROBE_TIMEOUT = float(os.environ.get('OLLAMA_PROBE_TIMEOUT', 5))
+EWMA_ALPHA = 0.2  # Weight of the newest sample in the moving averages
+
+
+def _base_url(endpoint):
+    parts = urlsplit(endpoint)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class OllamaMonitor:
+    def __init__(self, endpoint=OLLAMA_ENDPOINT, model=OLLAMA_MODEL):
+        self.endpoint = endpoint
+        self.base_url = _base_url(endpoint)
+        self.model = model
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.up = None  # Unknown until the first probe or request
+        self.model_loaded = False
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_probe = None
+        self.last_used = None
+        self.retry_at = None  # While down: when the next real request may try the backend
+        self.warm_up_ms = None
+        self.latency_ms = None
+        self.tokens_per_sec = None
+        self.requests = 0
+        self.failures = 0
+
+    # Samples from real requests
+
+    def record_generation(self, seconds, eval_count=None, eval_duration_ns=None):
+        with self._lock:
+            self.requests += 1
+            if self.up is False:
+                logger.info("Ollama at %s is back up", self.base_url)
+            self.up = True
+            self.model_loaded = True
+            self.consecutive_failures = 0
+            self.last_error = None
+            self.last_used = time.monotonic()
+            self.latency_ms = self._ewma(self.latency_ms, seconds * 1000)
+            if eval_count and eval_duration_ns:
+                self.tokens_per_sec = self._ewma(self.tokens_per_sec, eval_count / (eval_duration_ns / 1e9))
+
+    def record_failure(self, error):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self._mark_failure(error)
+
+    def _mark_failure(self, error):
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        if self.consecutive_failures >= OLLAMA_DOWN_AFTER and self.up is not False:
+            logger.warning("Marking Ollama at %s down after %s consecutive failures: %s",
+                           self.base_url, self.consecutive_failures, error)
+            self.up = False
+            self.model_loaded = False
+        if self.up is False:
+            self.retry_at = time.monotonic() + OLLAMA_HEALTH_INTERVAL
+
+    @staticmethod
+    def _ewma(current, sample):
+        return sample if current is None else current + EWMA_ALPHA * (sample - current)
+
+    def available(self):
+        """False once the backend has been marked down, except for one trial request
+        per OLLAMA_HEALTH_INTERVAL; unknown counts as available."""
+        with self._lock:
+            if self.up is not False:
+                return True
+            now = time.monotonic()
+            if self.retry_at is not None and now < self.retry_at:
+                return False
+            self.retry_at = now + OLLAMA_HEALTH_INTERVAL
+        logger.info("Ollama at %s is marked down, letting one request through to retry it", self.base_url)
+        return True
+
+    # Background probing
+
+    def probe(self):
+        """Check the server and model, warming the model if it has been idle."""
+        import requests
+
+        try:
+            response = requests.get(f"{self.base_url}/api/tags", timeout=OLLAMA_PROBE_TIMEOUT)
+            response.raise_for_status()
+            models = {m.get('name') for m in response.json().get('models', [])}
+            if self.model not in models:
+                raise Exception(f"model {self.model} is not installed")
+            with self._lock:
+                idle = self.last_used is None or time.monotonic() - self.last_used >= OLLAMA_WARM_INTERVAL
+            if idle or not self.model_loaded:
+                self.warm_up()
+            with self._lock:
+                if self.up is False:
+                    logger.info("Ollama at %s is back up", self.base_url)
+                self.up = True
+                self.consecutive_failures = 0
+                self.last_error = None
+        except Exception as e:
+            with self._lock:
+                self._mark_failure(e)
+            logger.debug("Ollama probe failed: %s", e)
+        finally:
+            self.last_probe = time.time()
+
+    def warm_up(self):
+        """Load the model (an empty prompt makes Ollama load it without generating)."""
+        import requests
+
+        started = time.monotonic()
+        response = requests.post(self.endpoint, json={
+            "model": self.model,
+            "prompt": "",
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE
+        }, timeout=OLLAMA_TIMEOUT)
+        response.raise_for_status()
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self.model_loaded = True
+            self.last_used = time.monotonic()
+            self.warm_up_ms = round(elapsed_ms, 1)
+        logger.info("Warmed Ollama model %s in %.0fms", self.model, elapsed_ms)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(OLLAMA_HEALTH_INTERVAL)
+
+    def start(self):
+        """Start the probe thread in this process; a thread inherited over fork does not count."""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='ollama-monitor', daemon=True)
+            self._pid = os.getpid()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self, detail=False):
+        """Health for /health. detail adds what only logged-in users may see: the
+        endpoint and model, request counts and the last error text."""
+        with self._lock:
+            trial_in = None
+            if self.up is False and self.retry_at is not None:
+                trial_in = round(max(0.0, self.retry_at - time.monotonic()), 1)
+            snapshot = {
+                "status": {True: "up", False: "down", None: "unknown"}[self.up],
+                "trial_in_s": trial_in,
+                "model_loaded": self.model_loaded,
+                "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                "tokens_per_sec": round(self.tokens_per_sec, 1) if self.tokens_per_sec is not None else None,
+                "warm_up_ms": self.warm_up_ms,
+                "consecutive_failures": self.consecutive_failures,
+            }
+            if detail:
+                snapshot.update({
+                    "endpoint": self.base_url,
+                    "model": self.model,
+                    "requests": self.requests,
+                    "failures": self.failures,
+                    "last_error": self.last_error,
+                    "last_probe": self.last_probe,
+                })
+            return snapshot
+
+
+_monitor = OllamaMonitor()
+
+
+def get_ollama_monitor():
+    return _monitor
+
+
+def start_ollama_monitor():
+    if os.environ.get('OLLAMA_MONITOR', '1') != '0':
+        _monitor.start()
@@ -0,0 +1,373 @@
+"""Build decks by writing the OOXML parts directly, without python-pptx.
+
+The decks create_presentation builds are simple: a background (colour or
+picture) and up to three shapes per slide. This engine writes the same slide
+XML from string templates and zips it straight into the output file, so a build
+never loads the python-pptx object model, its default template with all eleven
+layouts, or an lxml tree per slide. Every part except the slides, their
+relationships and the media is copied byte for byte from python-pptx's own
+default template, which is read once per process.
+
+The output is equivalent to presentation_builder.create_presentation for every
+style the templates support: the same shapes, sizes, text and preview_data (see
+bench_engines.py, which checks this by reopening both decks with python-pptx).
+Select it with engine='direct' (see build_pool.py).
+"""
+import importlib.util
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+from image_processor import prepare_image
+from preview_format import new_preview_data
+from template_manager import get_template_manager
+from text_fitting import fit_text
+
+logger = logging.getLogger(__name__)
+
+EMU_PER_INCH = 914400
+EMU_PER_POINT = 12700
+SLIDE_WIDTH_IN = 10.0  # Standard 4:3 slide, as in python-pptx's default template
+SLIDE_HEIGHT_IN = 7.5
+BLANK_LAYOUT = 'slideLayout7.xml'  # prs.slide_layouts[6] in the default template
+FIRST_SLIDE_ID = 256
+
+IMAGE_CONTENT_TYPES = {
+    'BMP': ('bmp', 'image/bmp'),
+    'GIF': ('gif', 'image/gif'),
+    'JPEG': ('jpg', 'image/jpeg'),
+    'PNG': ('png', 'image/png'),
+    'TIFF': ('tiff', 'image/tiff'),
+    'WMF': ('wmf', 'image/x-wmf'),
+}
+ALIGNMENTS = {'center': 'ctr', 'left': 'l', 'right': 'r'}
+
+SLIDE_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+RT_SLIDE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide'
+RT_SLIDE_LAYOUT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout'
+RT_IMAGE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+
+XML_HEADER = "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+
+SLIDE_XML = (
+    XML_HEADER +
+    '<p:sld xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<p:cSld><p:bg><p:bgPr>{background}<a:effectLst/></p:bgPr></p:bg><p:spTree>'
+    '<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr><p:grpSpPr/>'
+    '{shapes}</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>'
+)
+PICTURE_XML = (
+    '<p:pic><p:nvPicPr><p:cNvPr id="{id}" name="Picture {n}" descr="{descr}"/>'
+    '<p:cNvPicPr><a:picLocks noChangeAspect="1"/></p:cNvPicPr><p:nvPr/></p:nvPicPr>'
+    '<p:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></p:blipFill>'
+    '<p:spPr>{xfrm}<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr></p:pic>'
+)
+TEXTBOX_XML = (
+    '<p:sp><p:nvSpPr><p:cNvPr id="{id}" name="TextBox {n}"/><p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+    '<p:spPr>{xfrm}<a:prstGeom prst="rect"><a:avLst/></a:prstGeom><a:noFill/></p:spPr>'
+    '<p:txBody><a:bodyPr wrap="square">{autofit}</a:bodyPr><a:lstStyle/>{paragraphs}</p:txBody></p:sp>'
+)
+IMAGE_PLACEHOLDER_XML = (
+    '<p:sp><p:nvSpPr><p:cNvPr id="{id}" name="Rectangle {n}"/><p:cNvSpPr/><p:nvPr/></p:nvSpPr>'
+    '<p:spPr>{xfrm}<a:prstGeom prst="rect"><a:avLst/></a:prstGeom>{fill}'
+    '<a:ln w="{line_width}">{line_fill}<a:prstDash val="{dash}"/></a:ln></p:spPr>'
+    '<p:style><a:lnRef idx="1"><a:schemeClr val="accent1"/></a:lnRef>'
+    '<a:fillRef idx="3"><a:schemeClr val="accent1"/></a:fillRef>'
+    '<a:effectRef idx="2"><a:schemeClr val="accent1"/></a:effectRef>'
+    '<a:fontRef idx="minor"><a:schemeClr val="lt1"/></a:fontRef></p:style>'
+    '<p:txBody><a:bodyPr rtlCol="0" anchor="ctr" wrap="square"/><a:lstStyle/><a:p><a:pPr algn="ctr"/></a:p>'
+    '<a:p><a:pPr algn="ctr"><a:spcAft><a:spcPts val="1000"/></a:spcAft><a:defRPr sz="4800"/></a:pPr>'
+    '<a:r><a:t>\U0001f5bc\ufe0f</a:t></a:r></a:p>'
+    '<a:p><a:pPr algn="ctr"><a:defRPr i="1" sz="1400">{prompt_fill}</a:defRPr></a:pPr>{prompt}</a:p>'
+    '</p:txBody></p:sp>'
+)
+RELS_XML = (
+    XML_HEADER +
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{}</Relationships>'
+)
+RELATIONSHIP_XML = '<Relationship Id="{}" Type="{}" Target="{}"/>'
+
+# Characters XML cannot hold; python-pptx writes them as _xHHHH_ escapes
+_CONTROL_CHARS = re.compile('[\x00-\x08\x0c\x0e-\x1f]')
+
+
+def _emu(inches):
+    return int(inches * EMU_PER_INCH)
+
+
+def _xfrm(left, top, width, height):
+    return (f'<a:xfrm><a:off x="{left}" y="{top}"/>'
+            f'<a:ext cx="{width}" cy="{height}"/></a:xfrm>')
+
+
+def _solid_fill(color):
+    return f'<a:solidFill><a:srgbClr val="{color["r"]:02X}{color["g"]:02X}{color["b"]:02X}"/></a:solidFill>'
+
+
+def _runs(text):
+    # One run per line; line feeds and vertical tabs become line breaks, as with
+    # python-pptx's paragraph.text
+    if not text:
+        return ''
+    lines = re.split('[\n\v]', _CONTROL_CHARS.sub(lambda m: f"_x{ord(m.group()):04X}_", text))
+    return '<a:br/>'.join(f'<a:r><a:t>{escape(line)}</a:t></a:r>' if line else '' for line in lines)
+
+
+def _font_properties(font, size, bold=None, default_color=None):
+    color = font.get('color', default_color)
+    bold_attr = '' if bold is None else f' b="{1 if bold else 0}"'
+    return (f'<a:defRPr sz="{int(size * 100)}"{bold_attr}>{_solid_fill(color)}'
+            f'<a:latin typeface="{escape(font.get("name", "Calibri"), {chr(34): "&quot;"})}"/></a:defRPr>')
+
+
+def _title_paragraphs(text, font, size, alignment):
+    # A title text frame holds one paragraph per line of the title; only the
+    # first carries the formatting
+    first, *rest = text.split('\n')
+    properties = f'<a:pPr algn="{alignment}">' + _font_properties(font, size, font.get('bold', True), {'r': 0, 'g': 0, 'b': 0}) + '</a:pPr>'
+    return f'<a:p>{properties}{_runs(first)}</a:p>' + ''.join(
+        f'<a:p>{_runs(line)}</a:p>' if line else '<a:p/>' for line in rest)
+
+
+@lru_cache(maxsize=1)
+def _skeleton():
+    """Parts of python-pptx's default template, and the numbering slides continue from."""
+    spec = importlib.util.find_spec('pptx')
+    path = os.path.join(spec.submodule_search_locations[0], 'templates', 'default.pptx')
+    with zipfile.ZipFile(path) as source:
+        parts = [(name, source.read(name)) for name in source.namelist()]
+    rels = dict(parts)['ppt/_rels/presentation.xml.rels'].decode('utf-8')
+    next_rid = max(int(n) for n in re.findall(r'Id="rId(\d+)"', rels)) + 1
+    return parts, next_rid
+
+
+class _Media:
+    """Image parts of one package, each written once however many slides use it."""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.parts = {}  # prepared path -> part name
+        self.extensions = {}  # extension -> content type
+
+    def add(self, path, image_format):
+        if path not in self.parts:
+            ext, content_type = IMAGE_CONTENT_TYPES[image_format]
+            name = f"ppt/media/image{len(self.parts) + 1}.{ext}"
+            # Images are already compressed; deflating them again only costs CPU
+            self.archive.write(path, name, compress_type=zipfile.ZIP_STORED)
+            self.parts[path] = name
+            self.extensions[ext] = content_type
+        return self.parts[path]
+
+
+def create_presentation(content_data, image_prompts=None, template="default"):
+    """Build the deck and return (pptx_path, preview_data), like presentation_builder's."""
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pptx")
+    temp_file.close()
+    try:
+        with zipfile.ZipFile(temp_file.name, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            preview_data = _write_package(archive, content_data, image_prompts, template)
+        return temp_file.name, preview_data
+    except Exception as e:
+        logger.error("PowerPoint creation error: %s", e)
+        try:
+            os.unlink(temp_file.name)
+        except OSError:
+            pass
+        raise Exception(f"Failed to create PowerPoint: {str(e)}")
+
+
+def _write_package(archive, content_data, image_prompts, template):
+    template_manager = get_template_manager()
+    template_config = template_manager.get_template(template) or template_manager.get_template('default')
+    styles = template_config.get('styles', {})
+    title_slide_styles = styles.get('title_slide', {})
+    content_slide_styles = styles.get('content_slide', {})
+    image_slide_styles = styles.get('image_slide', {})
+    preview_data = new_preview_data(content_data, template, styles)
+    image_prompts = image_prompts or {}
+
+    parts, next_rid = _skeleton()
+    special = {'[Content_Types].xml', 'ppt/presentation.xml', 'ppt/_rels/presentation.xml.rels'}
+    for name, data in parts:
+        if name not in special:
+            archive.writestr(name, data)
+    media = _Media(archive)
+
+    backgrounds = {}  # background image path -> (prepared path, format), or None if unusable
+
+    def background_image(bg_image, slide_label):
+        bg_image_path = os.path.abspath(os.path.join('static', bg_image))
+        if bg_image_path not in backgrounds:
+            backgrounds[bg_image_path] = None
+            try:
+                if os.path.exists(bg_image_path):
+                    with Image.open(bg_image_path) as img:
+                        source_format = img.format.upper()
+                    if source_format in IMAGE_CONTENT_TYPES:
+                        prepared_path = prepare_image(bg_image_path, SLIDE_WIDTH_IN, SLIDE_HEIGHT_IN)
+                        with Image.open(prepared_path) as img:
+                            backgrounds[bg_image_path] = (prepared_path, img.format.upper())
+            except Exception as e:
+                logger.error("Failed to apply background image for %s: %s, error: %s", slide_label, bg_image_path, e)
+            if backgrounds[bg_image_path] is None:
+                logger.error("Background image not found or invalid format for %s: %s", slide_label, bg_image_path)
+        return backgrounds[bg_image_path]
+
+    def image_placeholder(shape_id, image_position, defaults, prompt):
+        fill_color = image_slide_styles.get('fill_color', {'r': 245, 'g': 245, 'b': 245})
+        border_color = image_slide_styles.get('border_color', {'r': 200, 'g': 200, 'b': 200})
+        position = {key: image_position.get(key, value) for key, value in defaults.items()}
+        xml = IMAGE_PLACEHOLDER_XML.format(
+            id=shape_id, n=shape_id - 1,
+            xfrm=_xfrm(*(_emu(position[key]) for key in ('left', 'top', 'width', 'height'))),
+            fill=_solid_fill(fill_color), line_fill=_solid_fill(border_color),
+            line_width=int(image_slide_styles.get('border_width', 1.5) * EMU_PER_POINT),
+            dash='sysDash' if image_slide_styles.get('border_style', 'dashed') == 'dashed' else 'solid',
+            prompt_fill=_solid_fill({'r': 100, 'g': 100, 'b': 100}), prompt=_runs(prompt)
+        )
+        style = dict(position, fill_color=fill_color, border_color=border_color,
+                     border_width=image_slide_styles.get('border_width', 1.5),
+                     border_style=image_slide_styles.get('border_style', 'dashed'))
+        return xml, style
+
+    def write_slide(number, slide_styles, default_color, slide_label, build_shapes):
+        rels = [RELATIONSHIP_XML.format('rId1', RT_SLIDE_LAYOUT, f"../slideLayouts/{BLANK_LAYOUT}")]
+        shapes = []
+        bg_image = slide_styles.get('background_image', '')
+        image = background_image(bg_image, slide_label) if bg_image else None
+        if image is not None:
+            part_name = media.add(*image)
+            rels.append(RELATIONSHIP_XML.format('rId2', RT_IMAGE, '../media/' + part_name.rsplit('/', 1)[1]))
+            background = '<a:noFill/>'
+            shapes.append(PICTURE_XML.format(
+                id=2, n=1, rid='rId2', descr=escape(os.path.basename(image[0]), {'"': '&quot;'}),
+                xfrm=_xfrm(0, 0, _emu(SLIDE_WIDTH_IN), _emu(SLIDE_HEIGHT_IN))
+            ))
+        else:
+            background_settings = slide_styles.get('background', {})
+            if background_settings.get('type') == 'solid':
+                bg_color = background_settings.get('color', default_color)
+            else:
+                bg_color = background_settings.get('gradient_start', default_color)
+            background = _solid_fill(bg_color)
+        shapes.extend(build_shapes(len(shapes) + 2))
+        archive.writestr(f"ppt/slides/slide{number}.xml",
+                         SLIDE_XML.format(background=background, shapes=''.join(shapes)))
+        archive.writestr(f"ppt/slides/_rels/slide{number}.xml.rels", RELS_XML.format(''.join(rels)))
+
+    # Title slide
+    def title_shapes(shape_id):
+        title_text = content_data.get("title", "Presentation")
+        title_font = title_slide_styles.get('title_font', {})
+        base_size = title_font.get('size', 44)
+        width, height = _emu(9.0), _emu(2.0)
+        title_size, _ = fit_text([title_text], title_font.get('name', 'Calibri'), base_size, 20,
+                                 width / EMU_PER_POINT, height / EMU_PER_POINT, bold=title_font.get('bold', True))
+        shapes = [TEXTBOX_XML.format(
+            id=shape_id, n=shape_id - 1, xfrm=_xfrm(_emu(0.5), _emu(1.5), width, height), autofit='<a:spAutoFit/>',
+            paragraphs=_title_paragraphs(title_text, title_font, title_size, 'ctr')
+        )]
+        image_style = None
+        if "title" in image_prompts:
+            xml, preview_data["image_styles"]["title"] = image_placeholder(
+                shape_id + 1, title_slide_styles.get('image_position', {'left': 2.5, 'top': 4.0, 'width': 5.0, 'height': 2.5}),
+                {'left': 2.5, 'top': 4.0, 'width': 5.0, 'height': 2.5}, image_prompts['title'])
+            shapes.append(xml)
+            image_style = "title"
+        preview_data["slides"].append({"type": "title", "title_font_size": title_size, "image_style": image_style})
+        return shapes
+
+    write_slide(1, title_slide_styles, {'r': 240, 'g': 240, 'b': 240}, "title slide", title_shapes)
+
+    # Content slides
+    slides = content_data.get("slides", [])
+    for i, slide_data in enumerate(slides):
+        def content_shapes(shape_id, i=i, slide_data=slide_data):
+            title_text = slide_data.get("title", f"Slide {i+1}")
+            title_font = content_slide_styles.get('title_font', {})
+            base_size = title_font.get('size', 32)
+            width, height = _emu(9.0), _emu(1.2)
+            title_size, _ = fit_text([title_text], title_font.get('name', 'Calibri'), base_size, 20,
+                                     width / EMU_PER_POINT, height / EMU_PER_POINT, bold=title_font.get('bold', True))
+            alignment = ALIGNMENTS.get(title_font.get('alignment', 'left'), 'l')
+            shapes = [TEXTBOX_XML.format(
+                id=shape_id, n=shape_id - 1, xfrm=_xfrm(_emu(0.5), _emu(0.5), width, height), autofit='<a:spAutoFit/>',
+                paragraphs=_title_paragraphs(title_text, title_font, title_size, alignment)
+            )]
+            shape_id += 1
+
+            points_style = None
+            points = slide_data.get("points", [])
+            if points:
+                body_font = content_slide_styles.get('body_font', {})
+                base_body_size = body_font.get('size', 18)
+                width, height = _emu(5.0), _emu(5.0)
+                body_size, _ = fit_text(["• " + point for point in points], body_font.get('name', 'Calibri'),
+                                        base_body_size, 10, width / EMU_PER_POINT, height / EMU_PER_POINT,
+                                        space_before=6, space_after=6)
+                properties = (f'<a:pPr algn="{ALIGNMENTS.get(body_font.get("alignment", "left"), "l")}">'
+                              '<a:spcBef><a:spcPts val="600"/></a:spcBef><a:spcAft><a:spcPts val="600"/></a:spcAft>'
+                              + _font_properties(body_font, body_size, default_color={'r': 50, 'g': 50, 'b': 50})
+                              + '</a:pPr>')
+                shapes.append(TEXTBOX_XML.format(
+                    id=shape_id, n=shape_id - 1, xfrm=_xfrm(_emu(0.5), _emu(2.0), width, height),
+                    autofit='<a:noAutofit/>',
+                    paragraphs=''.join(f'<a:p>{properties}{_runs("• " + point)}</a:p>' for point in points)
+                ))
+                shape_id += 1
+                points_style = "body" if body_size == base_body_size else f"body_{body_size}"
+                preview_data["text_styles"][points_style] = {
+                    "level": 0,
+                    "font_name": body_font.get('name', 'Calibri'),
+                    "font_size": body_size,
+                    "color": body_font.get('color', {'r': 50, 'g': 50, 'b': 50}),
+                    "alignment": body_font.get('alignment', 'left'),
+                    "space_before": 6,
+                    "space_after": 6
+                }
+
+            image_style = None
+            if str(i) in image_prompts:
+                xml, preview_data["image_styles"]["content"] = image_placeholder(
+                    shape_id, content_slide_styles.get('image_position', {'left': 6.0, 'top': 2.0, 'width': 3.5, 'height': 4.0}),
+                    {'left': 6.0, 'top': 2.0, 'width': 3.5, 'height': 4.0}, image_prompts[str(i)])
+                shapes.append(xml)
+                image_style = "content"
+            preview_data["slides"].append({
+                "type": "content",
+                "index": i,
+                "title_font_size": title_size,
+                "points_style": points_style,
+                "image_style": image_style
+            })
+            return shapes
+
+        write_slide(i + 2, content_slide_styles, {'r': 255, 'g': 255, 'b': 255}, f"content slide {i+1}", content_shapes)
+
+    # Package parts that list the slides and media
+    skeleton = dict(parts)
+    slide_count = len(slides) + 1
+    slide_ids = ''.join(f'<p:sldId id="{FIRST_SLIDE_ID + n}" r:id="rId{next_rid + n}"/>' for n in range(slide_count))
+    archive.writestr('ppt/presentation.xml', skeleton['ppt/presentation.xml'].decode('utf-8').replace(
+        '</p:sldMasterIdLst>', f'</p:sldMasterIdLst><p:sldIdLst>{slide_ids}</p:sldIdLst>', 1))
+    slide_rels = ''.join(RELATIONSHIP_XML.format(f"rId{next_rid + n}", RT_SLIDE, f"slides/slide{n + 1}.xml")
+                         for n in range(slide_count))
+    archive.writestr('ppt/_rels/presentation.xml.rels', skeleton['ppt/_rels/presentation.xml.rels'].decode('utf-8').replace(
+        '</Relationships>', slide_rels + '</Relationships>', 1))
+    content_types = skeleton['[Content_Types].xml'].decode('utf-8')
+    added = ''.join(f'<Default Extension="{ext}" ContentType="{content_type}"/>'
+                    for ext, content_type in sorted(media.extensions.items())
+                    if f'Extension="{ext}"' not in content_types)
+    added += ''.join(f'<Override PartName="/ppt/slides/slide{n + 1}.xml" ContentType="{SLIDE_CONTENT_TYPE}"/>'
+                     for n in range(slide_count))
+    archive.writestr('[Content_Types].xml', content_types.replace('</Types>', added + '</Types>', 1))
+    return preview_data
@@ -0,0 +1,204 @@
+"""Speculative outline generation while the user is still filling in the form.
+
+The dashboard calls /prefetch once a topic is entered. The outline is then
+generated in a background thread, in the scheduler's 'background' class and
+without waiting for an LLM slot, so speculative work never queues ahead of
+real requests. Both slots are claimed before /prefetch answers; when either
+budget is full the prefetch is refused (started: false) and the page may try
+again later.
+
+A running LLM call cannot be interrupted. When the user changes the topic while
+their prefetch is still running, the newest key is queued and runs in the same
+thread, in the slots it already holds, once the running one finishes; an older
+queued key is dropped. generate_ppt never waits for a queued prefetch that has
+not started: it cancels it and calls the LLM itself.
+
+The result (or the still-running job) is kept per user for PREFETCH_TTL
+seconds. generate_ppt then calls adopt_prefetch with the key of the outline it
+needs. If the keys match, it takes the result, waiting for the job if it is
+still running. Otherwise the prefetch is discarded and generate_ppt calls the
+LLM as usual. A prefetch only holds a successful LLM outline, never the
+fallback content generate_text_content substitutes on errors.
+
+The cache is per process. With several web workers, a prefetch and the
+generate call that follows can land in different processes; that generate
+call then just runs normally.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from ollama_health import OLLAMA_TIMEOUT
+from rate_limit import Overloaded, llm_slot
+from scheduler import scheduled
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_TTL = float(os.environ.get('PREFETCH_TTL', 120))
+PREFETCH_MAX_ENTRIES = int(os.environ.get('PREFETCH_MAX_ENTRIES', 1000))
+# How long generate_ppt waits for a matching prefetch that is still running;
+# the job itself is bounded by the Ollama request timeout
+PREFETCH_ADOPT_TIMEOUT = float(os.environ.get('PREFETCH_ADOPT_TIMEOUT', OLLAMA_TIMEOUT + 5))
+
+
+class _Prefetch:
+    def __init__(self, user, key):
+        self.user = user
+        self.key = key
+        self.created = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def cancel(self):
+        self.error = RuntimeError("Prefetch cancelled before it started")
+        self.done.set()
+
+    def expired(self, now):
+        return now - self.created > PREFETCH_TTL
+
+
+class PrefetchCache:
+    def __init__(self):
+        self._entries = {}  # user -> newest _Prefetch
+        self._queued = {}  # user -> (_Prefetch, generate) to run after the user's running prefetch
+        self._running = set()  # users with a prefetch thread holding the background slots
+        self._lock = threading.Lock()
+        self.started = 0
+        self.queued = 0
+        self.adopted = 0
+        self.discarded = 0
+        self.skipped = 0
+
+    def _purge(self, now):
+        for user in [user for user, entry in self._entries.items() if entry.expired(now)]:
+            self._drop(user)
+        while len(self._entries) >= PREFETCH_MAX_ENTRIES:
+            self._drop(min(self._entries, key=lambda user: self._entries[user].created))
+
+    def _drop(self, user):
+        entry = self._entries.pop(user, None)
+        queued = self._queued.pop(user, None)
+        if queued is not None:
+            queued[0].cancel()
+        return entry
+
+    def start(self, user, key, generate):
+        """Run generate() in the background as the user's prefetch for key.
+
+        Returns False if the user already has a live prefetch for key, or if no
+        background or LLM slot is free.
+        """
+        now = time.monotonic()
+        with self._lock:
+            current = self._entries.get(user)
+            if current is not None and current.key == key and not current.expired(now) and current.error is None:
+                return False
+            self._purge(now)
+            if self._drop(user) is not None:
+                self.discarded += 1
+            entry = self._entries[user] = _Prefetch(user, key)
+            if user in self._running:
+                self._queued[user] = (entry, generate)
+                self.queued += 1
+                return True
+            self._running.add(user)
+        # Claim the slots here, so the caller learns whether the prefetch runs at all
+        slots = ExitStack()
+        try:
+            slots.enter_context(scheduled('background', user))
+            slots.enter_context(llm_slot(timeout=0))
+        except Overloaded as e:
+            slots.close()
+            with self._lock:
+                self._running.discard(user)
+                if self._entries.get(user) is entry:
+                    self._drop(user)
+                self.skipped += 1
+            logger.info("Skipped prefetch for user %s: %s", user, e)
+            return False
+        with self._lock:
+            self.started += 1
+        threading.Thread(target=self._run, args=(entry, generate, slots), name='prefetch', daemon=True).start()
+        return True
+
+    def _run(self, entry, generate, slots):
+        user = entry.user
+        with slots:
+            while entry is not None:
+                self._generate(entry, generate)
+                with self._lock:
+                    entry, generate = self._queued.pop(user, (None, None))
+                    if entry is None:
+                        self._running.discard(user)
+                    else:
+                        self.started += 1
+
+    def _generate(self, entry, generate):
+        started = time.monotonic()
+        try:
+            entry.result = generate()
+            logger.info("Prefetched outline for user %s in %.2fs", entry.user, time.monotonic() - started)
+        except Exception as e:
+            entry.error = e
+            logger.warning("Prefetch for user %s failed: %s", entry.user, e)
+        finally:
+            entry.done.set()
+
+    def adopt(self, user, key, timeout=PREFETCH_ADOPT_TIMEOUT):
+        """Take the user's prefetched outline for key, or None if there is no usable one.
+
+        Any other prefetch of the user's is discarded, as is one still queued.
+        """
+        with self._lock:
+            waiting = user in self._queued
+            entry = self._drop(user)
+        if entry is None:
+            return None
+        if entry.key != key:
+            reason = "parameters changed"
+        elif entry.expired(time.monotonic()):
+            reason = "expired"
+        elif waiting:
+            # Still behind the user's previous prefetch; calling the LLM now is quicker
+            reason = "not started"
+        else:
+            reason = None
+        if reason is not None:
+            with self._lock:
+                self.discarded += 1
+            logger.info("Discarded prefetch for user %s (%s)", user, reason)
+            return None
+        if not entry.done.wait(timeout) or entry.error is not None:
+            return None
+        with self._lock:
+            self.adopted += 1
+        return entry.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "started": self.started,
+                "queued": self.queued,
+                "adopted": self.adopted,
+                "discarded": self.discarded,
+                "skipped": self.skipped,
+            }
+
+
+_cache = PrefetchCache()
+
+
+def start_prefetch(user, key, generate):
+    return _cache.start(user, key, generate)
+
+
+def adopt_prefetch(user, key):
+    return _cache.adopt(user, key)
+
+
+def prefetch_stats():
+    return _cache.stats()
@@ -0,0 +1,406 @@
+import os
+import io
+import tempfile
+import logging
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from pptx.enum.text import PP_ALIGN, MSO_ANCHOR, MSO_AUTO_SIZE
+from pptx.dml.color import RGBColor
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from lxml import etree
+from PIL import Image, ImageDraw, ImageFont
+from image_processor import prepare_image
+from preview_format import new_preview_data
+from template_manager import get_template_manager
+from slide_cache import fragment_key, get_slide_cache
+from text_fitting import fit_text, metrics_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Part of every slide fragment cache key; bump when slide rendering changes
+BUILDER_VERSION = 1
+
+def create_presentation(content_data, image_prompts=None, template="default"):
+    try:
+        template_manager = get_template_manager()
+        template_config = template_manager.get_template(template) or template_manager.get_template('default')
+        styles = template_config.get('styles', {})
+        title_slide_styles = styles.get('title_slide', {})
+        content_slide_styles = styles.get('content_slide', {})
+        image_slide_styles = styles.get('image_slide', {})
+        
+        # Log preview image
+        preview_image = template_config.get('preview_image', '')
+        preview_image_path = os.path.join('static', preview_image)
+        if preview_image and os.path.exists(preview_image_path):
+            logger.debug("Preview image found for template %s: %s", template, preview_image_path)
+        else:
+            logger.warning("Preview image not found for template %s: %s", template, preview_image_path)
+        
+        preview_data = new_preview_data(content_data, template, styles)
+        
+        prs = Presentation()
+        SLIDE_WIDTH = Inches(10)  # Standard 4:3 slide width
+        SLIDE_HEIGHT = Inches(7.5)  # Standard 4:3 slide height
+        SUPPORTED_FORMATS = {'BMP', 'GIF', 'JPEG', 'PNG', 'TIFF', 'WMF'}
+        
+        def validate_image_format(image_path):
+            try:
+                with Image.open(image_path) as img:
+                    format = img.format.upper()
+                    if format not in SUPPORTED_FORMATS:
+                        logger.warning("Unsupported image format at %s: got %s, expected one of %s", image_path, format, SUPPORTED_FORMATS)
+                        return False
+                    logger.debug("Validated image format at %s: %s", image_path, format)
+                    return True
+            except Exception as e:
+                logger.error("Failed to validate image format at %s: %s", image_path, e)
+                return False
+        
+        def adjust_font_size(title_text, font_settings, base_size, width, height):
+            # Largest size up to the template's at which the title fits its box, minimum 20pt
+            size, lines = fit_text([title_text], font_settings.get('name', 'Calibri'), base_size, 20,
+                                   width.pt, height.pt, bold=font_settings.get('bold', True))
+            if size != base_size:
+                logger.debug("Reducing font size for title '%s...': %spt to %spt (%s lines)", title_text[:20], base_size, size, len(lines[0]))
+            return size
+        
+        # Each distinct background is validated, prepared and embedded once per
+        # package; every slide that uses it only adds a relationship to that part.
+        background_parts = {}
+
+        def get_background_part(bg_image_path):
+            if bg_image_path not in background_parts:
+                image_part = None
+                if os.path.exists(bg_image_path) and validate_image_format(bg_image_path):
+                    prepared_path = prepare_image(bg_image_path, SLIDE_WIDTH.inches, SLIDE_HEIGHT.inches)
+                    image_part = prs.part.package.get_or_add_image_part(prepared_path)
+                background_parts[bg_image_path] = image_part
+            return background_parts[bg_image_path]
+
+        def apply_background(slide, slide_styles, default_color, slide_label):
+            background_settings = slide_styles.get('background', {})
+            bg_image = slide_styles.get('background_image', '')
+            fill = slide.background.fill
+            if bg_image:
+                bg_image_path = os.path.abspath(os.path.join('static', bg_image))
+                logger.debug("Checking background image for %s: %s", slide_label, bg_image_path)
+                try:
+                    image_part = get_background_part(bg_image_path)
+                except Exception as e:
+                    logger.error("Failed to apply background image for %s: %s, error: %s", slide_label, bg_image_path, e)
+                    background_parts[bg_image_path] = image_part = None
+                if image_part is not None:
+                    logger.debug("Applying background image for %s: %s", slide_label, bg_image_path)
+                    rId = slide.part.relate_to(image_part, RT.IMAGE)
+                    pic = slide.shapes._add_pic_from_image_part(image_part, rId, 0, 0, SLIDE_WIDTH, SLIDE_HEIGHT)
+                    slide.shapes._spTree.remove(pic)
+                    slide.shapes._spTree.insert(2, pic)
+                    return
+                logger.error("Background image not found or invalid format for %s: %s", slide_label, bg_image_path)
+            else:
+                logger.debug("No background image specified for %s, using %s background", slide_label, background_settings.get('type', 'solid'))
+            fill.solid()
+            bg_color = background_settings.get('color', default_color) if background_settings.get('type') == 'solid' else background_settings.get('gradient_start', default_color)
+            fill.fore_color.rgb = RGBColor(bg_color['r'], bg_color['g'], bg_color['b'])
+            logger.debug("Applied solid color for %s: rgb(%s, %s, %s)", slide_label, bg_color['r'], bg_color['g'], bg_color['b'])
+        
+        # Slides whose content, image prompt and template were rendered before are
+        # assembled from cached shape XML (see slide_cache.py)
+        slide_cache = get_slide_cache()
+        # Fitted font sizes depend on which font files this host measures with
+        fitted_fonts = [(font.get('name', 'Calibri'), font.get('bold', True))
+                        for font in (title_slide_styles.get('title_font', {}), content_slide_styles.get('title_font', {}))]
+        fitted_fonts.append((content_slide_styles.get('body_font', {}).get('name', 'Calibri'), False))
+        fragment_scope = [BUILDER_VERSION, template, fragment_key(template_config), metrics_fingerprint(fitted_fonts)]
+
+        def restore_fragment(slide, key, index=None):
+            fragment = slide_cache.get(key)
+            if fragment is None:
+                return False
+            sp_tree = slide.shapes._spTree
+            for xml in fragment.shapes:
+                sp_tree.append(parse_xml(xml))
+            entry = dict(fragment.entry)
+            if index is not None:
+                entry["index"] = index
+            preview_data["text_styles"].update(fragment.text_styles)
+            preview_data["image_styles"].update(fragment.image_styles)
+            preview_data["slides"].append(entry)
+            return True
+
+        def store_fragment(slide, key, first_shape):
+            entry = preview_data["slides"][-1]
+            shapes = [etree.tostring(element) for element in slide.shapes._spTree[first_shape:]]
+            text_style = entry.get("points_style")
+            image_style = entry.get("image_style")
+            slide_cache.put(
+                key, shapes, dict(entry),
+                {text_style: preview_data["text_styles"][text_style]} if text_style else {},
+                {image_style: preview_data["image_styles"][image_style]} if image_style else {}
+            )
+
+        # Title Slide
+        blank_slide_layout = prs.slide_layouts[6]
+        title_slide = prs.slides.add_slide(blank_slide_layout)
+        apply_background(title_slide, title_slide_styles, {'r': 240, 'g': 240, 'b': 240}, "title slide")
+        
+        title_text = content_data.get("title", "Presentation")
+        title_image_prompt = image_prompts.get("title") if image_prompts else None
+        title_key = fragment_key(fragment_scope, "title", title_text, title_image_prompt)
+        if not restore_fragment(title_slide, title_key):
+            first_shape = len(title_slide.shapes._spTree)
+            # Title slide title textbox
+            left = Inches(0.5)
+            top = Inches(1.5)
+            width = Inches(9.0)
+            height = Inches(2.0)  # Increased height to accommodate wrapped text
+            title_box = title_slide.shapes.add_textbox(left, top, width, height)
+            title_frame = title_box.text_frame
+            title_frame.word_wrap = True  # Enable word wrapping
+            title_frame.text = title_text
+            logger.debug("Title slide heading: '%s', length: %s", title_text, len(title_text))
+            title_para = title_frame.paragraphs[0]
+            title_font_settings = title_slide_styles.get('title_font', {})
+            title_para.font.name = title_font_settings.get('name', 'Calibri')
+            base_font_size = title_font_settings.get('size', 44)
+            title_font_size = adjust_font_size(title_text, title_font_settings, base_font_size, width, height)
+            title_para.font.size = Pt(title_font_size)
+            title_color = title_font_settings.get('color', {'r': 0, 'g': 0, 'b': 0})
+            title_para.font.color.rgb = RGBColor(title_color['r'], title_color['g'], title_color['b'])
+            title_para.font.bold = title_font_settings.get('bold', True)
+            title_para.alignment = PP_ALIGN.CENTER
+        
+            title_image_style = None
+            if image_prompts and "title" in image_prompts:
+                image_position = title_slide_styles.get('image_position', {'left': 2.5, 'top': 4.0, 'width': 5.0, 'height': 2.5})
+                img_left = Inches(image_position.get('left', 2.5))
+                img_top = Inches(image_position.get('top', 4.0))
+                img_width = Inches(image_position.get('width', 5.0))
+                img_height = Inches(image_position.get('height', 2.5))
+                img_placeholder = title_slide.shapes.add_shape(1, img_left, img_top, img_width, img_height)
+                img_placeholder.fill.solid()
+                fill_color = image_slide_styles.get('fill_color', {'r': 245, 'g': 245, 'b': 245})
+                img_placeholder.fill.fore_color.rgb = RGBColor(fill_color['r'], fill_color['g'], fill_color['b'])
+                border_color = image_slide_styles.get('border_color', {'r': 200, 'g': 200, 'b': 200})
+                img_placeholder.line.color.rgb = RGBColor(border_color['r'], border_color['g'], border_color['b'])
+                img_placeholder.line.width = Pt(image_slide_styles.get('border_width', 1.5))
+                img_placeholder.line.dash_style = 2 if image_slide_styles.get('border_style', 'dashed') == 'dashed' else 1
+                text_frame = img_placeholder.text_frame
+                text_frame.word_wrap = True
+                text_frame.vertical_anchor = MSO_ANCHOR.MIDDLE
+                icon_p = text_frame.add_paragraph()
+                icon_p.text = "🖼️"
+                icon_p.alignment = PP_ALIGN.CENTER
+                icon_p.font.size = Pt(48)
+                icon_p.space_after = Pt(10)
+                prompt_p = text_frame.add_paragraph()
+                prompt_p.text = image_prompts['title']
+                prompt_p.alignment = PP_ALIGN.CENTER
+                prompt_p.font.italic = True
+                prompt_p.font.size = Pt(14)
+                prompt_p.font.color.rgb = RGBColor(100, 100, 100)
+                title_image_style = "title"
+                preview_data["image_styles"][title_image_style] = {
+                    "left": image_position.get('left', 2.5),
+                    "top": image_position.get('top', 4.0),
+                    "width": image_position.get('width', 5.0),
+                    "height": image_position.get('height', 2.5),
+                    "fill_color": fill_color,
+                    "border_color": border_color,
+                    "border_width": image_slide_styles.get('border_width', 1.5),
+                    "border_style": image_slide_styles.get('border_style', 'dashed')
+                }
+        
+            preview_data["slides"].append({
+                "type": "title",
+                "title_font_size": title_font_size,
+                "image_style": title_image_style
+            })
+            store_fragment(title_slide, title_key, first_shape)
+        
+        # Content Slides
+        for i, slide_data in enumerate(content_data.get("slides", [])):
+            slide_index = str(i)
+            content_slide = prs.slides.add_slide(blank_slide_layout)
+            apply_background(content_slide, content_slide_styles, {'r': 255, 'g': 255, 'b': 255}, f"content slide {i+1}")
+            
+            title_text = slide_data.get("title", f"Slide {i+1}")
+            slide_image_prompt = image_prompts.get(slide_index) if image_prompts else None
+            slide_key = fragment_key(fragment_scope, "content", title_text, slide_data.get("points", []), slide_image_prompt)
+            if restore_fragment(content_slide, slide_key, index=i):
+                continue
+            first_shape = len(content_slide.shapes._spTree)
+
+            # Content slide title textbox
+            title_left = Inches(0.5)
+            title_top = Inches(0.5)
+            title_width = Inches(9.0)
+            title_height = Inches(1.2)  # Increased height for wrapped text
+            title_box = content_slide.shapes.add_textbox(title_left, title_top, title_width, title_height)
+            title_frame = title_box.text_frame
+            title_frame.word_wrap = True  # Enable word wrapping
+            title_frame.text = title_text
+            logger.debug("Content slide %s heading: '%s', length: %s", i+1, title_text, len(title_text))
+            title_para = title_frame.paragraphs[0]
+            title_font = content_slide_styles.get('title_font', {})
+            title_para.font.name = title_font.get('name', 'Calibri')
+            base_font_size = title_font.get('size', 32)
+            title_font_size = adjust_font_size(title_text, title_font, base_font_size, title_width, title_height)
+            title_para.font.size = Pt(title_font_size)
+            title_color = title_font.get('color', {'r': 0, 'g': 0, 'b': 0})
+            title_para.font.color.rgb = RGBColor(title_color['r'], title_color['g'], title_color['b'])
+            title_para.font.bold = title_font.get('bold', True)
+            title_para.alignment = {
+                'center': PP_ALIGN.CENTER,
+                'left': PP_ALIGN.LEFT,
+                'right': PP_ALIGN.RIGHT
+            }.get(title_font.get('alignment', 'left'), PP_ALIGN.LEFT)
+            
+            points_style = None
+            if slide_data.get("points", []):
+                content_left = Inches(0.5)
+                content_top = Inches(2.0)  # Adjusted to account for taller title
+                content_width = Inches(5.0)
+                # Increase height to accommodate more content
+                content_height = Inches(5.0)  # Increased from 4.0 to 5.0 for more space
+                content_box = content_slide.shapes.add_textbox(content_left, content_top, content_width, content_height)
+                text_frame = content_box.text_frame
+                text_frame.word_wrap = True
+                # Sized here rather than with TEXT_TO_FIT_SHAPE, which only takes effect in PowerPoint
+                text_frame.auto_size = MSO_AUTO_SIZE.NONE
+                body_font = content_slide_styles.get('body_font', {})
+                base_body_size = body_font.get('size', 18)
+                body_size, _ = fit_text(["• " + point for point in slide_data.get("points", [])],
+                                        body_font.get('name', 'Calibri'), base_body_size, 10,
+                                        content_width.pt, content_height.pt, space_before=6, space_after=6)
+                for point in slide_data.get("points", []):
+                    if text_frame.paragraphs and text_frame.paragraphs[0].text == "":
+                        p = text_frame.paragraphs[0]
+                    else:
+                        p = text_frame.add_paragraph()
+                    p.text = "• " + point
+                    p.font.name = body_font.get('name', 'Calibri')
+                    p.font.size = Pt(body_size)
+                    body_color = body_font.get('color', {'r': 50, 'g': 50, 'b': 50})
+                    p.font.color.rgb = RGBColor(body_color['r'], body_color['g'], body_color['b'])
+                    p.space_before = Pt(6)
+                    p.space_after = Pt(6)
+                    p.alignment = {
+                        'center': PP_ALIGN.CENTER,
+                        'left': PP_ALIGN.LEFT,
+                        'right': PP_ALIGN.RIGHT
+                    }.get(body_font.get('alignment', 'left'), PP_ALIGN.LEFT)
+                points_style = "body" if body_size == base_body_size else f"body_{body_size}"
+                preview_data["text_styles"][points_style] = {
+                    "level": 0,
+                    "font_name": body_font.get('name', 'Calibri'),
+                    "font_size": body_size,
+                    "color": body_font.get('color', {'r': 50, 'g': 50, 'b': 50}),
+                    "alignment": body_font.get('alignment', 'left'),
+                    "space_before": 6,
+                    "space_after": 6
+                }
+            
+            content_image_style = None
+            if image_prompts and slide_index in image_prompts:
+                image_position = content_slide_styles.get('image_position', {'left': 6.0, 'top': 2.0, 'width': 3.5, 'height': 4.0})
+                img_left = Inches(image_position.get('left', 6.0))
+                img_top = Inches(image_position.get('top', 2.0))
+                img_width = Inches(image_position.get('width', 3.5))
+                img_height = Inches(image_position.get('height', 4.0))
+                img_placeholder = content_slide.shapes.add_shape(1, img_left, img_top, img_width, img_height)
+                img_placeholder.fill.solid()
+                fill_color = image_slide_styles.get('fill_color', {'r': 245, 'g': 245, 'b': 245})
+                img_placeholder.fill.fore_color.rgb = RGBColor(fill_color['r'], fill_color['g'], fill_color['b'])
+                border_color = image_slide_styles.get('border_color', {'r': 200, 'g': 200, 'b': 200})
+                img_placeholder.line.color.rgb = RGBColor(border_color['r'], border_color['g'], border_color['b'])
+                img_placeholder.line.width = Pt(image_slide_styles.get('border_width', 1.5))
+                img_placeholder.line.dash_style = 2 if image_slide_styles.get('border_style', 'dashed') == 'dashed' else 1
+                text_frame = img_placeholder.text_frame
+                text_frame.word_wrap = True
+                text_frame.vertical_anchor = MSO_ANCHOR.MIDDLE
+                icon_p = text_frame.add_paragraph()
+                icon_p.text = "🖼️"
+                icon_p.alignment = PP_ALIGN.CENTER
+                icon_p.font.size = Pt(48)
+                icon_p.space_after = Pt(10)
+                prompt_p = text_frame.add_paragraph()
+                prompt_p.text = image_prompts[slide_index]
+                prompt_p.alignment = PP_ALIGN.CENTER
+                prompt_p.font.italic = True
+                prompt_p.font.size = Pt(14)
+                prompt_p.font.color.rgb = RGBColor(100, 100, 100)
+                content_image_style = "content"
+                preview_data["image_styles"][content_image_style] = {
+                    "left": image_position.get('left', 6.0),
+                    "top": image_position.get('top', 2.0),
+                    "width": image_position.get('width', 3.5),
+                    "height": image_position.get('height', 4.0),
+                    "fill_color": fill_color,
+                    "border_color": border_color,
+                    "border_width": image_slide_styles.get('border_width', 1.5),
+                    "border_style": image_slide_styles.get('border_style', 'dashed')
+                }
+            
+            preview_data["slides"].append({
+                "type": "content",
+                "index": i,
+                "title_font_size": title_font_size,
+                "points_style": points_style,
+                "image_style": content_image_style
+            })
+            store_fragment(content_slide, slide_key, first_shape)
+        
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pptx")
+        try:
+            with temp_file:
+                prs.save(temp_file)
+        except Exception:
+            # A failed save leaves a partial file nobody else knows about
+            os.unlink(temp_file.name)
+            raise
+        return temp_file.name, preview_data
+    
+    except Exception as e:
+        logger.error("PowerPoint creation error: %s", e)
+        raise Exception(f"Failed to create PowerPoint: {str(e)}")
+    
+
+def generate_slide_previews(pptx_path):
+    prs = Presentation(pptx_path)
+    slide_previews = []
+    
+    for slide_idx, slide in enumerate(prs.slides):
+        # Create a blank image for the slide (e.g., 960x540 pixels)
+        img = Image.new('RGB', (960, 540), color=(255, 255, 255))
+        # Here, you'd typically use a library like pptx2img or a custom renderer
+        # For simplicity, we'll simulate with text rendering (upgrade with pptx2img later)
+        # Get slide layout (simplified)
+        title = slide.shapes.title.text if slide.shapes.title else f"Slide {slide_idx + 1}"
+        content = "\n".join([shape.text for shape in slide.shapes if shape.text and shape != slide.shapes.title])
+
+        # Draw title
+        draw = ImageDraw.Draw(img)
+        try:
+            font = ImageFont.load_default()
+            draw.text((50, 50), title, fill=(0, 0, 0), font=font)
+            y_text = 100
+            for line in content.split('\n'):
+                draw.text((50, y_text), line, fill=(50, 50, 50), font=font)
+                y_text += 30
+        except Exception as e:
+            logger.error("Error rendering text for slide %s: %s", slide_idx, e)
+
+        # Save image to a byte stream
+        img_byte_arr = io.BytesIO()
+        img.save(img_byte_arr, format='PNG')
+        img_byte_arr.seek(0)
+        slide_previews.append({
+            'image': img_byte_arr,
+            'title': title,
+            'content': content
+        })
+
+    return slide_previews
@@ -0,0 +1,92 @@
+"""Compact preview_data format shared by create_presentation and the frontend.
+
+Version 2 defines text and image styles once per deck and has slides reference
+them by id. Slide titles, bullet points and image prompts are not repeated in
+the preview because every response that carries a preview also carries (or the
+client already holds) the `content` and `image_prompts` they came from.
+"""
+
+PREVIEW_FORMAT_VERSION = 2
+LEGACY_PREVIEW_FORMAT_VERSION = 1
+
+
+def new_preview_data(content_data, template, styles):
+    """The preview_data of a deck before any slides are added; styles is the template's."""
+    title_styles = styles.get('title_slide', {})
+    content_styles = styles.get('content_slide', {})
+    image_styles = styles.get('image_slide', {})
+    return {
+        "version": PREVIEW_FORMAT_VERSION,
+        "title": content_data.get("title", "Presentation"),
+        "template": template,
+        "styles": {
+            "title_slide": {
+                "background": title_styles.get('background', {'type': 'solid', 'color': {'r': 240, 'g': 240, 'b': 240}}),
+                "background_image": title_styles.get('background_image', ''),
+                "title_font": title_styles.get('title_font', {'name': 'Calibri', 'size': 44, 'color': {'r': 0, 'g': 0, 'b': 0}, 'bold': True, 'alignment': 'center'}),
+                "image_position": title_styles.get('image_position', {'left': 2.5, 'top': 4.0, 'width': 5.0, 'height': 2.5})
+            },
+            "content_slide": {
+                "background": content_styles.get('background', {'type': 'solid', 'color': {'r': 255, 'g': 255, 'b': 255}}),
+                "background_image": content_styles.get('background_image', ''),
+                "title_font": content_styles.get('title_font', {'name': 'Calibri', 'size': 32, 'color': {'r': 0, 'g': 0, 'b': 0}, 'bold': True, 'alignment': 'left'}),
+                "body_font": content_styles.get('body_font', {'name': 'Calibri', 'size': 18, 'color': {'r': 50, 'g': 50, 'b': 50}, 'alignment': 'left'}),
+                "image_position": content_styles.get('image_position', {'left': 6.0, 'top': 1.5, 'width': 3.5, 'height': 4.5})
+            },
+            "image_slide": {
+                "fill_color": image_styles.get('fill_color', {'r': 245, 'g': 245, 'b': 245}),
+                "border_color": image_styles.get('border_color', {'r': 200, 'g': 200, 'b': 200}),
+                "border_width": image_styles.get('border_width', 1.5),
+                "border_style": image_styles.get('border_style', 'dashed')
+            }
+        },
+        "text_styles": {},
+        "image_styles": {},
+        "slides": []
+    }
+
+
+def expand_preview_data(preview_data, content_data, image_prompts=None):
+    """Rebuild the version 1 (fully inlined) preview from a version 2 preview."""
+    if preview_data.get('version', LEGACY_PREVIEW_FORMAT_VERSION) == LEGACY_PREVIEW_FORMAT_VERSION:
+        return preview_data
+
+    image_prompts = image_prompts or {}
+    text_styles = preview_data.get('text_styles', {})
+    image_styles = preview_data.get('image_styles', {})
+    content_slides = content_data.get('slides', [])
+
+    slides = []
+    for slide in preview_data.get('slides', []):
+        image_style_id = slide.get('image_style')
+        if slide['type'] == 'title':
+            prompt_key = 'title'
+            expanded = {
+                "type": "title",
+                "title": content_data.get("title", "Presentation"),
+            }
+        else:
+            index = slide['index']
+            prompt_key = str(index)
+            slide_data = content_slides[index] if index < len(content_slides) else {}
+            points = slide_data.get("points", [])
+            points_style = text_styles.get(slide.get('points_style'), {})
+            expanded = {
+                "type": "content",
+                "title": slide_data.get("title", f"Slide {index+1}"),
+                "points": points,
+                "points_styling": [dict(points_style, text=point) for point in points],
+            }
+        expanded.update({
+            "has_image": image_style_id is not None,
+            "image_prompt": image_prompts.get(prompt_key),
+            "image_style": image_styles.get(image_style_id, {}) if image_style_id else {},
+        })
+        slides.append(expanded)
+
+    return {
+        "title": preview_data.get("title", "Presentation"),
+        "template": preview_data.get("template"),
+        "styles": preview_data.get("styles", {}),
+        "slides": slides,
+    }
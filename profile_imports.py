@@ -0,0 +1,64 @@
+"""Report what `import app` costs at startup.
+
+Runs a fresh interpreter with `-X importtime`, prints the slowest top-level
+imports and checks that heavy deck-building dependencies are not loaded until
+a route needs them.
+
+    python profile_imports.py [--top N]
+"""
+import argparse
+import subprocess
+import sys
+
+HEAVY_MODULES = ('pptx', 'PIL', 'requests', 'dateutil', 'lxml', 'boto3', 'botocore')
+
+
+def profile_imports(module='app'):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'import failed')
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings.append((name[1:], int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    timings = profile_imports(args.module)
+    # importtime prints children (indented two spaces per level) before their parent
+    direct, pending, total_us = [], [], 0
+    for name, self_us, cumulative in timings:
+        if not name.startswith(' '):
+            if name == args.module:
+                direct, total_us = pending, cumulative
+            pending = []
+        elif not name.startswith('   '):
+            pending.append((name, self_us, cumulative))
+
+    print(f"import {args.module}: {total_us / 1000:.1f} ms")
+    for name, _, cumulative in sorted(direct, key=lambda t: t[2], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name.strip()}")
+
+    loaded = {name.strip().split('.')[0] for name, _, _ in timings}
+    eager = [module for module in HEAVY_MODULES if module in loaded]
+    if eager:
+        print(f"Heavy modules loaded at import time: {', '.join(eager)}")
+        return 1
+    print("No heavy modules loaded at import time")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Profile a single request on demand, in production.
+
+When one deck is slow, an admin can repeat the request with the header
+`X-Profile: 1` (or `?profile=1`) to find out where the time goes: the LLM
+call, the build, image preparation, prs.save or SQLite. That request alone
+runs under cProfile. If its deck is built in the build pool, the builder
+process profiles the build too, and the two profiles are merged. The response
+carries an X-Profile-Id header. The profile is written to PROFILE_DIR as
+pstats (open with `python -m pstats` or snakeviz), with a text summary of the
+top functions by cumulative time. Only the newest PROFILE_RETENTION profiles
+are kept. /debug/profiles lists them for download.
+
+Only users named in PROFILING_ADMINS (comma-separated usernames) can profile
+or see profiles. When it is empty (the default) no hooks are installed, so
+requests pay nothing. One request per process is profiled at a time; a flagged
+request that arrives while another is being profiled runs normally.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, request, session
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ADMINS = {name.strip() for name in os.environ.get('PROFILING_ADMINS', '').split(',') if name.strip()}
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join('cache', 'profiles'))
+PROFILE_RETENTION = int(os.environ.get('PROFILE_RETENTION', 20))
+PROFILE_SUMMARY_LINES = 40
+PROFILE_FILE_SUFFIXES = ('.prof', '.txt')
+
+_active = threading.Lock()
+
+
+class _Stats:
+    # What pstats.Stats.add accepts besides a file name: an object with create_stats() and .stats
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class RequestProfile:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.extra_stats = []
+        self.started = time.perf_counter()
+
+    def add_stats(self, stats):
+        """Merge raw cProfile stats from elsewhere, e.g. a build pool process."""
+        self.extra_stats.append(stats)
+
+    def stats(self):
+        stats = pstats.Stats(self.profiler)
+        for extra in self.extra_stats:
+            stats.add(_Stats(extra))
+        return stats
+
+
+def profiling_enabled():
+    return bool(PROFILING_ADMINS)
+
+
+def is_profiling_admin():
+    return session.get('username') in PROFILING_ADMINS
+
+
+def current_profile():
+    """The RequestProfile of the current request, or None if it is not being profiled."""
+    return g.get('request_profile') if profiling_enabled() else None
+
+
+def _requested():
+    return request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+
+
+def _prune():
+    # The ring is the directory itself, so it is shared by every process on the host
+    metas = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+    for name in metas[:max(0, len(metas) - PROFILE_RETENTION)]:
+        stem = name[:-len('.json')]
+        for suffix in ('.json',) + PROFILE_FILE_SUFFIXES:
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(profile, response):
+    """Write the profile, its summary and metadata; return the profile id."""
+    duration = time.perf_counter() - profile.started
+    # Never built from the request id: a client's X-Request-ID must not end up in a path
+    profile_id = f"{datetime.now():%Y%m%dT%H%M%S%f}_{uuid.uuid4().hex[:8]}"
+    stats = profile.stats()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stats.dump_stats(os.path.join(PROFILE_DIR, profile_id + '.prof'))
+    summary = io.StringIO()
+    stats.stream = summary
+    stats.sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    with open(os.path.join(PROFILE_DIR, profile_id + '.txt'), 'w') as file:
+        file.write(f"{request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+                   f"in {duration * 1000:.1f}ms\n\n{summary.getvalue()}")
+    meta = {
+        "id": profile_id,
+        "request_id": g.get('request_id'),
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 2),
+        "user": session.get('username'),
+        "build_profiles": len(profile.extra_stats),
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+    }
+    # Metadata last: listing only shows profiles whose files are complete
+    with open(os.path.join(PROFILE_DIR, profile_id + '.json'), 'w') as file:
+        json.dump(meta, file)
+    _prune()
+    return profile_id
+
+
+def list_profiles():
+    """Metadata of the kept profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted((name for name in os.listdir(PROFILE_DIR) if name.endswith('.json')), reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            continue  # Pruned or half-written meanwhile
+    return profiles
+
+
+def init_profiling(app):
+    """Register the hooks that profile flagged requests from PROFILING_ADMINS."""
+    if not profiling_enabled():
+        return
+
+    @app.before_request
+    def _start_profile():
+        if not _requested() or not is_profiling_admin():
+            return
+        if not _active.acquire(blocking=False):
+            logger.info("Not profiling %s: another request is being profiled", request.path)
+            return
+        profile = g.request_profile = RequestProfile()
+        profile.profiler.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        profile.profiler.disable()
+        try:
+            response.headers['X-Profile-Id'] = save_profile(profile, response)
+        except Exception as e:
+            logger.error("Failed to save profile of %s: %s", request.path, e)
+        finally:
+            _active.release()
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request did not run (e.g. the client went away); never leave the profiler on
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.profiler.disable()
+            _active.release()
+
+    logger.info("Request profiling enabled for %s", ', '.join(sorted(PROFILING_ADMINS)))
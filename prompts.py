@@ -0,0 +1,181 @@
+"""Prompt construction for the Ollama generate calls, with token budgets.
+
+build_prompt returns the prompt text plus the Ollama options that bound it:
+num_ctx for the context window and num_predict for the output, scaled to the
+number of slides so latency grows with the deck instead of without limit.
+Custom content that would not fit the context next to the expected output is
+compacted first (see compact_content).
+
+Prompt templates are versioned. v1 is the original verbose wording; v2 is the
+trimmed default. Select one with OLLAMA_PROMPT_VERSION and compare them with
+`python bench_prompts.py`.
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token, which is
+close enough for English text to size budgets without loading a tokenizer.
+"""
+import logging
+import math
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+PROMPT_VERSION = os.environ.get('OLLAMA_PROMPT_VERSION', 'v2')
+NUM_CTX = int(os.environ.get('OLLAMA_NUM_CTX', 4096))
+POINTS_PER_SLIDE = int(os.environ.get('PROMPT_POINTS_PER_SLIDE', 4))
+WORDS_PER_POINT = int(os.environ.get('PROMPT_WORDS_PER_POINT', 20))
+CHARS_PER_TOKEN = 4
+TOKENS_PER_WORD = 1.4
+SLIDE_OVERHEAD_TOKENS = 24  # Slide title plus JSON punctuation
+DECK_OVERHEAD_TOKENS = 40  # Deck title and the JSON wrapper
+OUTPUT_SLACK = 1.3  # Models overshoot requested lengths; a cut-off reply is invalid JSON
+MAX_SLIDES = 20
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+_V1_EXAMPLE = """{{
+                "title": "Overall Presentation Title",
+                "slides": [
+                    {{
+                        "title": "Slide 1 Title",
+                        "points": [
+                            "Point 1: Detailed explanation or context",
+                            "Point 2: Detailed explanation or context",
+                            "Point 3: Detailed explanation or context",
+                            "Point 4: Additional context or related points",
+                            "Point 5: Further insights or examples"
+                        ]
+                    }},
+                    ...
+                ]
+            }}"""
+
+PROMPT_TEMPLATES = {
+    'v1': {
+        'topic': """Generate a detailed JSON for a presentation about '{topic}' with {num_slides} slides.
+            Each slide should have the following:
+            - A detailed title
+            - At least 5 concise and informative bullet points per slide (if applicable)
+            - Provide some additional explanations or insights for each bullet point
+            - Ensure the content is rich, professional, and informative
+            Format EXACTLY as this JSON structure:
+            """ + _V1_EXAMPLE + """
+            Requirements:
+            - Use clear, professional language
+            - Ensure each slide has a meaningful title
+            - Create at least 5 detailed, informative bullet points per slide
+            - Provide explanations, context, or examples where relevant
+            - Avoid any markdown, code blocks, or extra formatting
+            """,
+        'custom': """Convert the following presentation content into a well-structured JSON format.
+            The content provided by the user is about: '{topic}'
+
+            USER CONTENT:
+            {content}
+
+            Format EXACTLY as this JSON structure:
+            """ + _V1_EXAMPLE + """
+
+            Requirements:
+            - Use clear, professional language
+            - Extract slide titles and bullet points from the user content
+            - Organize the content logically
+            - If the user hasn't provided enough structure, create appropriate slide titles and organize the content
+            - Add bullet points where not explicitly provided by user
+            - Avoid any markdown, code blocks, or extra formatting
+            """,
+    },
+    'v2': {
+        'topic': """Write a presentation about '{topic}' with {num_slides} slides.
+Reply with JSON only: {{"title": "...", "slides": [{{"title": "...", "points": ["...", ...]}}]}}
+Each slide needs a specific title and {points} informative bullet points of at most {words} words each.
+Use clear, professional language and no markdown.""",
+        'custom': """Turn this content about '{topic}' into a presentation with about {num_slides} slides.
+Reply with JSON only: {{"title": "...", "slides": [{{"title": "...", "points": ["...", ...]}}]}}
+Keep the user's structure and wording where it has any; otherwise choose slide titles and split the text into bullet points of at most {words} words.
+Use clear, professional language and no markdown.
+
+CONTENT:
+{content}""",
+    },
+}
+
+
+def output_token_budget(num_slides, points=POINTS_PER_SLIDE, words=WORDS_PER_POINT):
+    per_slide = SLIDE_OVERHEAD_TOKENS + points * (words * TOKENS_PER_WORD + 4)
+    return int((DECK_OVERHEAD_TOKENS + num_slides * per_slide) * OUTPUT_SLACK)
+
+
+def estimate_slide_count(content):
+    """Guess how many slides custom content describes: one per heading or paragraph block."""
+    blocks = [block for block in re.split(r'\n\s*\n', content.strip()) if block.strip()]
+    headings = [line for line in content.splitlines() if re.match(r'\s*(#+\s|slide\s*\d+|\d+[.)]\s)', line, re.I)]
+    return max(1, min(MAX_SLIDES, len(headings) or len(blocks)))
+
+
+def compact_content(content, max_tokens):
+    """Shrink content to about max_tokens while keeping every section represented.
+
+    Each paragraph keeps its leading sentences, with the budget shared in
+    proportion to paragraph length, so late sections are not simply cut off.
+    This is extractive: calling the model to summarize would cost more latency
+    than it saves.
+    """
+    if estimate_tokens(content) <= max_tokens:
+        return content
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', content.strip()) if p.strip()]
+    total = sum(len(p) for p in paragraphs)
+    compacted = []
+    for paragraph in paragraphs:
+        share = max(80, int(max_chars * len(paragraph) / total))
+        sentences = re.split(r'(?<=[.!?])\s+|\n', paragraph)
+        kept = ''
+        for sentence in sentences:
+            if kept and len(kept) + len(sentence) + 1 > share:
+                break
+            kept = f"{kept} {sentence}".strip() if kept else sentence
+        compacted.append(kept[:share])
+    # Many tiny paragraphs can overrun through the per-paragraph minimum
+    return '\n\n'.join(compacted)[:max_chars]
+
+
+def build_prompt(topic, num_slides, custom_content=None, version=None):
+    """Return (prompt, options) for an Ollama generate call.
+
+    num_slides of 0 with custom_content means "as many as the content needs".
+    """
+    version = version or PROMPT_VERSION
+    templates = PROMPT_TEMPLATES.get(version)
+    if templates is None:
+        logger.warning("Unknown prompt version %s, using %s", version, 'v2')
+        version, templates = 'v2', PROMPT_TEMPLATES['v2']
+
+    if custom_content:
+        num_slides = num_slides or estimate_slide_count(custom_content)
+        template_tokens = estimate_tokens(templates['custom'].format(
+            topic=topic, num_slides=num_slides, points=POINTS_PER_SLIDE, words=WORDS_PER_POINT, content=''))
+        content_tokens = estimate_tokens(custom_content)
+        if template_tokens + content_tokens + output_token_budget(num_slides) > NUM_CTX:
+            # Leave half of the remaining window for the reply
+            custom_content = compact_content(custom_content, max(256, (NUM_CTX - template_tokens) // 2))
+            logger.info("Compacted custom content from %s to %s tokens", content_tokens, estimate_tokens(custom_content))
+            content_tokens = estimate_tokens(custom_content)
+        # Reformatting echoes the content back, so the reply is at least as long as the input
+        num_predict = max(output_token_budget(num_slides), int(content_tokens * OUTPUT_SLACK))
+        prompt = templates['custom'].format(topic=topic, num_slides=num_slides, points=POINTS_PER_SLIDE,
+                                            words=WORDS_PER_POINT, content=custom_content)
+    else:
+        num_slides = max(1, min(MAX_SLIDES, num_slides))
+        num_predict = output_token_budget(num_slides)
+        prompt = templates['topic'].format(topic=topic, num_slides=num_slides, points=POINTS_PER_SLIDE,
+                                           words=WORDS_PER_POINT)
+
+    prompt_tokens = estimate_tokens(prompt)
+    num_predict = min(num_predict, max(256, NUM_CTX - prompt_tokens))
+    num_ctx = NUM_CTX if prompt_tokens + num_predict <= NUM_CTX else prompt_tokens + num_predict
+    logger.debug("Prompt %s: ~%s tokens in, num_predict %s, num_ctx %s", version, prompt_tokens, num_predict, num_ctx)
+    return prompt, {"num_predict": num_predict, "num_ctx": num_ctx}
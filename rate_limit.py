@@ -0,0 +1,186 @@
+"""Admission control for the generation endpoints.
+
+Two layers, both answering immediately instead of letting requests queue until
+they time out:
+
+- A token bucket per user and action. An empty bucket gets 429 with Retry-After.
+- A per-process concurrency gate in front of the LLM stage. When every slot is
+  busy for longer than LLM_QUEUE_TIMEOUT, the request gets 503 with Retry-After.
+  The total LLM concurrency is WEB_WORKERS x LLM_MAX_CONCURRENCY.
+
+Bucket state is kept in memory by default (per process). Set
+RATE_LIMIT_BACKEND=sqlite to share buckets between worker processes on one
+host. Any object with a take(key, capacity, refill_per_sec) method can stand
+in as the store.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import jsonify, session
+
+logger = logging.getLogger(__name__)
+
+# Sustained requests per minute and burst size per user, by action
+RATE_LIMITS = {
+    'generate': (float(os.environ.get('GENERATE_RATE_PER_MIN', 6)), int(os.environ.get('GENERATE_BURST', 3))),
+    'update': (float(os.environ.get('UPDATE_RATE_PER_MIN', 30)), int(os.environ.get('UPDATE_BURST', 10))),
+    'prefetch': (float(os.environ.get('PREFETCH_RATE_PER_MIN', 12)), int(os.environ.get('PREFETCH_BURST', 4))),
+}
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', 2))
+LLM_RETRY_AFTER = int(os.environ.get('LLM_RETRY_AFTER', 10))
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; carries the Retry-After hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MemoryBucketStore:
+    # A bucket that has refilled to capacity is the same as no bucket, so those
+    # are dropped every SWEEP_INTERVAL seconds and idle users cost no memory
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated, time the bucket is full again)
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+
+    def take(self, key, capacity, refill_per_sec):
+        """Take one token; return 0 on success or the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_sec)
+            wait = 0 if tokens >= 1 else (1 - tokens) / refill_per_sec
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_per_sec)
+            return wait
+
+    def _sweep(self, now):
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        self._next_sweep = now + self.SWEEP_INTERVAL
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class SqliteBucketStore:
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def take(self, key, capacity, refill_per_sec):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0, now - updated) * refill_per_sec)
+            wait = 0 if tokens >= 1 else (1 - tokens) / refill_per_sec
+            if not wait:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+            return wait
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if os.environ.get('RATE_LIMIT_BACKEND', 'memory') == 'sqlite':
+                _store = SqliteBucketStore(os.environ.get('DATABASE_PATH', 'users.db'))
+            else:
+                _store = MemoryBucketStore()
+        return _store
+
+
+def set_bucket_store(store):
+    """Swap in another store (e.g. a shared one, or a stand-in for tests)."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def overloaded_response(message, status, retry_after):
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(action):
+    """Route decorator: reject with 429 once the user's bucket for action is empty."""
+    rate_per_min, burst = RATE_LIMITS[action]
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = f"{action}:{session.get('user_id')}"
+            try:
+                wait = get_bucket_store().take(key, burst, rate_per_min / 60.0)
+            except sqlite3.Error as e:
+                # Fail open: a broken limiter must not take generation down with it
+                logger.error("Rate limiter store error: %s", e)
+                wait = 0
+            if wait:
+                retry_after = max(1, math.ceil(wait))
+                logger.info("Rate limited %s for user %s, retry after %ss", action, session.get('user_id'), retry_after)
+                return overloaded_response("Too many requests, please slow down", 429, retry_after)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+_llm_gate = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+@contextmanager
+def llm_slot(timeout=LLM_QUEUE_TIMEOUT):
+    """Hold one of the process's LLM slots, or raise Overloaded if none frees up in time."""
+    if not _llm_gate.acquire(timeout=timeout):
+        logger.warning("LLM stage saturated (%s in flight), shedding request", LLM_MAX_CONCURRENCY)
+        raise Overloaded("The generator is busy, please try again shortly", LLM_RETRY_AFTER)
+    try:
+        yield
+    finally:
+        _llm_gate.release()
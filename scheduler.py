@@ -0,0 +1,169 @@
+"""Priority classes with separate concurrency budgets and per-user fair queuing.
+
+Requests run their expensive stage inside `scheduled(priority_class, user_id)`:
+
+- interactive: update_ppt rebuilds that never touch the LLM
+- generation:  fresh generate_ppt calls (LLM + build)
+- background:  speculative or batch work
+
+Each class has its own slot budget, so a backlog in one class never holds up
+another. Within a class, waiting requests are admitted round-robin across users
+so one user's burst cannot starve everyone else. Waiting longer than the class
+queue timeout raises rate_limit.Overloaded. Queue wait per class is recorded
+in the request's stage timings and aggregated in scheduler_stats().
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import session
+
+from logging_config import record_stage
+from rate_limit import Overloaded, overloaded_response
+
+logger = logging.getLogger(__name__)
+
+# class -> (concurrent slots, max queue wait in seconds)
+PRIORITY_CLASSES = {
+    'interactive': (int(os.environ.get('SCHED_INTERACTIVE_SLOTS', 4)), float(os.environ.get('SCHED_INTERACTIVE_TIMEOUT', 30))),
+    'generation': (int(os.environ.get('SCHED_GENERATION_SLOTS', 4)), float(os.environ.get('SCHED_GENERATION_TIMEOUT', 10))),
+    'background': (int(os.environ.get('SCHED_BACKGROUND_SLOTS', 1)), float(os.environ.get('SCHED_BACKGROUND_TIMEOUT', 0))),
+}
+SCHED_RETRY_AFTER = int(os.environ.get('SCHED_RETRY_AFTER', 5))
+WAIT_SAMPLES = 512  # Recent waits kept per class for percentiles
+
+
+class _Ticket:
+    __slots__ = ('user', 'granted')
+
+    def __init__(self, user):
+        self.user = user
+        self.granted = False
+
+
+class _PriorityClass:
+    def __init__(self, name, slots, timeout):
+        self.name = name
+        self.slots = slots
+        self.timeout = timeout
+        self.active = 0
+        self.queues = OrderedDict()  # user -> deque of waiting tickets, in round-robin order
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.recent_waits = deque(maxlen=WAIT_SAMPLES)
+
+
+class PriorityScheduler:
+    def __init__(self, classes=PRIORITY_CLASSES):
+        self._cond = threading.Condition()
+        self._classes = {name: _PriorityClass(name, slots, timeout) for name, (slots, timeout) in classes.items()}
+
+    def _dispatch(self, pclass):
+        # Grant free slots to the next user in round-robin order
+        granted = False
+        while pclass.active < pclass.slots and pclass.queues:
+            user, tickets = pclass.queues.popitem(last=False)
+            ticket = tickets.popleft()
+            if tickets:
+                pclass.queues[user] = tickets
+            ticket.granted = True
+            pclass.active += 1
+            pclass.waiting -= 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _remove(self, pclass, ticket):
+        tickets = pclass.queues.get(ticket.user)
+        if tickets is not None:
+            tickets.remove(ticket)
+            if not tickets:
+                del pclass.queues[ticket.user]
+        pclass.waiting -= 1
+
+    def acquire(self, class_name, user, timeout=None):
+        """Wait for a slot in class_name; return the seconds spent queued."""
+        pclass = self._classes[class_name]
+        timeout = pclass.timeout if timeout is None else timeout
+        started = time.monotonic()
+        with self._cond:
+            ticket = _Ticket(user)
+            pclass.queues.setdefault(user, deque()).append(ticket)
+            pclass.waiting += 1
+            self._dispatch(pclass)
+            deadline = started + timeout
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(pclass, ticket)
+                    pclass.rejected += 1
+                    logger.warning("Scheduler shed %s request for user %s after %.2fs (%s active, %s waiting)",
+                                   class_name, user, time.monotonic() - started, pclass.active, pclass.waiting)
+                    raise Overloaded("The server is busy, please try again shortly", SCHED_RETRY_AFTER)
+                self._cond.wait(remaining)
+            waited = time.monotonic() - started
+            pclass.admitted += 1
+            pclass.wait_total += waited
+            pclass.recent_waits.append(waited)
+            return waited
+
+    def release(self, class_name):
+        pclass = self._classes[class_name]
+        with self._cond:
+            pclass.active -= 1
+            self._dispatch(pclass)
+
+    def stats(self):
+        with self._cond:
+            result = {}
+            for name, pclass in self._classes.items():
+                waits = sorted(pclass.recent_waits)
+                result[name] = {
+                    "slots": pclass.slots,
+                    "active": pclass.active,
+                    "waiting": pclass.waiting,
+                    "admitted": pclass.admitted,
+                    "rejected": pclass.rejected,
+                    "wait_ms_mean": round(pclass.wait_total / pclass.admitted * 1000, 2) if pclass.admitted else 0,
+                    "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 2) if waits else 0,
+                    "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0,
+                }
+            return result
+
+
+_scheduler = PriorityScheduler()
+
+
+@contextmanager
+def scheduled(class_name, user):
+    """Run the block inside a slot of class_name, queued fairly per user."""
+    waited = _scheduler.acquire(class_name, user)
+    record_stage(f"queue_{class_name}", waited)
+    try:
+        yield waited
+    finally:
+        _scheduler.release(class_name)
+
+
+def priority(class_name):
+    """Route decorator: run the view in a class_name slot for the session's user, or answer 503."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                with scheduled(class_name, session.get('user_id')):
+                    return f(*args, **kwargs)
+            except Overloaded as e:
+                return overloaded_response(str(e), 503, e.retry_after)
+        return decorated_function
+    return decorator
+
+
+def scheduler_stats():
+    return _scheduler.stats()
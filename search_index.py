@@ -0,0 +1,151 @@
+"""Full-text search over a user's presentation history (SQLite FTS5).
+
+presentations_fts holds one row per presentation, keyed by presentations.id:
+the deck title, its slide titles and its bullet text. generate_ppt and
+update_ppt add the row in the same transaction that records the deck.
+
+Every row also carries an `owner` token ("u<user_id>") and each search ANDs it
+with the user's terms. FTS5 then intersects the owner's posting list with the
+terms' lists, so a query only touches that user's documents.
+
+Results are ranked in tiers: decks whose title matches, then slide titles,
+then bullet text, newest first within a tier. FTS5's bm25() is avoided on
+purpose: it counts every document containing each term across all users, so
+its cost grows with the whole table rather than with the user's history.
+
+If the SQLite build lacks FTS5, search falls back to a LIKE match on titles.
+"""
+import logging
+import re
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_TERMS = 12
+SNIPPET_CHARS = 120
+
+# Column groups searched for each ranking tier, best first
+RANK_TIERS = ('{title}', '{slide_titles}', '{title slide_titles body}')
+
+_fts_available = None
+
+
+def _owner_token(user_id):
+    return f"u{user_id}"
+
+
+def init_search_index(conn):
+    """Create the index if needed and add title-only rows for presentations it is missing."""
+    global _fts_available
+    try:
+        conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS presentations_fts USING fts5(
+            owner, title, slide_titles, body,
+            tokenize = 'porter unicode61'
+        )
+        ''')
+        # Decks saved before the index existed only have a title to go on
+        conn.execute('''
+        INSERT INTO presentations_fts (rowid, owner, title, slide_titles, body)
+        SELECT p.id, 'u' || p.user_id, p.title, '', ''
+        FROM presentations p
+        WHERE NOT EXISTS (SELECT 1 FROM presentations_fts f WHERE f.rowid = p.id)
+        ''')
+        _fts_available = True
+    except sqlite3.OperationalError as e:
+        logger.warning("SQLite FTS5 unavailable, search falls back to title matching: %s", e)
+        _fts_available = False
+
+
+def index_presentation(conn, presentation_id, user_id, content_data):
+    """Add (or replace) the index row for one presentation; part of the caller's transaction."""
+    if _fts_available is False:
+        return
+    slides = content_data.get('slides', [])
+    conn.execute(
+        'INSERT OR REPLACE INTO presentations_fts (rowid, owner, title, slide_titles, body) VALUES (?, ?, ?, ?, ?)',
+        (presentation_id, _owner_token(user_id), content_data.get('title', ''),
+         '\n'.join(str(slide.get('title', '')) for slide in slides),
+         '\n'.join(str(point) for slide in slides for point in slide.get('points', [])))
+    )
+
+
+def _query_terms(query):
+    return re.findall(r'\w+', query)[:MAX_QUERY_TERMS]
+
+
+def _match_expression(terms, columns):
+    # Quote every term so user input can never be parsed as FTS5 syntax. No prefix
+    # matching: merging every term under a prefix costs far more than an exact
+    # lookup, and the porter stemmer already matches other forms of a word.
+    # Terms are limited to content columns, or "u12" would match all of user 12's decks.
+    return f"{columns} : (" + ' AND '.join(f'"{term}"' for term in terms) + ')'
+
+
+def _snippet(texts, terms):
+    # The first line mentioning a term, trimmed around it; cheaper than FTS5's
+    # snippet(), which would re-run the whole match for every row
+    lowered = [term.lower() for term in terms]
+    for text in texts:
+        for line in text.splitlines():
+            line_lower = line.lower()
+            positions = [line_lower.find(term) for term in lowered if term in line_lower]
+            if positions:
+                start = max(0, min(positions) - SNIPPET_CHARS // 3)
+                snippet = line[start:start + SNIPPET_CHARS]
+                return ('…' if start else '') + snippet + ('…' if start + SNIPPET_CHARS < len(line) else '')
+    return None
+
+
+def search_presentations(conn, user_id, query, limit=20, offset=0):
+    """Return (results, has_more) for the user's presentations matching query, best first.
+
+    Each result is a dict of the presentations row plus a `snippet` of matching text.
+    """
+    terms = _query_terms(query)
+    if not terms:
+        return [], False
+
+    if _fts_available is False:
+        rows = conn.execute('''
+            SELECT p.* FROM presentations p
+            WHERE p.user_id = ? AND p.title LIKE ?
+            ORDER BY p.created_at DESC LIMIT ? OFFSET ?
+        ''', (user_id, f"%{query.strip()}%", limit + 1, offset)).fetchall()
+        return [dict(row, snippet=None) for row in rows[:limit]], len(rows) > limit
+
+    owner = f'owner : "{_owner_token(user_id)}" AND '
+    hits = '\n            UNION ALL '.join(
+        f"SELECT rowid AS id, {tier} AS tier FROM presentations_fts WHERE presentations_fts MATCH ?"
+        for tier in range(len(RANK_TIERS))
+    )
+    rows = conn.execute(f'''
+        WITH hits AS (
+            {hits}
+        )
+        SELECT p.*, MIN(h.tier) AS tier
+        FROM hits h JOIN presentations p ON p.id = h.id
+        WHERE p.user_id = ?
+        GROUP BY p.id
+        ORDER BY tier, p.created_at DESC, p.id DESC
+        LIMIT ? OFFSET ?
+    ''', [owner + _match_expression(terms, columns) for columns in RANK_TIERS] + [user_id, limit + 1, offset]).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], False
+
+    texts = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute(
+            f"SELECT rowid, slide_titles, body FROM presentations_fts WHERE rowid IN ({', '.join('?' * len(rows))})",
+            [row['id'] for row in rows]
+        )
+    }
+    results = []
+    for row in rows:
+        result = dict(row)
+        del result['tier']
+        result['snippet'] = _snippet(texts.get(row['id'], ()), terms)
+        results.append(result)
+    return results, has_more
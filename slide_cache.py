@@ -0,0 +1,230 @@
+"""In-process LRU cache of rendered slide fragments.
+
+A fragment is what create_presentation adds to a slide after its background:
+the serialized shape XML (title, bullets, image placeholder) plus the slide's
+preview_data entry and the text/image styles that entry references. It is
+keyed by a hash of everything the shapes depend on: the builder version, the
+template id and configuration, the font files its text was fitted with
+(text_fitting.metrics_fingerprint), the slide kind, its title, points and image
+prompt. The slide's position is not part of the key, so inserting or removing
+a slide does not invalidate the others.
+
+Backgrounds are not cached: they are applied fresh to every slide, and their
+image parts are already shared across the package.
+
+Each build process keeps recently used fragments in memory, bounded by
+SLIDE_CACHE_MAX_ENTRIES and SLIDE_CACHE_MAX_BYTES (of shape XML); the least
+recently used are evicted first. SLIDE_CACHE_MAX_ENTRIES=0 disables caching.
+
+Behind that, fragments are written to SLIDE_CACHE_DIR, one file per key, which
+every build process on the host shares: a deck generated in the 'default' build
+pool of one web worker is reassembled from cache when update_ppt rebuilds it in
+the 'interactive' pool, or in another worker. Reads refresh a file's mtime, and
+once the directory grows past SLIDE_CACHE_DISK_MAX_BYTES the files used least
+recently are removed. An empty SLIDE_CACHE_DIR keeps the cache in memory only.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+SLIDE_CACHE_MAX_ENTRIES = int(os.environ.get('SLIDE_CACHE_MAX_ENTRIES', 2000))
+SLIDE_CACHE_MAX_BYTES = int(os.environ.get('SLIDE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+SLIDE_CACHE_DIR = os.environ.get('SLIDE_CACHE_DIR', os.path.join('cache', 'slides'))
+SLIDE_CACHE_DISK_MAX_BYTES = int(os.environ.get('SLIDE_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024))
+DISK_PRUNE_EVERY = 200  # Writes per process between scans of SLIDE_CACHE_DIR
+
+SlideFragment = namedtuple('SlideFragment', 'shapes entry text_styles image_styles size')
+
+
+def fragment_key(*parts):
+    """Stable hash of JSON-serializable parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class DiskFragmentStore:
+    """Fragments as JSON files under root, shared by every process on the host."""
+
+    def __init__(self, root=SLIDE_CACHE_DIR, max_bytes=SLIDE_CACHE_DISK_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+            os.utime(path)  # Recently used: pruned last
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Unreadable slide fragment %s: %s", path, e)
+            return None
+        shapes = tuple(xml.encode('utf-8') for xml in data['shapes'])
+        return SlideFragment(shapes, data['entry'], data['text_styles'], data['image_styles'],
+                             sum(len(xml) for xml in shapes))
+
+    def put(self, key, fragment):
+        path = self._path(key)
+        if os.path.exists(path):
+            return  # Same key, same content
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            "shapes": [xml.decode('utf-8') for xml in fragment.shapes],
+            "entry": fragment.entry,
+            "text_styles": fragment.text_styles,
+            "image_styles": fragment.image_styles,
+        }
+        # Write aside and rename, so another process never reads a partial fragment
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(data, file, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % DISK_PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Remove the least recently used files until the store is under max_bytes."""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        files.sort()
+        removed = 0
+        # Down to 90%, so the next few writes do not each trigger a scan
+        for _, size, path in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        logger.info("Pruned %s slide fragments from %s", removed, self.root)
+
+    def clear(self):
+        for root, _, names in os.walk(self.root):
+            for name in names:
+                try:
+                    os.unlink(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass
+
+
+class SlideFragmentCache:
+    def __init__(self, max_entries=SLIDE_CACHE_MAX_ENTRIES, max_bytes=SLIDE_CACHE_MAX_BYTES, disk=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self._fragments = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+        fragment = self.disk.get(key) if self.disk is not None else None
+        with self._lock:
+            if fragment is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._remember(key, fragment)
+        return fragment
+
+    def put(self, key, shapes, entry, text_styles, image_styles):
+        if self.max_entries <= 0:
+            return
+        size = sum(len(xml) for xml in shapes)
+        if size > self.max_bytes:
+            return
+        fragment = SlideFragment(tuple(shapes), entry, text_styles, image_styles, size)
+        self._remember(key, fragment)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, fragment)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning("Could not write slide fragment to %s: %s", self.disk.root, e)
+
+    def _remember(self, key, fragment):
+        with self._lock:
+            previous = self._fragments.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._fragments[key] = fragment
+            self._bytes += fragment.size
+            while len(self._fragments) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._fragments.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._fragments),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_cache = SlideFragmentCache(disk=DiskFragmentStore() if SLIDE_CACHE_DIR else None)
+
+
+def get_slide_cache():
+    return _cache
+
+
+def slide_cache_stats():
+    """This process's cache counters; a plain function so a build pool can run it."""
+    return _cache.stats()
@@ -0,0 +1,350 @@
+"""Soak test: run thousands of generate/update/download/profile cycles and fail on leaks.
+
+The app runs in this process behind Flask's test client, with a stub Ollama, a
+scratch database and a scratch working directory, and builds inline
+(BUILD_POOL_WORKERS=0) so every build and its failures happen where they can be
+observed. Faults are injected at the points where a request can fail half way:
+the stub Ollama returns errors, deck saves and direct-engine writes fail after
+their temp file exists, storing decks fails, and database connections are
+refused. --storage s3 stores decks in stub_s3 instead of a local folder, and
+downloads follow the presigned redirect.
+
+Every --sample-every cycles the load pauses and the process is measured: RSS,
+open file descriptors, descriptors on the SQLite database, threads, files left
+in the temp directory and the sizes of the in-process caches. After a warm-up
+(caches filling, first imports), any metric that keeps growing beyond its
+tolerance fails the run:
+
+    python soak.py --cycles 2000 --concurrency 4
+    python soak.py --cycles 300 --fault-every 0   # No injected faults
+    python soak.py --storage s3
+
+Exits non-zero on unbounded growth.
+"""
+import argparse
+import gc
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_ollama import start_stub_ollama
+from stub_s3 import start_stub_s3
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+TOPICS = ["Photosynthesis", "Ocean currents", "The history of printing", "Supply chains", "Volcanoes"]
+
+
+class Fault:
+    """Replace owner.name with a wrapper that raises on every `every`th call."""
+
+    def __init__(self, label, owner, name, every, exception):
+        self.label = label
+        self.every = every
+        self.calls = 0
+        self.injected = 0
+        self._lock = threading.Lock()
+        original = getattr(owner, name)
+
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                self.calls += 1
+                fail = self.every and self.calls % self.every == 0
+                self.injected += bool(fail)
+            if fail:
+                raise exception(f"injected {label} failure")
+            return original(*args, **kwargs)
+
+        setattr(owner, name, wrapper)
+
+
+def install_faults(every, storage_backend):
+    import pptx.presentation
+    import app as app_module
+    import ooxml_builder
+    import storage
+
+    # Local storage fails half way through its copy; S3 as the upload starts
+    store_fault = ((shutil, 'copyfile') if storage_backend == 'local' else (storage.S3Storage, 'save'))
+    # Offsets keep the faults from always landing on the same cycle
+    return [
+        Fault('deck save', pptx.presentation.Presentation, 'save', every, IOError),
+        Fault('direct write', ooxml_builder, '_write_package', every + 1 if every else 0, IOError),
+        Fault('deck store', *store_fault, every + 2 if every else 0, IOError),
+        Fault('db connect', app_module, 'get_db', 3 * every if every else 0, sqlite3.OperationalError),
+    ]
+
+
+def prepare_workdir(workdir):
+    """Lay out the relative paths the app uses, sharing the repo's templates and images."""
+    os.makedirs(os.path.join(workdir, 'static', 'downloads'))
+    os.makedirs(os.path.join(workdir, 'tmp'))
+    for name in os.listdir(os.path.join(REPO_DIR, 'static')):
+        if name != 'downloads':
+            os.symlink(os.path.join(REPO_DIR, 'static', name), os.path.join(workdir, 'static', name))
+
+
+def read_rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def open_fds():
+    targets = []
+    for fd in os.listdir('/proc/self/fd'):
+        try:
+            targets.append(os.readlink(f'/proc/self/fd/{fd}'))
+        except OSError:
+            pass  # Closed while listing
+    return targets
+
+
+def sample(cycle, db_path, temp_dir, stored_dir):
+    from prefetch import prefetch_stats
+    from rate_limit import get_bucket_store
+    from slide_cache import get_slide_cache
+
+    gc.collect()
+    fds = open_fds()
+    bucket_store = get_bucket_store()
+    return {
+        "cycle": cycle,
+        "rss_mb": read_rss_mb(),
+        "fds": len(fds),
+        "sqlite_fds": sum(target.startswith(db_path) for target in fds),
+        "threads": threading.active_count(),
+        "temp_files": len(os.listdir(temp_dir)),
+        "slide_cache": get_slide_cache().stats()["entries"],
+        "prefetch": prefetch_stats()["entries"],
+        "rate_buckets": len(bucket_store) if hasattr(bucket_store, '__len__') else 0,
+        "stored": sum(not name.endswith('.etag') for name in os.listdir(stored_dir)),
+    }
+
+
+# metric -> allowed growth after warm-up; the caches are bounded by their own limits
+TOLERANCES = {
+    "fds": 4,
+    "sqlite_fds": 0,
+    "threads": 4,
+    "temp_files": 0,
+}
+
+
+def check_growth(samples, warmup, max_rss_growth_mb):
+    """Return a list of metrics that grew beyond their tolerance after warm-up."""
+    steady = samples[warmup:]
+    if len(steady) < 2:
+        return ["not enough samples after warm-up; raise --cycles or lower --sample-every"]
+    problems = []
+    baseline, tail = steady[0], steady[-3:]
+    for metric, tolerance in TOLERANCES.items():
+        growth = max(s[metric] for s in tail) - baseline[metric]
+        if growth > tolerance:
+            problems.append(f"{metric} grew by {growth} (from {baseline[metric]}, allowed {tolerance})")
+    # RSS is noisy, so the median of the last samples is compared
+    rss_growth = statistics.median(s["rss_mb"] for s in tail) - baseline["rss_mb"]
+    if rss_growth > max_rss_growth_mb:
+        problems.append(f"rss_mb grew by {rss_growth:.1f}MB (from {baseline['rss_mb']:.1f}MB, "
+                        f"allowed {max_rss_growth_mb}MB)")
+    # Only quiescent samples are taken, so nothing may be left in the temp dir at all
+    if any(s["temp_files"] for s in samples):
+        problems.append(f"temp files left behind: up to {max(s['temp_files'] for s in samples)}")
+    return problems
+
+
+class Soak:
+    def __init__(self, flask_app, args):
+        self.app = flask_app
+        self.args = args
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.users = 0
+
+    def _record(self, route, status):
+        with self._lock:
+            self.statuses[(route, status)] += 1
+
+    def new_client(self, attempts=5):
+        for _ in range(attempts):  # Registration can hit an injected database fault
+            client = self.app.test_client()
+            name = f"soak_{uuid.uuid4().hex[:10]}"
+            response = client.post('/register', data={
+                'username': name,
+                'email': f"{name}@example.com",
+                'password': 'soak-password',
+                'confirm_password': 'soak-password',
+            })
+            self._record('register', response.status_code)
+            response.close()
+            if response.status_code == 302:
+                with self._lock:
+                    self.users += 1
+                return client
+        raise RuntimeError(f"Registration failed with status {response.status_code}")
+
+    def client(self, cycle):
+        # One client per thread, replaced now and then so per-user state churns like it does in production
+        local = self._local
+        if getattr(local, 'client', None) is None or (self.args.new_user_every and cycle % self.args.new_user_every == 0):
+            local.client = self.new_client()
+        return local.client
+
+    def cycle(self, cycle):
+        client = self.client(cycle)
+        engine = self.args.engines[cycle % len(self.args.engines)]
+        template = self.args.templates[cycle % len(self.args.templates)]
+        response = client.post('/generate_ppt', json={
+            "topic": f"{TOPICS[cycle % len(TOPICS)]} {cycle}",
+            "num_slides": self.args.num_slides,
+            "template": template,
+            "engine": engine,
+        })
+        self._record('generate', response.status_code)
+        generated = response.get_json(silent=True) or {}
+        response.close()
+        if not generated.get("success"):
+            return
+
+        content = generated["content"]
+        content["slides"][0]["points"].append(f"Edited in cycle {cycle}")
+        response = client.post('/update_ppt', json={
+            "content": content,
+            "image_prompts": generated["image_prompts"],
+            "template": template,
+            "engine": engine,
+        })
+        self._record('update', response.status_code)
+        updated = response.get_json(silent=True) or {}
+        response.close()
+
+        for filename in (generated["filename"], updated.get("filename")):
+            if filename:
+                response = client.get(f"/download/{filename}")
+                response.get_data()
+                response.close()
+                if response.status_code == 302:  # To a presigned URL
+                    with urllib.request.urlopen(response.headers['Location']) as redirected:
+                        redirected.read()
+                    self._record('download redirect', redirected.status)
+                else:
+                    self._record('download', response.status_code)
+        response = client.get('/download/missing.pptx')
+        self._record('download missing', response.status_code)
+        response.close()
+
+        response = client.get('/profile')
+        self._record('profile', response.status_code)
+        response.close()
+
+    def run(self, db_path, temp_dir, stored_dir):
+        samples = [sample(0, db_path, temp_dir, stored_dir)]
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            for batch_start in range(0, self.args.cycles, self.args.sample_every):
+                batch = range(batch_start, min(batch_start + self.args.sample_every, self.args.cycles))
+                for future in [executor.submit(self.cycle, cycle) for cycle in batch]:
+                    future.result()
+                samples.append(sample(batch[-1] + 1, db_path, temp_dir, stored_dir))
+                print_sample(samples[-1], time.monotonic() - started)
+        return samples
+
+
+COLUMNS = ("cycle", "rss_mb", "fds", "sqlite_fds", "threads", "temp_files", "slide_cache", "prefetch",
+           "rate_buckets", "stored")
+
+
+def print_sample(s, elapsed):
+    cells = ' '.join(f"{s[c]:>10.1f}" if isinstance(s[c], float) else f"{s[c]:>10}" for c in COLUMNS)
+    print(f"{cells} {elapsed:8.0f}s", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cycles', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--sample-every', type=int, default=100, help='Cycles between measurements')
+    parser.add_argument('--warmup', type=float, default=0.25, help='Fraction of samples ignored for growth')
+    parser.add_argument('--num-slides', type=int, default=5)
+    parser.add_argument('--engines', nargs='+', default=['pptx', 'direct'])
+    parser.add_argument('--templates', nargs='+', default=None, help='Template ids (default: all)')
+    parser.add_argument('--fault-every', type=int, default=10,
+                        help='Inject a failure every N calls at each fault point (0 disables)')
+    parser.add_argument('--ollama-fail-rate', type=float, default=0.1)
+    parser.add_argument('--new-user-every', type=int, default=50, help='Cycles between fresh users per thread')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=32)
+    parser.add_argument('--storage', choices=['local', 's3'], default='local')
+    parser.add_argument('--keep-workdir', action='store_true')
+    args = parser.parse_args()
+
+    _, ollama_url = start_stub_ollama(fail_rate=args.ollama_fail_rate)
+    workdir = tempfile.mkdtemp(prefix='soak_')
+    prepare_workdir(workdir)
+    temp_dir = os.path.join(workdir, 'tmp')
+    db_path = os.path.join(workdir, 'users.db')
+    os.environ.update({
+        'OLLAMA_ENDPOINT': f"{ollama_url}/api/generate",
+        'DATABASE_PATH': db_path,
+        'BUILD_POOL_WORKERS': '0',
+        'GENERATE_BURST': '1000000',
+        'UPDATE_BURST': '1000000',
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'critical'),
+        'TMPDIR': temp_dir,
+        'STORAGE_BACKEND': args.storage,
+    })
+    stored_dir = os.path.join(workdir, 'static', 'downloads')
+    if args.storage == 's3':
+        s3_root = os.path.join(workdir, 's3')
+        _, s3_url = start_stub_s3(root=s3_root)
+        stored_dir = os.path.join(s3_root, 'decks')
+        os.environ.update({'S3_ENDPOINT_URL': s3_url, 'S3_BUCKET': 'decks'})
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'soak')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'soak')
+    tempfile.tempdir = temp_dir
+    os.chdir(workdir)
+
+    from app import create_app
+    flask_app = create_app()
+    if args.templates is None:
+        from template_manager import get_template_manager
+        args.templates = sorted(get_template_manager().get_all_templates())
+    faults = install_faults(args.fault_every, args.storage)
+
+    print(' '.join(f"{c:>10}" for c in COLUMNS) + f" {'elapsed':>9}")
+    soak = Soak(flask_app, args)
+    try:
+        samples = soak.run(db_path, temp_dir, stored_dir)
+    finally:
+        os.chdir(REPO_DIR)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{soak.users} users; responses by route and status:")
+    for (route, status), count in sorted(soak.statuses.items()):
+        print(f"  {route:<20} {status}  {count}")
+    print("Injected faults: " + ', '.join(f"{f.label} {f.injected}/{f.calls}" for f in faults))
+    if not soak.statuses[('generate', 200)]:
+        print("\nFAIL: no deck was generated")
+        sys.exit(1)
+    problems = check_growth(samples, max(1, int(len(samples) * args.warmup)), args.max_rss_growth_mb)
+    if problems:
+        print("\nFAIL: unbounded growth")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\nNo growth after warm-up")
+
+
+if __name__ == '__main__':
+    main()
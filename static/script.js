@@ -44,6 +44,48 @@ if (contentTypeSelector) {
     });
 }
 
+// Start generating the outline once a topic is entered; generate_ppt adopts it
+// if the topic and slide count are unchanged when the form is submitted
+let prefetchTimer = null;
+let lastPrefetch = null;
+function schedulePrefetch() {
+    clearTimeout(prefetchTimer);
+    prefetchTimer = setTimeout(() => {
+        const contentType = contentTypeSelector ? contentTypeSelector.value : 'auto_generate';
+        const topic = document.getElementById('topic').value.trim();
+        const numSlides = parseInt(document.getElementById('num_slides').value, 10);
+        if (contentType !== 'auto_generate' || !topic || isNaN(numSlides) || numSlides < 1 || numSlides > 20) {
+            return;
+        }
+        const key = JSON.stringify([topic, numSlides]);
+        if (key === lastPrefetch) {
+            return;
+        }
+        lastPrefetch = key;
+        fetch('/prefetch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({content_type: contentType, topic: topic, num_slides: numSlides})
+        })
+        .then(response => response.json())
+        .then(data => {
+            // Refused while the server was busy: allow the same key to be tried again
+            if (!data.started && lastPrefetch === key) {
+                lastPrefetch = null;
+            }
+        })
+        .catch(error => {
+            console.warn('Prefetch failed:', error);
+            if (lastPrefetch === key) {
+                lastPrefetch = null;
+            }
+        });
+    }, 1000);
+}
+['topic', 'num_slides'].forEach(id => document.getElementById(id)?.addEventListener('input', schedulePrefetch));
+
 // Update your form submission logic
 form.addEventListener('submit', async function(e) {
     e.preventDefault();
@@ -91,6 +133,7 @@ form.addEventListener('submit', async function(e) {
     }
     
     // Submit form
+    clearTimeout(prefetchTimer);
     contentFormSection.classList.add('hidden');
     loadingSection.classList.remove('hidden');
     generateBtn.disabled = true;
@@ -119,7 +162,7 @@ form.addEventListener('submit', async function(e) {
             content: data.content,
             image_prompts: data.image_prompts,
             template: data.template,
-            preview_data: data.preview_data,
+            preview_data: expandPreviewData(data.preview_data, data.content, data.image_prompts),
             download_url: data.download_url,
             filename: data.filename
         };
@@ -171,6 +214,52 @@ document.head.appendChild(style);
 
     let presentationData = null;
     let selectedTemplate = null;
+
+    // Expand a version 2 (style-reference) preview_data payload into the inlined
+    // shape the preview renderers use. Titles, points and image prompts come from
+    // the content and image_prompts the client already holds.
+    function expandPreviewData(previewData, content, imagePrompts) {
+        if (!previewData || (previewData.version || 1) === 1) {
+            return previewData;
+        }
+        const textStyles = previewData.text_styles || {};
+        const imageStyles = previewData.image_styles || {};
+        const prompts = imagePrompts || {};
+        const contentSlides = (content && content.slides) || [];
+        const slides = previewData.slides.map(slide => {
+            const imageStyleId = slide.image_style;
+            const common = {
+                title_font_size: slide.title_font_size,
+                has_image: imageStyleId != null,
+                image_style: imageStyleId != null ? (imageStyles[imageStyleId] || {}) : {}
+            };
+            if (slide.type === 'title') {
+                return {
+                    type: 'title',
+                    title: (content && content.title) || 'Presentation',
+                    image_prompt: prompts.title || null,
+                    ...common
+                };
+            }
+            const slideData = contentSlides[slide.index] || {};
+            const points = slideData.points || [];
+            const pointsStyle = textStyles[slide.points_style] || {};
+            return {
+                type: 'content',
+                title: slideData.title || `Slide ${slide.index + 1}`,
+                points: points,
+                points_styling: points.map(point => ({ ...pointsStyle, text: point })),
+                image_prompt: prompts[String(slide.index)] || null,
+                ...common
+            };
+        });
+        return {
+            title: previewData.title || 'Presentation',
+            template: previewData.template,
+            styles: previewData.styles || {},
+            slides: slides
+        };
+    }
     
     const statusMessages = [
         "Connecting to local Ollama service...",
@@ -338,9 +427,9 @@ document.head.appendChild(style);
             const titleFont = slideStyles.title_font || {};
             if (titleFont.name) titleElement.style.fontFamily = titleFont.name;
             
-            // Adjust font size based on title length
-            let fontSize = titleFont.size || (isTitle ? 36 : 28);
-            if (slide.title && slide.title.length > 40) {
+            // Use the size the server fitted to the title box; older previews only have the template size
+            let fontSize = slide.title_font_size || titleFont.size || (isTitle ? 36 : 28);
+            if (!slide.title_font_size && slide.title && slide.title.length > 40) {
                 fontSize = Math.max(fontSize - 8, 20);
             }
             titleElement.style.fontSize = `${fontSize}px`;
@@ -518,8 +607,8 @@ document.head.appendChild(style);
                         }
                         const titleFont = slideStyles.title_font || {};
                         const titleColor = titleFont.color || {r: 0, g: 0, b: 0};
-                        let fontSize = titleFont.size || (isTitle ? 44 : 32);
-                        if (slide.title.length > 40) {
+                        let fontSize = slide.title_font_size || titleFont.size || (isTitle ? 44 : 32);
+                        if (!slide.title_font_size && slide.title.length > 40) {
                             fontSize = Math.max(fontSize - 8, 20); // Reduce font size for long titles
                             console.log(`Reduced font size for full-screen slide ${index + 1} title: ${slide.title.substring(0, 20)}... to ${fontSize}px`);
                         }
@@ -687,7 +776,12 @@ document.head.appendChild(style);
                 const hasPreviewImage = template.preview_image && template.preview_image.trim() !== '';
                 templateCard.innerHTML = `
                     <div class="template-image">
-                        ${hasPreviewImage ? 
+                        ${template.preview_srcset ?
+                            `<picture>
+                                <source type="image/webp" srcset="${template.preview_srcset.webp}" sizes="300px">
+                                <img src="${template.preview_url}" srcset="${template.preview_srcset.png}" sizes="300px" alt="${template.name}" onerror="this.onerror=null; console.error('Failed to load preview image for template ${key}: ${template.preview_url}'); this.parentNode.querySelector('source')?.remove(); this.removeAttribute('srcset'); this.src = '/static/${template.preview_image}';">
+                            </picture>` :
+                        hasPreviewImage ? 
                             `<img src="/static/${template.preview_image}" alt="${template.name}" onerror="this.onerror=null; console.error('Failed to load preview image for template ${key}: /static/${template.preview_image}'); this.parentNode.innerHTML = createTemplatePreview(${JSON.stringify(template.styles)});">` : 
                             createTemplatePreview(template.styles)}
                     </div>
@@ -696,13 +790,6 @@ document.head.appendChild(style);
                         <p>${template.description || 'No description available'}</p>
                     </div>
                 `;
-                if (hasPreviewImage) {
-                    const img = new Image();
-                    img.src = `/static/${template.preview_image}`;
-                    img.onload = () => console.log(`Preview image loaded for template ${key}: /static/${template.preview_image}`);
-                    img.onerror = () => console.error(`Failed to load preview image for template ${key}: /static/${template.preview_image}`);
-                }
-                
                 templateCard.addEventListener('click', function() {
                     document.querySelectorAll('.template-card').forEach(card => {
                         card.classList.remove('selected');
@@ -714,6 +801,17 @@ document.head.appendChild(style);
                     };
                     selectedTemplateName.textContent = template.name;
                     updateSelectedTemplatePreview(template);
+                    if (!template.styles) {
+                        // The catalog is fetched without styles; load them on first selection
+                        loadTemplateStyles().then(allStyles => {
+                            if (!allStyles[key]) return;
+                            template.styles = allStyles[key];
+                            if (selectedTemplate && selectedTemplate.id === key) {
+                                selectedTemplate.styles = template.styles;
+                                updateSelectedTemplatePreview(template);
+                            }
+                        });
+                    }
                 });
                 templatesGrid.appendChild(templateCard);
             });
@@ -781,6 +879,27 @@ document.head.appendChild(style);
         }
     }
     
+    let templateStylesRequest = null;
+    function loadTemplateStyles() {
+        // Template id -> styles, from the catalog with styles (revalidated with its ETag)
+        if (!templateStylesRequest) {
+            templateStylesRequest = fetch('/get_templates?styles=1')
+                .then(response => {
+                    if (!response.ok) throw new Error('Failed to load template styles');
+                    return response.json();
+                })
+                .then(data => Object.fromEntries(
+                    Object.entries(data.templates || {}).map(([key, template]) => [key, template.styles])
+                ))
+                .catch(error => {
+                    console.error('Error loading template styles:', error);
+                    templateStylesRequest = null;
+                    return {};
+                });
+        }
+        return templateStylesRequest;
+    }
+    
     function updateSelectedTemplatePreview(template) {
         selectedTemplatePreview.innerHTML = '';
         const previewVisual = document.createElement('div');
@@ -1056,7 +1175,7 @@ document.head.appendChild(style);
             presentationData = {
                 ...presentationData,
                 content: updatedContent,
-                preview_data: data.preview_data,
+                preview_data: expandPreviewData(data.preview_data, updatedContent, presentationData.image_prompts),
                 download_url: data.download_url,
                 filename: data.filename
             };
@@ -0,0 +1,202 @@
+"""Where built decks are kept, and how they are handed to the browser.
+
+store_deck, /download and the zip export go through the storage returned by
+get_storage(), chosen by STORAGE_BACKEND:
+
+- 'local' (default): files in LOCAL_STORAGE_DIR, served by the app. Each node
+  only sees its own files, so several nodes need a shared volume here.
+- 's3': objects in S3_BUCKET under S3_PREFIX, on AWS or any S3-compatible
+  server (MinIO, Ceph, ...) given by S3_ENDPOINT_URL. Every node sees every
+  deck. Downloads redirect to a presigned URL valid for S3_URL_EXPIRES seconds,
+  or, with S3_REDIRECT_DOWNLOADS=0 (when browsers cannot reach the object
+  store), are streamed through the app. Needs boto3; credentials come from the
+  usual AWS environment variables or config files.
+
+Uploads and downloads are streamed in chunks in both backends; a deck is never
+held in memory whole. Any object with the same methods can stand in as the
+storage. stub_s3.py is a small S3 stand-in for trying the 's3' backend locally.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+LOCAL_STORAGE_DIR = os.environ.get('LOCAL_STORAGE_DIR', os.path.join('static', 'downloads'))
+S3_BUCKET = os.environ.get('S3_BUCKET', 'decks')
+S3_PREFIX = os.environ.get('S3_PREFIX', 'decks/')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+S3_URL_EXPIRES = int(os.environ.get('S3_URL_EXPIRES', 300))
+S3_REDIRECT_DOWNLOADS = os.environ.get('S3_REDIRECT_DOWNLOADS', '1').lower() in ('1', 'true', 'yes')
+CHUNK_SIZE = 64 * 1024
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+
+class LocalStorage:
+    def __init__(self, root=LOCAL_STORAGE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name):
+        if os.path.basename(name) != name or name in ('', '.', '..'):
+            raise ValueError(f"Invalid stored file name: {name!r}")
+        return os.path.join(self.root, name)
+
+    def save(self, local_path, name):
+        """Store the file at local_path as name."""
+        path = self._path(name)
+        # Copy next to the destination, then rename, so a reader never sees a partial deck
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self.root)
+        os.close(fd)
+        try:
+            shutil.copyfile(local_path, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def exists(self, name):
+        return os.path.isfile(self._path(name))
+
+    def open(self, name):
+        """Return (binary file, size, mtime) for reading name. Raises OSError if missing."""
+        path = self._path(name)
+        source = open(path, 'rb')
+        stat = os.fstat(source.fileno())
+        return source, stat.st_size, stat.st_mtime
+
+    def delete(self, name):
+        try:
+            os.unlink(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, name):
+        """A path the app can send directly, or None if the file is not on local disk."""
+        return os.path.abspath(self._path(name))
+
+    def download_url(self, name, download_name):
+        """A URL the browser can fetch name from without the app, or None."""
+        return None
+
+
+class S3Storage:
+    def __init__(self, bucket=S3_BUCKET, prefix=S3_PREFIX, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION,
+                 url_expires=S3_URL_EXPIRES, redirect_downloads=S3_REDIRECT_DOWNLOADS):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.url_expires = url_expires
+        self.redirect_downloads = redirect_downloads
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 is only imported once a deck is stored or fetched; clients are
+        # thread-safe but must not be shared across a fork
+        with self._lock:
+            if self._client is None or self._client_pid != os.getpid():
+                import boto3
+                from botocore.config import Config
+
+                self._client = boto3.session.Session().client(
+                    's3', endpoint_url=self.endpoint_url, region_name=self.region,
+                    config=Config(signature_version='s3v4', s3={'addressing_style': 'path'},
+                                  retries={'max_attempts': 3, 'mode': 'standard'}))
+                self._client_pid = os.getpid()
+            return self._client
+
+    def _key(self, name):
+        if os.path.basename(name) != name or name in ('', '.', '..'):
+            raise ValueError(f"Invalid stored file name: {name!r}")
+        return self.prefix + name
+
+    def save(self, local_path, name):
+        # upload_file reads the file in parts (multipart above 8MB) instead of loading it
+        self.client.upload_file(local_path, self.bucket, self._key(name),
+                                ExtraArgs={'ContentType': PPTX_MIMETYPE})
+
+    def exists(self, name):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def open(self, name):
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(name) from e
+            raise
+        return response['Body'], response['ContentLength'], response['LastModified'].timestamp()
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def local_path(self, name):
+        return None
+
+    def download_url(self, name, download_name):
+        if not self.redirect_downloads:
+            return None
+        download_name = download_name.replace('"', '')
+        return self.client.generate_presigned_url('get_object', Params={
+            'Bucket': self.bucket,
+            'Key': self._key(name),
+            'ResponseContentDisposition': f'attachment; filename="{download_name}"',
+            'ResponseContentType': PPTX_MIMETYPE,
+        }, ExpiresIn=self.url_expires)
+
+
+def iter_chunks(storage, name, chunk_size=CHUNK_SIZE):
+    """Yield a stored file in chunks; for streaming it through the app."""
+    source, _, _ = storage.open(name)
+    with closing(source):
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            yield chunk
+
+
+BACKENDS = {
+    'local': LocalStorage,
+    's3': S3Storage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+            _storage = BACKENDS[STORAGE_BACKEND]()
+            logger.info("Storing decks with the %s backend", STORAGE_BACKEND)
+        return _storage
+
+
+def set_storage(storage):
+    """Swap in another storage (e.g. a stand-in for tests)."""
+    global _storage
+    with _storage_lock:
+        _storage = storage
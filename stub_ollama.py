@@ -0,0 +1,123 @@
+"""Minimal stand-in for the Ollama HTTP API, for load and soak testing.
+
+Answers /api/generate with a well-formed presentation JSON after a configurable
+delay, so the app can be exercised without a GPU or model download.
+
+    python stub_ollama.py --port 11435 --delay 0.5
+    OLLAMA_ENDPOINT=http://127.0.0.1:11435/api/generate gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _fake_presentation(prompt):
+    match = re.search(r"with (\d+) slides", prompt)
+    num_slides = int(match.group(1)) if match else 3
+    topic_match = re.search(r"about '([^']*)'", prompt)
+    topic = topic_match.group(1) if topic_match else "Presentation"
+    return {
+        "title": f"{topic}: An Overview",
+        "slides": [
+            {
+                "title": f"{topic} part {i + 1}",
+                "points": [f"Point {j + 1} about {topic} with supporting detail" for j in range(5)]
+            }
+            for i in range(max(num_slides, 1))
+        ]
+    }
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    fail_rate = 0.0
+    model = "gemma3:1b-it-qat"
+    _counter = 0
+    _counter_lock = threading.Lock()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _should_fail(self):
+        if not self.fail_rate:
+            return False
+        with StubOllamaHandler._counter_lock:
+            StubOllamaHandler._counter += 1
+            count = StubOllamaHandler._counter
+        # Deterministic: every Nth request fails
+        return count % max(1, round(1 / self.fail_rate)) == 0
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json(200, {"models": [{"name": self.model}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path != '/api/generate':
+            self._send_json(404, {"error": "not found"})
+            return
+        if not payload.get('prompt'):
+            # Like Ollama, an empty prompt only loads the model
+            self._send_json(200, {"model": payload.get('model', self.model), "response": "", "done": True,
+                                  "done_reason": "load"})
+            return
+        started = time.monotonic()
+        time.sleep(self.delay)
+        if self._should_fail():
+            self._send_json(500, {"error": "injected failure"})
+            return
+        text = json.dumps(_fake_presentation(payload.get('prompt', '')))
+        eval_count = max(1, len(text) // 4)
+        self._send_json(200, {
+            "model": payload.get('model', self.model),
+            "response": text,
+            "done": True,
+            "prompt_eval_count": max(1, len(payload.get('prompt', '')) // 4),
+            "eval_count": eval_count,
+            "eval_duration": int((time.monotonic() - started) * 1e9),
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_ollama(host='127.0.0.1', port=0, delay=0.0, fail_rate=0.0):
+    """Start the stub in a daemon thread and return (server, base_url)."""
+    handler = type('ConfiguredStubOllamaHandler', (StubOllamaHandler,), {'delay': delay, 'fail_rate': fail_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--delay', type=float, default=0.5, help='Seconds to wait before answering /api/generate')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of generate calls that return 500')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_ollama(args.host, args.port, args.delay, args.fail_rate)
+    print(f"Stub Ollama listening on {base_url} (generate endpoint {base_url}/api/generate)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Minimal S3-compatible server, for trying STORAGE_BACKEND=s3 without MinIO or AWS.
+
+Speaks enough of the S3 REST API (path-style) for storage.S3Storage: bucket
+creation, PUT/GET/HEAD/DELETE of objects, multipart uploads, aws-chunked
+request bodies and presigned GET URLs, including their expiry and the
+response-content-* overrides. Objects are written to a directory, so stored
+decks do not count against the memory of the process running the stub.
+Requests must be signed (any credentials are accepted; signatures are not
+checked).
+
+    python stub_s3.py --port 9000
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://127.0.0.1:9000 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x \\
+        gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StubS3Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    root = None  # Directory holding one subdirectory per bucket
+    _uploads = {}  # upload id -> (bucket, key, {part number: path})
+    _lock = threading.Lock()
+
+    # Request parsing
+
+    def _target(self):
+        parts = urlsplit(self.path)
+        bucket, _, key = parts.path.lstrip('/').partition('/')
+        query = {name: values[0] for name, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        return unquote(bucket), unquote(key), query
+
+    def _authorized(self, query):
+        if self.headers.get('Authorization', '').startswith('AWS4-HMAC-SHA256 '):
+            return True
+        if 'X-Amz-Signature' not in query:
+            return False
+        signed_at = datetime.strptime(query.get('X-Amz-Date', ''), '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+        return time.time() <= signed_at.timestamp() + int(query.get('X-Amz-Expires', 0))
+
+    def _body_chunks(self):
+        """Yield the request body, undoing aws-chunked encoding if used."""
+        remaining = int(self.headers.get('Content-Length', 0))
+        chunked = (self.headers.get('x-amz-content-sha256', '').startswith('STREAMING-')
+                   or 'aws-chunked' in self.headers.get('Content-Encoding', ''))
+        if not chunked:
+            while remaining:
+                data = self.rfile.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+            return
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                break
+            yield self.rfile.read(size)
+            self.rfile.readline()
+        # Trailing checksum headers, up to the blank line
+        while self.rfile.readline().strip():
+            pass
+
+    def _receive(self, path):
+        md5 = hashlib.md5()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as dest:
+            for data in self._body_chunks():
+                md5.update(data)
+                dest.write(data)
+        return f'"{md5.hexdigest()}"'
+
+    def _object_path(self, bucket, key):
+        return os.path.join(self.root, bucket, quote(key, safe=''))
+
+    # Responses
+
+    def _send(self, status, body=b'', headers=None, content_type='application/xml'):
+        self.send_response(status)
+        if body or status not in (204, 304):
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, code, message=''):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>'
+        self._send(status, body.encode('utf-8'))
+
+    def _discard_body(self):
+        for _ in self._body_chunks():
+            pass
+
+    # Methods
+
+    def _handle(self):
+        bucket, key, query = self._target()
+        if not self._authorized(query):
+            self._discard_body()
+            self._error(403, 'AccessDenied', 'Request is unsigned or its presigned URL has expired')
+            return
+        bucket_dir = os.path.join(self.root, bucket)
+        if not key:
+            if self.command == 'PUT':
+                self._discard_body()
+                os.makedirs(bucket_dir, exist_ok=True)
+                self._send(200)
+            elif os.path.isdir(bucket_dir):
+                self._send(200)
+            else:
+                self._error(404, 'NoSuchBucket')
+            return
+        if not os.path.isdir(bucket_dir):
+            self._discard_body()
+            self._error(404, 'NoSuchBucket')
+            return
+        handler = getattr(self, f'_{self.command.lower()}_object')
+        handler(bucket, key, query)
+
+    def _put_object(self, bucket, key, query):
+        if 'uploadId' in query:
+            with self._lock:
+                upload = self._uploads.get(query['uploadId'])
+            if upload is None:
+                self._discard_body()
+                self._error(404, 'NoSuchUpload')
+                return
+            part_path = os.path.join(self.root, '.uploads', query['uploadId'], query['partNumber'])
+            etag = self._receive(part_path)
+            upload[2][int(query['partNumber'])] = part_path
+            self._send(200, headers={'ETag': etag})
+            return
+        # Write aside and rename, so a concurrent GET never sees a partial object
+        tmp_path = os.path.join(self.root, '.uploads', uuid.uuid4().hex)
+        etag = self._receive(tmp_path)
+        os.replace(tmp_path, self._object_path(bucket, key))
+        self._write_meta(bucket, key, etag)
+        self._send(200, headers={'ETag': etag})
+
+    def _post_object(self, bucket, key, query):
+        if 'uploads' in query:
+            self._discard_body()
+            upload_id = uuid.uuid4().hex
+            with self._lock:
+                self._uploads[upload_id] = (bucket, key, {})
+            body = (f'<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult><Bucket>{escape(bucket)}'
+                    f'</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>')
+            self._send(200, body.encode('utf-8'))
+        elif 'uploadId' in query:
+            self._discard_body()
+            with self._lock:
+                upload = self._uploads.pop(query['uploadId'], None)
+            if upload is None:
+                self._error(404, 'NoSuchUpload')
+                return
+            md5 = hashlib.md5()
+            tmp_path = os.path.join(self.root, '.uploads', uuid.uuid4().hex)
+            with open(tmp_path, 'wb') as dest:
+                for number in sorted(upload[2]):
+                    with open(upload[2][number], 'rb') as part:
+                        for data in iter(lambda: part.read(CHUNK_SIZE), b''):
+                            md5.update(data)
+                            dest.write(data)
+            shutil.rmtree(os.path.join(self.root, '.uploads', query['uploadId']), ignore_errors=True)
+            os.replace(tmp_path, self._object_path(bucket, key))
+            etag = f'"{md5.hexdigest()}-{len(upload[2])}"'
+            self._write_meta(bucket, key, etag)
+            body = (f'<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult><Bucket>{escape(bucket)}'
+                    f'</Bucket><Key>{escape(key)}</Key><ETag>{escape(etag)}</ETag></CompleteMultipartUploadResult>')
+            self._send(200, body.encode('utf-8'))
+        else:
+            self._discard_body()
+            self._error(400, 'InvalidRequest')
+
+    def _write_meta(self, bucket, key, etag):
+        with open(self._object_path(bucket, key) + '.etag', 'w') as meta:
+            meta.write(etag)
+
+    def _get_object(self, bucket, key, query):
+        path = self._object_path(bucket, key)
+        try:
+            source = open(path, 'rb')
+        except FileNotFoundError:
+            self._error(404, 'NoSuchKey')
+            return
+        with source:
+            stat = os.fstat(source.fileno())
+            with open(path + '.etag') as meta:
+                etag = meta.read()
+            self.send_response(200)
+            self.send_header('Content-Type', query.get('response-content-type', 'binary/octet-stream'))
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(stat.st_mtime, usegmt=True))
+            if 'response-content-disposition' in query:
+                self.send_header('Content-Disposition', query['response-content-disposition'])
+            self.end_headers()
+            if self.command == 'GET':
+                shutil.copyfileobj(source, self.wfile, CHUNK_SIZE)
+
+    _head_object = _get_object
+
+    def _delete_object(self, bucket, key, query):
+        if 'uploadId' in query:
+            with self._lock:
+                self._uploads.pop(query['uploadId'], None)
+            shutil.rmtree(os.path.join(self.root, '.uploads', query['uploadId']), ignore_errors=True)
+        else:
+            for path in (self._object_path(bucket, key), self._object_path(bucket, key) + '.etag'):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        self._send(204)
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_s3(host='127.0.0.1', port=0, root=None, buckets=('decks',)):
+    """Start the stub in a daemon thread and return (server, base_url)."""
+    root = root or tempfile.mkdtemp(prefix='stub_s3_')
+    os.makedirs(os.path.join(root, '.uploads'), exist_ok=True)
+    for bucket in buckets:
+        os.makedirs(os.path.join(root, bucket), exist_ok=True)
+    handler = type('ConfiguredStubS3Handler', (StubS3Handler,), {'root': root, '_uploads': {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--root', default=None, help='Directory for objects (default: a new temp dir)')
+    parser.add_argument('--bucket', action='append', default=None, help='Bucket to create (default: decks)')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_s3(args.host, args.port, args.root, args.bucket or ('decks',))
+    print(f"Stub S3 listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
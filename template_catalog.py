@@ -0,0 +1,126 @@
+"""The template catalog served by /get_templates, and resized template previews.
+
+The catalog only changes when the template set does, so it is serialized once
+per TemplateManager.version (with and without styles) and served with a weak
+ETag, since the compression hook may encode the body; clients that already hold
+it get a 304.
+
+Template preview images can be several megabytes of PNG. Each one gets WebP and
+PNG variants at PREVIEW_WIDTHS, written to PREVIEW_CACHE_DIR once and named by
+the source image's hash and width. A changed image gets new names, so variants
+are served with a year-long immutable Cache-Control. Run this module to create
+the variants ahead of time (e.g. at deploy); otherwise the first catalog
+request creates any that are missing.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from template_manager import get_template_manager
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CACHE_DIR = os.path.join('cache', 'previews')
+PREVIEW_URL_PREFIX = '/template-previews/'
+PREVIEW_WIDTHS = (320, 640)  # Template cards are ~300 CSS px wide; 640 covers 2x screens
+PREVIEW_FORMATS = ('webp', 'png')
+PREVIEW_MAX_AGE = 365 * 24 * 3600
+WEBP_QUALITY = 80
+
+_catalogs = {}  # (template set version, include_styles) -> (body, etag)
+_catalog_lock = threading.Lock()
+
+
+def _write_variant(img, path, width, image_format):
+    from PIL import Image
+
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    fd, tmp_path = tempfile.mkstemp(suffix='.' + image_format, dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        if image_format == 'webp':
+            img.save(tmp_path, format='WEBP', quality=WEBP_QUALITY, method=6)
+        else:
+            img.save(tmp_path, format='PNG', optimize=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def preview_variants(preview_image, cache_dir=PREVIEW_CACHE_DIR):
+    """Return {format: [(width, filename), ...]} for a template preview image under
+    static/, creating missing variants. Returns None if the image cannot be read.
+    """
+    from PIL import Image
+    from image_processor import _source_hash
+
+    source_path = os.path.join('static', preview_image)
+    try:
+        digest = _source_hash(source_path)[:16]
+        variants = {image_format: [(width, f"{digest}_{width}w.{image_format}") for width in PREVIEW_WIDTHS]
+                    for image_format in PREVIEW_FORMATS}
+        missing = [(width, name, image_format) for image_format, sizes in variants.items()
+                   for width, name in sizes if not os.path.exists(os.path.join(cache_dir, name))]
+        if missing:
+            os.makedirs(cache_dir, exist_ok=True)
+            with Image.open(source_path) as img:
+                img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+                for width, name, image_format in missing:
+                    _write_variant(img, os.path.join(cache_dir, name), width, image_format)
+            logger.info("Created %s preview variants of %s", len(missing), source_path)
+        return variants
+    except Exception as e:
+        logger.error("Failed to create preview variants of %s: %s", source_path, e)
+        return None
+
+
+def _catalog_entry(key, template, include_styles):
+    preview_image = template.get('preview_image', '')
+    entry = {
+        "name": template.get('name', key),
+        "description": template.get('description', ''),
+        "preview_image": preview_image,
+    }
+    variants = preview_variants(preview_image) if preview_image else None
+    if variants:
+        entry["preview_url"] = PREVIEW_URL_PREFIX + variants['png'][0][1]
+        entry["preview_srcset"] = {
+            image_format: ', '.join(f"{PREVIEW_URL_PREFIX}{name} {width}w" for width, name in sizes)
+            for image_format, sizes in variants.items()
+        }
+    if include_styles:
+        entry["styles"] = template.get('styles', {})
+    return entry
+
+
+def get_catalog(include_styles=False):
+    """Return (json_body, etag) of the catalog for the current template set."""
+    template_manager = get_template_manager()
+    cache_key = (template_manager.version, include_styles)
+    catalog = _catalogs.get(cache_key)
+    if catalog is None:
+        with _catalog_lock:
+            catalog = _catalogs.get(cache_key)
+            if catalog is None:
+                templates = {key: _catalog_entry(key, template, include_styles)
+                             for key, template in template_manager.get_all_templates().items()}
+                body = json.dumps({"success": True, "templates": templates},
+                                  sort_keys=True, separators=(',', ':')).encode('utf-8')
+                catalog = (body, hashlib.sha256(body).hexdigest()[:32])
+                _catalogs[cache_key] = catalog
+                logger.info("Serialized catalog of %s templates (%s bytes%s)", len(templates), len(body),
+                            ", with styles" if include_styles else "")
+    return catalog
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    for key, template in get_template_manager().get_all_templates().items():
+        if template.get('preview_image'):
+            print(key, preview_variants(template['preview_image']))
@@ -1,20 +1,21 @@
 import os
 import json
+import hashlib
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class TemplateManager:
     def __init__(self, templates_dir='static/templates'):
         self.templates_dir = templates_dir
         self.templates = {}
+        self.version = None  # Changes whenever the loaded template set does
         self.load_templates()
 
     def load_templates(self):
         try:
             if not os.path.exists(self.templates_dir):
-                logging.error(f"Templates directory not found: {self.templates_dir}")
+                logger.error("Templates directory not found: %s", self.templates_dir)
                 return
 
             for filename in os.listdir(self.templates_dir):
@@ -25,15 +26,16 @@ class TemplateManager:
                             template_data = json.load(file)
                         template_key = os.path.splitext(filename)[0]
                         self.templates[template_key] = template_data
-                        logging.info(f"Loaded template: {template_key}")
+                        logger.info("Loaded template: %s", template_key)
                     except json.JSONDecodeError as e:
-                        logging.error(f"Error decoding {filename}: {str(e)}")
+                        logger.error("Error decoding %s: %s", filename, e)
                     except Exception as e:
-                        logging.error(f"Error loading {filename}: {str(e)}")
+                        logger.error("Error loading %s: %s", filename, e)
 
-            logging.info(f"Total templates loaded: {len(self.templates)}")
+            logger.info("Total templates loaded: %s", len(self.templates))
+            self.version = hashlib.sha256(json.dumps(self.templates, sort_keys=True).encode('utf-8')).hexdigest()[:16]
         except Exception as e:
-            logging.error(f"Error in load_templates: {str(e)}")
+            logger.error("Error in load_templates: %s", e)
 
     def get_template(self, template_name):
         return self.templates.get(template_name)
@@ -44,12 +46,12 @@ class TemplateManager:
     def validate_template(self, template_name):
         template = self.get_template(template_name)
         if not template:
-            logging.error(f"Template {template_name} not found")
+            logger.error("Template %s not found", template_name)
             return False
         
         required_keys = ['name', 'description', 'preview_image', 'styles']
         if not all(key in template for key in required_keys):
-            logging.error(f"Template {template_name} missing required keys: {required_keys}")
+            logger.error("Template %s missing required keys: %s", template_name, required_keys)
             return False
         
         # Validate preview image
@@ -57,15 +59,15 @@ class TemplateManager:
         if preview_image:
             preview_image_path = os.path.join('static', preview_image)
             if preview_image and not os.path.exists(preview_image_path):
-                logging.error(f"Template {template_name} has invalid preview_image path: {preview_image_path}")
+                logger.error("Template %s has invalid preview_image path: %s", template_name, preview_image_path)
                 return False
             else:
-                logging.debug(f"Template {template_name} preview_image validated: {preview_image_path}")
+                logger.debug("Template %s preview_image validated: %s", template_name, preview_image_path)
         
         required_styles = ['title_slide', 'content_slide']
         styles = template.get('styles', {})
         if not all(style in styles for style in required_styles):
-            logging.error(f"Template {template_name} missing required styles: {required_styles}")
+            logger.error("Template %s missing required styles: %s", template_name, required_styles)
             return False
         
         # Validate title slide
@@ -77,13 +79,13 @@ class TemplateManager:
         if bg_settings.get('type') == 'solid':
             bg_color = bg_settings.get('color', {'r': 240, 'g': 240, 'b': 240})
             if not all(k in bg_color for k in ['r', 'g', 'b']):
-                logging.error(f"Template {template_name} has invalid background color format")
+                logger.error("Template %s has invalid background color format", template_name)
                 return False
         elif bg_settings.get('type') == 'gradient':
             gradient_start = bg_settings.get('gradient_start', {'r': 240, 'g': 240, 'b': 240})
             gradient_end = bg_settings.get('gradient_end', {'r': 200, 'g': 200, 'b': 200})
             if not all(k in gradient_start for k in ['r', 'g', 'b']) or not all(k in gradient_end for k in ['r', 'g', 'b']):
-                logging.error(f"Template {template_name} has invalid gradient color format")
+                logger.error("Template %s has invalid gradient color format", template_name)
                 return False
         
         # Validate background image
@@ -93,15 +95,15 @@ class TemplateManager:
             if bg_image:
                 image_path = os.path.join('static', bg_image)
                 if not os.path.exists(image_path):
-                    logging.error(f"Template {template_name} has invalid background_image path for {slide_type}: {image_path}")
+                    logger.error("Template %s has invalid background_image path for %s: %s", template_name, slide_type, image_path)
                     return False
                 else:
-                    logging.debug(f"Template {template_name} background_image validated for {slide_type}: {image_path}")
+                    logger.debug("Template %s background_image validated for %s: %s", template_name, slide_type, image_path)
         
         # Validate title font color
         title_color = title_font.get('color', {'r': 0, 'g': 0, 'b': 0})
         if not all(k in title_color for k in ['r', 'g', 'b']):
-            logging.error(f"Template {template_name} has invalid title font color format")
+            logger.error("Template %s has invalid title font color format", template_name)
             return False
         
         # Check for low contrast (only for solid backgrounds without images)
@@ -109,7 +111,7 @@ class TemplateManager:
             bg_color = bg_settings.get('color', {'r': 240, 'g': 240, 'b': 240})
             if (bg_color['r'] >= 200 and bg_color['g'] >= 200 and bg_color['b'] >= 200 and
                 title_color['r'] >= 200 and title_color['g'] >= 200 and title_color['b'] >= 200):
-                logging.warning(f"Template {template_name} has low contrast colors in title slide")
+                logger.warning("Template %s has low contrast colors in title slide", template_name)
                 return False
         
         # Validate image position
@@ -118,15 +120,25 @@ class TemplateManager:
             image_position = slide.get('image_position', {})
             required_position_keys = ['left', 'top', 'width', 'height']
             if image_position and not all(k in image_position for k in required_position_keys):
-                logging.error(f"Template {template_name} has invalid image_position in {slide_type}")
+                logger.error("Template %s has invalid image_position in %s", template_name, slide_type)
                 return False
         
         # Validate image_slide properties
         image_slide = styles.get('image_slide', {})
         for key in ['fill_color', 'border_color']:
             if key in image_slide and not all(k in image_slide[key] for k in ['r', 'g', 'b']):
-                logging.error(f"Template {template_name} has invalid {key} format in image_slide")
+                logger.error("Template %s has invalid %s format in image_slide", template_name, key)
                 return False
         
-        logging.info(f"Template {template_name} validated successfully")
-        return True
\ No newline at end of file
+        logger.info("Template %s validated successfully", template_name)
+        return True
+
+
+_template_manager = None
+
+def get_template_manager():
+    """Return the shared TemplateManager, loading templates on first use."""
+    global _template_manager
+    if _template_manager is None:
+        _template_manager = TemplateManager()
+    return _template_manager
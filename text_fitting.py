@@ -0,0 +1,209 @@
+"""Size text to fit its box using real font metrics.
+
+PowerPoint's shrink-on-overflow (MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE) is only
+applied when a deck is opened in PowerPoint, so the file as saved, and any
+preview built from it, shows the unshrunk size. Instead, create_presentation
+asks fit_text for the largest size at which the text wraps inside its box,
+writes that size into the deck, and reports it in preview_data.
+
+Glyph advance widths come from PIL ImageFont. Fonts are resolved from the
+TTFs bundled in static/fonts first, so every host fits the same text the same
+way: Carlito (metric-compatible with Calibri), Liberation Sans (with Arial and
+Helvetica) and DejaVu Sans (the closest open face to Verdana, though not
+metric-compatible). A template font without a bundled face is looked up by name,
+then by substitute, in the usual system font folders. Without any of these the
+metrics come from PIL's default font, or a flat estimate on old Pillow, and the
+sizes no longer match what PowerPoint renders; that is logged as a warning once
+per font. Anything cached from fitted sizes should include metrics_fingerprint()
+in its key.
+
+Widths are measured once per font at a reference size and scaled linearly, and
+the per-font tables are kept in an LRU, so fitting a paragraph is a few
+dictionary lookups per character.
+"""
+import logging
+import os
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'fonts')
+SYSTEM_FONT_DIRS = [
+    '/usr/share/fonts',
+    '/usr/local/share/fonts',
+    os.path.expanduser('~/.fonts'),
+    '/Library/Fonts',
+    '/System/Library/Fonts',
+    'C:\\Windows\\Fonts',
+]
+FONT_SUBSTITUTES = {
+    'calibri': ['carlito'],
+    'cambria': ['caladea'],
+    'arial': ['liberationsans', 'arimo'],
+    'helvetica': ['liberationsans', 'arimo'],
+    'verdana': ['dejavusans'],
+    'timesnewroman': ['liberationserif', 'tinos'],
+    'couriernew': ['liberationmono', 'cousine'],
+}
+REFERENCE_SIZE = 100  # Glyphs are measured at this size and scaled
+LINE_SPACING = 1.2  # Single line spacing as a multiple of the font size
+TEXTBOX_INSET_X = 7.2  # python-pptx text box insets in points (0.1in each side)
+TEXTBOX_INSET_Y = 3.6  # 0.05in top and bottom
+FIT_MARGIN = 0.97  # Headroom for renderer differences in kerning and hinting
+
+
+def _normalize(name):
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+@lru_cache(maxsize=2)
+def _font_files(font_dirs):
+    """Map normalized font file stems to paths, scanning the font folders once."""
+    files = {}
+    for font_dir in font_dirs:
+        if not os.path.isdir(font_dir):
+            continue
+        for root, _, names in os.walk(font_dir):
+            for name in names:
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in ('.ttf', '.otf', '.ttc'):
+                    files.setdefault(_normalize(stem), os.path.join(root, name))
+    return files
+
+
+def find_font_file(font_name, bold=False):
+    families = [_normalize(font_name)] + FONT_SUBSTITUTES.get(_normalize(font_name), [])
+    suffixes = ['bold', 'b', 'bd'] if bold else ['', 'regular', 'r']
+    # Every bundled candidate wins over the host's fonts, even the named font itself
+    for files in (_font_files((BUNDLED_FONT_DIR,)), _font_files(tuple(SYSTEM_FONT_DIRS))):
+        for family in families:
+            for suffix in suffixes:
+                path = files.get(family + suffix)
+                if path:
+                    return path
+    return None
+
+
+class FontMetrics:
+    """Advance widths of one font, in points per point of font size."""
+
+    def __init__(self, font_name, bold=False):
+        from PIL import ImageFont
+
+        self.font_name = font_name
+        self.bold = bold
+        self.path = find_font_file(font_name, bold)
+        try:
+            if self.path:
+                self._font = ImageFont.truetype(self.path, REFERENCE_SIZE)
+                self.source = os.path.basename(self.path)
+            else:
+                self._font = ImageFont.load_default(REFERENCE_SIZE)
+                self.source = 'pil-default'
+                logger.warning("No font file for %s%s or a metric-compatible substitute; fitted text sizes "
+                               "will not match PowerPoint. Install it or put the TTF in %s",
+                               font_name, " bold" if bold else "", BUNDLED_FONT_DIR)
+        except Exception as e:
+            logger.warning("Could not load font %s (%s), estimating widths; fitted text sizes "
+                           "will not match PowerPoint", font_name, e)
+            self._font = None
+            self.source = 'estimate'
+        self._widths = {}
+
+    def char_width(self, char):
+        width = self._widths.get(char)
+        if width is None:
+            if self._font is not None and hasattr(self._font, 'getlength'):
+                width = self._font.getlength(char) / REFERENCE_SIZE
+            else:
+                width = 0.5  # Rough average advance for proportional fonts
+            self._widths[char] = width
+        return width
+
+    def text_width(self, text, size):
+        widths = self._widths
+        total = 0.0
+        for char in text:
+            width = widths.get(char)
+            total += width if width is not None else self.char_width(char)
+        return total * size
+
+
+@lru_cache(maxsize=32)
+def get_font_metrics(font_name, bold=False):
+    return FontMetrics(font_name, bold)
+
+
+def metrics_fingerprint(fonts):
+    """The font files fit_text measures the given (font_name, bold) pairs with."""
+    return sorted({get_font_metrics(font_name, bold).source for font_name, bold in fonts})
+
+
+def _measure(text, metrics):
+    # Words with their widths at size 1, per source line; reused for every size tried
+    return [[(word, metrics.text_width(word, 1)) for word in line.split(' ')] for line in text.split('\n')]
+
+
+def _wrap_measured(measured, metrics, size, max_width):
+    lines = []
+    space = metrics.text_width(' ', size)
+    for source_line in measured:
+        line, line_width = '', 0.0
+        for word, unit_width in source_line:
+            word_width = unit_width * size
+            if line and line_width + space + word_width <= max_width:
+                line, line_width = f"{line} {word}", line_width + space + word_width
+                continue
+            if line:
+                lines.append(line)
+            # A word wider than the box is broken between characters
+            while word_width > max_width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and metrics.text_width(word[:cut], size) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+                word_width = metrics.text_width(word, size)
+            line, line_width = word, word_width
+        lines.append(line)
+    return lines
+
+
+def wrap_text(text, metrics, size, max_width):
+    """Greedy word wrap like PowerPoint's; returns the list of lines."""
+    return _wrap_measured(_measure(text, metrics), metrics, size, max_width)
+
+
+def fit_text(paragraphs, font_name, max_size, min_size, box_width_pt, box_height_pt,
+             bold=False, space_before=0, space_after=0):
+    """Return (size, lines) for the largest whole point size in [min_size, max_size]
+    at which paragraphs fit a text box of the given size, with lines the wrapped
+    text of each paragraph. If nothing fits, min_size is returned.
+    """
+    metrics = get_font_metrics(font_name, bold)
+    width = (box_width_pt - 2 * TEXTBOX_INSET_X) * FIT_MARGIN
+    height = (box_height_pt - 2 * TEXTBOX_INSET_Y) * FIT_MARGIN
+    min_size = min(min_size, max_size)
+    measured = [_measure(paragraph, metrics) for paragraph in paragraphs]
+    paragraph_spacing = len(paragraphs) * (space_before + space_after)
+
+    def fits(size):
+        wrapped = [_wrap_measured(m, metrics, size, width) for m in measured]
+        needed = sum(len(lines) for lines in wrapped) * size * LINE_SPACING + paragraph_spacing
+        return needed <= height, wrapped
+
+    ok, wrapped = fits(max_size)
+    if ok:
+        return max_size, wrapped
+    best, best_wrapped = min_size, None
+    low, high = min_size, max_size - 1
+    while low <= high:
+        mid = (low + high) // 2
+        ok, mid_wrapped = fits(mid)
+        if ok:
+            best, best_wrapped = mid, mid_wrapped
+            low = mid + 1
+        else:
+            high = mid - 1
+    return best, best_wrapped if best_wrapped is not None else fits(min_size)[1]
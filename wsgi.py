@@ -0,0 +1,20 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master imports this module once, so the template cache is
+loaded before workers fork and shared copy-on-write. Deck builds run in a
+per-worker process pool (see build_pool.py); when that is disabled the builder
+(python-pptx, lxml, PIL) is preloaded here instead of on each worker's first
+request.
+"""
+from app import create_app
+from build_pool import BUILD_POOL_WORKERS
+from template_manager import get_template_manager
+
+app = create_app()
+
+# Warm read-only shared state before fork
+get_template_manager()
+if BUILD_POOL_WORKERS <= 0:
+    import presentation_builder  # noqa: E402,F401
@@ -0,0 +1,74 @@
+"""Stream a zip archive of files as it is written, without buffering it.
+
+zipfile can write to an unseekable file: it then puts each entry's CRC and
+sizes in a data descriptor after the entry instead of seeking back to the
+header. stream_zip hands zipfile such a file, which only holds what was
+written since the last chunk was yielded, so memory stays at about one read
+chunk however many files the archive holds.
+
+Entries are stored, not deflated: .pptx files are already zip-compressed.
+"""
+import io
+import logging
+import os
+import time
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only, unseekable sink whose contents are drained after each write."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _open_path(path):
+    source = open(path, 'rb')
+    stat = os.fstat(source.fileno())
+    return source, stat.st_size, stat.st_mtime
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE, open_entry=_open_path):
+    """Yield the bytes of a zip holding entries, an iterable of (arcname, path).
+
+    open_entry(path) returns (binary file, size, mtime); by default path is a
+    local file, but it can be anything open_entry understands, such as a name
+    in deck storage. Files that cannot be read are logged and left out.
+    """
+    sink = _ChunkWriter()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in entries:
+            try:
+                source, size, mtime = open_entry(path)
+            except Exception as e:
+                logger.warning("Skipping %s in zip export: %s", path, e)
+                continue
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(mtime)[:6])
+            info.file_size = size
+            with source, archive.open(info, mode='w') as dest:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    dest.write(chunk)
+                    yield sink.drain()
+            # Entry end: the data descriptor
+            data = sink.drain()
+            if data:
+                yield data
+    # The central directory is written on close
+    yield sink.drain()